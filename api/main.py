@@ -4,16 +4,33 @@ Botan API Gateway - FastAPI Server
 WebSocket + REST API for AI Vtuber
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Optional, List
+from starlette.background import BackgroundTask
+from typing import Optional, Dict, List
+from contextlib import asynccontextmanager
+import asyncio
 import json
 import logging
 import httpx
 import os
+import sys
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+# scripts/から共通モジュールをインポート
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+
+from broadcast_bus import BroadcastBus, create_bus
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from resilience import CircuitBreaker, CircuitOpenError, breaker_snapshots
+from ws_codec import DEFAULT_WIRE_FORMAT, WireFormat, available_encodings, encode_audio_frame, is_audio_frame
 
 # ロギング設定
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +40,71 @@ logger = logging.getLogger(__name__)
 CORE_SERVICE_URL = os.getenv("CORE_SERVICE_URL", "http://localhost:8001")
 VOICE_SERVICE_URL = os.getenv("VOICE_SERVICE_URL", "http://localhost:8002")
 
+# HTTPクライアント設定（アップストリームごとのコネクションプール）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+CORE_TIMEOUT = float(os.getenv("CORE_TIMEOUT", "30"))
+VOICE_TIMEOUT = float(os.getenv("VOICE_TIMEOUT", "30"))
+AUDIO_TIMEOUT = float(os.getenv("AUDIO_TIMEOUT", "10"))
+
+# サーキットブレーカー・適応タイムアウト（CORE_TIMEOUT / VOICE_TIMEOUT は上限として使う）
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+CORE_TIMEOUT_MIN = float(os.getenv("CORE_TIMEOUT_MIN", "5"))
+VOICE_TIMEOUT_MIN = float(os.getenv("VOICE_TIMEOUT_MIN", "3"))
+
+# 音声プロキシ設定
+AUDIO_CACHE_CONTROL = os.getenv("AUDIO_CACHE_CONTROL", "public, max-age=31536000, immutable")
+AUDIO_FORWARD_REQUEST_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+AUDIO_PASSTHROUGH_RESPONSE_HEADERS = (
+    "content-length", "content-range", "accept-ranges", "etag", "last-modified"
+)
+
+# ヘルスチェック設定
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "2"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+
+# 同一メッセージの集約（single-flight）
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "false").lower() == "true"
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1.0"))
+
+# アドミッション制御（全体の同時実行数と待ち行列の上限）
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# user_id ごとのレート制限（トークンバケット、RATE_LIMIT_PER_SEC=0 で無効）
+RATE_LIMIT_PER_SEC = float(os.getenv("RATE_LIMIT_PER_SEC", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "10000"))
+
+# ユニークユーザー数の集計で覚えておく user_id の上限（LRU、あふれた人が戻ると再度数える）
+SEEN_USERS_MAX = int(os.getenv("SEEN_USERS_MAX", "10000"))
+
+# WebSocket 1接続あたりの同時処理数（0 = 無制限）
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "4"))
+
+# ブロードキャストバス（複数ワーカー時は redis://... か unix://... を指定）
+BROADCAST_BUS = os.getenv("BROADCAST_BUS", "local")
+BUS_CHANNEL_CHAT = "botan:chat"
+BUS_CHANNEL_OBS = "botan:obs"
+BUS_CHANNEL_OBS_AUDIO = "botan:obs_audio"
+
+# WebSocket送信キュー設定
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+OBS_SEND_QUEUE_SIZE = int(os.getenv("OBS_SEND_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# 文単位の音声合成パイプライン（enable_voice 時、メッセージの voice_pipeline で上書き可）
+VOICE_PIPELINE_ENABLED = os.getenv("VOICE_PIPELINE_ENABLED", "true").lower() == "true"
+VOICE_SEGMENT_MIN_CHARS = int(os.getenv("VOICE_SEGMENT_MIN_CHARS", "4"))
+
+# WebSocketで音声をバイナリフレームとして送る場合の1フレームの最大バイト数
+INLINE_AUDIO_FRAME_BYTES = int(os.getenv("INLINE_AUDIO_FRAME_BYTES", "8192"))
+
 # FastAPIアプリケーション
 app = FastAPI(
     title="Botan AI API",
@@ -39,6 +121,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 共有HTTPクライアント（startupで生成、shutdownでクローズ）
+core_client: Optional[httpx.AsyncClient] = None
+voice_client: Optional[httpx.AsyncClient] = None
+
+def _create_client(base_url: str, timeout: float) -> httpx.AsyncClient:
+    """
+    keep-alive付きの共有AsyncClientを作成
+
+    Args:
+        base_url: アップストリームのURL
+        timeout: 読み込みタイムアウト（秒）
+    """
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP2_ENABLED=true but 'h2' is not installed. Falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        ),
+        http2=http2
+    )
+
+@app.on_event("startup")
+async def startup():
+    global core_client, voice_client
+    core_client = _create_client(CORE_SERVICE_URL, CORE_TIMEOUT)
+    voice_client = _create_client(VOICE_SERVICE_URL, VOICE_TIMEOUT)
+    await manager.start_bus(create_bus(BROADCAST_BUS))
+    logger.info(
+        f"HTTP client pools ready (max_connections={HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={HTTP_MAX_KEEPALIVE_CONNECTIONS}, http2={HTTP2_ENABLED})"
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await manager.close_bus()
+    for client in (core_client, voice_client):
+        if client is not None:
+            await client.aclose()
+    logger.info("HTTP client pools closed")
+
 # 静的ファイル配信（WebUI）
 app.mount("/static", StaticFiles(directory="/app/static"), name="static")
 
@@ -52,47 +184,300 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     audio_url: Optional[str] = None
+    audio_status: Optional[str] = None  # ok / skipped（Voice停止中）/ failed
     reflection: Optional[dict] = None
     reasoning: Optional[dict] = None
 
 # WebSocket接続管理
+class ClientConnection:
+    """
+    送信キューと専用の送信タスクを持つWebSocket接続
+
+    送信側はキューに積むだけで待たない。遅いクライアントは自分のキューが
+    詰まるだけで、他のクライアントや呼び出し元のハンドラを止めない。
+    """
+
+    def __init__(self, websocket: WebSocket, max_queue: int, drop_oldest: bool, wire: WireFormat):
+        self.websocket = websocket
+        self.wire = wire
+        self.inline_audio = False  # 音声をURLではなくバイナリフレームで受け取る
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.closed = False
+        self.writer_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, payload) -> bool:
+        """
+        送信キューに積む
+
+        Returns:
+            False: キューが溢れた（drop_oldest=False の場合は切断対象）
+        """
+        if self.closed:
+            return False
+
+        if self.queue.full():
+            if not self.drop_oldest:
+                return False
+            # 字幕は最新が重要なので古いものから捨てる
+            self.dropped += 1
+            if not self._drop_oldest_message():
+                # キューが音声フレームだけなら、今回の字幕のほうを捨てる
+                return True
+
+        self.queue.put_nowait(payload)
+        return True
+
+    def _drop_oldest_message(self) -> bool:
+        """キューから最も古いテキストのメッセージを1つ捨てる（音声フレームは途中を抜くと再生できないので残す）"""
+        pending = self.queue._queue  # asyncio.Queue の中身（deque）
+        for i, queued in enumerate(pending):
+            if not is_audio_frame(queued):
+                del pending[i]
+                return True
+        return False
+
+    async def put(self, payload) -> bool:
+        """
+        送信キューに空きができるまで待って積む（音声フレーム用）
+
+        音声は途中のフレームを捨てると再生できないため、溢れさせずに
+        送り手側を待たせる。WS_SEND_TIMEOUT 内に空かなければ False。
+        """
+        if self.closed:
+            return False
+        try:
+            await asyncio.wait_for(self.queue.put(payload), timeout=WS_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def writer(self, on_dead):
+        """キューから取り出して順に送信（タイムアウト・送信失敗で切断）"""
+        try:
+            while True:
+                payload = await self.queue.get()
+                send = self.websocket.send_bytes if isinstance(payload, bytes) else self.websocket.send_text
+                await asyncio.wait_for(send(payload), timeout=WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Dropping dead WebSocket client: {e!r}")
+            on_dead(self)
+
 class ConnectionManager:
+    """
+    WebSocket接続の管理
+
+    ブロードキャストはバス経由で全ワーカーに送り、各ワーカーがバスから
+    受け取ったメッセージを自分の接続に配る（deliver）。
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.obs_connections: List[WebSocket] = []  # OBS専用接続リスト
+        # WebSocket → ClientConnection（追加・削除ともにO(1)）
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.obs_connections: Dict[WebSocket, ClientConnection] = {}  # OBS専用
+        self.bus: Optional[BroadcastBus] = None
 
-    async def connect(self, websocket: WebSocket):
+    async def start_bus(self, bus: BroadcastBus):
+        await bus.start([BUS_CHANNEL_CHAT, BUS_CHANNEL_OBS, BUS_CHANNEL_OBS_AUDIO], self.deliver)
+        self.bus = bus
+        logger.info(f"Broadcast bus: {bus.backend}")
+
+    async def close_bus(self):
+        if self.bus is not None:
+            await self.bus.close()
+            self.bus = None
+
+    async def _publish(self, channel: str, message):
+        if self.bus is None:
+            await self.deliver(channel, message)
+            return
+        try:
+            await self.bus.publish(channel, message)
+        except Exception as e:
+            # バスが使えない間も、少なくとも自ワーカーの接続には届ける
+            logger.warning(f"{e}, delivering locally")
+            await self.deliver(channel, message)
+
+    async def deliver(self, channel: str, message):
+        """バスから受け取ったメッセージを自ワーカーの接続に配る"""
+        if channel == BUS_CHANNEL_OBS:
+            self._fan_out(message, self.obs_connections)
+        elif channel == BUS_CHANNEL_OBS_AUDIO:
+            # 音声フレームは捨てずにキューが空くまで待つ（WS_SEND_TIMEOUT 内に空かない接続は切断）
+            connections = [c for c in self.obs_connections.values() if c.inline_audio]
+            results = await asyncio.gather(*(connection.put(message) for connection in connections))
+            for connection, ok in zip(connections, results):
+                if not ok:
+                    logger.warning("OBS audio send timed out, disconnecting client")
+                    self._evict(connection, self.obs_connections)
+        elif channel == BUS_CHANNEL_CHAT:
+            self._fan_out(message, self.active_connections)
+
+    async def _register(
+        self,
+        websocket: WebSocket,
+        registry: Dict[WebSocket, ClientConnection],
+        max_queue: int,
+        drop_oldest: bool
+    ) -> ClientConnection:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = ClientConnection(websocket, max_queue, drop_oldest, self._initial_wire_format(websocket))
+        connection.inline_audio = websocket.query_params.get("audio") == "inline"
+        connection.writer_task = asyncio.create_task(
+            connection.writer(lambda conn: self._evict(conn, registry))
+        )
+        registry[websocket] = connection
+        return connection
+
+    @staticmethod
+    def _initial_wire_format(websocket: WebSocket) -> WireFormat:
+        """?encoding=msgpack&fields=text,delta&audio=inline で接続時に指定できる"""
+        params = websocket.query_params
+        try:
+            return WireFormat.negotiate(params.get("encoding"), params.get("fields"))
+        except ValueError as e:
+            logger.warning(f"{e}, falling back to json")
+            return DEFAULT_WIRE_FORMAT
+
+    def _connection(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        return self.active_connections.get(websocket) or self.obs_connections.get(websocket)
+
+    async def receive_message(self, websocket: WebSocket) -> dict:
+        """クライアントからのフレームを接続のエンコードでデコード"""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        connection = self._connection(websocket)
+        codec = connection.wire.codec if connection else DEFAULT_WIRE_FORMAT.codec
+        if message.get("bytes") is not None:
+            return codec.loads(message["bytes"])
+        return json.loads(message["text"])
+
+    async def negotiate(self, message_data: dict, websocket: WebSocket):
+        """
+        type: "hello" でエンコードとフィールド選択を変更
+
+        hello_ack は新しいエンコードで返す（未対応の指定ならそのまま error）。
+        """
+        connection = self._connection(websocket)
+        if connection is None:
+            return
+        try:
+            connection.wire = WireFormat.negotiate(message_data.get("encoding"), message_data.get("fields"))
+        except ValueError as e:
+            await self.send_message({"type": "error", "error": str(e)}, websocket)
+            return
+        if "audio" in message_data:
+            connection.inline_audio = message_data["audio"] == "inline"
+        await self.send_message({
+            "type": "hello_ack",
+            **connection.wire.describe(),
+            "audio": "inline" if connection.inline_audio else "url",
+            "available_encodings": available_encodings()
+        }, websocket)
+
+    def wants_inline_audio(self, websocket: WebSocket) -> bool:
+        connection = self._connection(websocket)
+        return connection is not None and connection.inline_audio
+
+    async def send_audio(self, frame: bytes, websocket: WebSocket):
+        """音声フレームを送信（キューが空くまで待つ）"""
+        connection = self._connection(websocket)
+        if connection is None:
+            return
+        if not await connection.put(frame):
+            logger.warning("Audio send timed out, disconnecting client")
+            registry = self.active_connections if websocket in self.active_connections else self.obs_connections
+            self._evict(connection, registry)
+
+    async def broadcast_audio_to_obs(self, frame: bytes):
+        """audio=inline のOBSクライアントに音声フレームを配信（遅いクライアントはキューが空くまで待つ）"""
+        await self._publish(BUS_CHANNEL_OBS_AUDIO, frame)
+
+    def _unregister(self, websocket: WebSocket, registry: Dict[WebSocket, ClientConnection]):
+        connection = registry.pop(websocket, None)
+        if connection is None:
+            return
+        connection.closed = True
+        if connection.writer_task and connection.writer_task is not asyncio.current_task():
+            connection.writer_task.cancel()
+
+    def _evict(self, connection: ClientConnection, registry: Dict[WebSocket, ClientConnection]):
+        """死んだ/詰まった接続を登録から外してクローズ"""
+        if connection.closed:
+            return
+        self._unregister(connection.websocket, registry)
+        asyncio.create_task(self._close_quietly(connection.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def connect(self, websocket: WebSocket):
+        await self._register(websocket, self.active_connections, WS_SEND_QUEUE_SIZE, drop_oldest=False)
         logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
 
     async def connect_obs(self, websocket: WebSocket):
-        await websocket.accept()
-        self.obs_connections.append(websocket)
+        await self._register(websocket, self.obs_connections, OBS_SEND_QUEUE_SIZE, drop_oldest=True)
         logger.info(f"New OBS connection. Total OBS: {len(self.obs_connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self._unregister(websocket, self.active_connections)
         logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
 
     def disconnect_obs(self, websocket: WebSocket):
-        self.obs_connections.remove(websocket)
+        self._unregister(websocket, self.obs_connections)
         logger.info(f"OBS disconnected. Total OBS: {len(self.obs_connections)}")
 
     async def send_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_json(message)
+        connection = self._connection(websocket)
+        if connection is None:
+            return
+        if not connection.enqueue(connection.wire.encode(message)):
+            logger.warning("Send queue overflow, disconnecting client")
+            registry = self.active_connections if websocket in self.active_connections else self.obs_connections
+            self._evict(connection, registry)
+
+    def _fan_out(self, message: dict, registry: Dict[WebSocket, ClientConnection]):
+        # シリアライズはエンコード設定（コーデック + フィールド選択）ごとに1回だけ
+        encoded = {}
+        for connection in list(registry.values()):
+            wire = connection.wire
+            payload = encoded.get(wire.key)
+            if payload is None:
+                payload = encoded[wire.key] = wire.encode(message)
+            if not connection.enqueue(payload):
+                self._evict(connection, registry)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+        await self._publish(BUS_CHANNEL_CHAT, message)
 
     async def broadcast_to_obs(self, message: dict):
-        """OBSクライアントに字幕をブロードキャスト"""
-        for connection in self.obs_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Failed to send to OBS: {e}")
+        """OBSクライアントに字幕をブロードキャスト（全ワーカー）"""
+        await self._publish(BUS_CHANNEL_OBS, message)
+
+    def encoding_counts(self) -> Dict[tuple, int]:
+        """(kind, encoding) ごとの接続数"""
+        counts: Dict[tuple, int] = {}
+        for kind, registry in (("chat", self.active_connections), ("obs", self.obs_connections)):
+            for connection in registry.values():
+                key = (kind, connection.wire.codec.name)
+                counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def queue_depths(self) -> Dict[str, int]:
+        """送信キューに溜まっているメッセージ数"""
+        return {
+            "chat": sum(c.queue.qsize() for c in self.active_connections.values()),
+            "obs": sum(c.queue.qsize() for c in self.obs_connections.values())
+        }
 
 manager = ConnectionManager()
 
@@ -105,39 +490,528 @@ async def root():
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url="/static/index.html")
 
+class HealthChecker:
+    """
+    依存サービスのヘルスチェック（並行プローブ + TTLキャッシュ）
+
+    ロードバランサーが毎秒ポーリングしても、プローブは TTL に1回だけ。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cached: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._cached is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def check(self) -> dict:
+        if self._fresh():
+            return self._cached
+
+        async with self._lock:
+            if self._fresh():
+                return self._cached
+
+            core, voice = await asyncio.gather(
+                self._probe(core_client, "/health/ready"),
+                self._probe(voice_client, "/health")
+            )
+            # Ollama は Core Service 経由で確認（モデルのロード状態を含む）
+            ollama = core.pop("detail", {}).get("ollama") or {"ready": False}
+            voice.pop("detail", None)
+
+            self._cached = {
+                "ready": core["status"] == "ok",
+                "probes": {"core": core, "voice": voice, "ollama": ollama},
+                "checked_at": time.time()
+            }
+            self._checked_at = time.monotonic()
+            return self._cached
+
+    @staticmethod
+    async def _probe(client: httpx.AsyncClient, path: str) -> dict:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, timeout=HEALTH_PROBE_TIMEOUT)
+            try:
+                detail = response.json()
+            except ValueError:
+                detail = {}
+            status = "ok" if response.status_code == 200 else "not_ready"
+            result = {"status": status, "detail": detail}
+        except Exception as e:
+            result = {"status": "down", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+health_checker = HealthChecker(HEALTH_CACHE_TTL)
+
 @app.get("/health")
 async def health_check():
+    health = await health_checker.check()
+    probes = health["probes"]
+    core_status = probes["core"]["status"]
+    voice_status = probes["voice"]["status"]
+
+    if core_status == "ok" and voice_status == "ok":
+        status = "healthy"
+    elif core_status == "ok":
+        status = "degraded"
+    else:
+        status = "unhealthy"
+
     return {
-        "status": "healthy",
+        "status": status,
+        "ready": health["ready"],
         "services": {
             "api": "ok",
-            "core": "checking...",
-            "voice": "checking...",
-            "evaluation": "checking..."
-        }
+            "core": core_status,
+            "voice": voice_status,
+            "evaluation": core_status  # 評価は Core Service 内で実行
+        },
+        "probes": probes,
+        "bus": manager.bus.status() if manager.bus else None,
+        "checked_at": health["checked_at"]
     }
 
+@app.get("/health/live")
+async def health_live():
+    """
+    Liveness: プロセスが応答できるか（依存サービスは見ない）
+    """
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Readiness: Core Serviceのモデルがロード済みの場合のみ 200
+    """
+    health = await health_checker.check()
+    return JSONResponse(
+        status_code=200 if health["ready"] else 503,
+        content={
+            "status": "ready" if health["ready"] else "not_ready",
+            "probes": health["probes"]
+        }
+    )
+
+# メトリクス
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "botan_gateway_upstream_request_seconds",
+    "Latency of gateway calls to core and voice services",
+    ["upstream", "endpoint", "outcome"]
+)
+CORE_FIRST_TOKEN = REGISTRY.histogram(
+    "botan_gateway_core_first_token_seconds",
+    "Time from request to first streamed token from core",
+    []
+)
+CHAT_REQUESTS = REGISTRY.counter(
+    "botan_gateway_chat_requests_total",
+    "Chat turns handled by the gateway",
+    ["transport", "outcome"]
+)
+CHAT_LATENCY = REGISTRY.histogram(
+    "botan_gateway_chat_seconds",
+    "End-to-end chat turn latency at the gateway",
+    ["transport", "outcome"]
+)
+CONVERSATIONS = REGISTRY.counter(
+    "botan_gateway_conversations_total",
+    "Distinct user_ids seen by the gateway (approximate: tracks the last SEEN_USERS_MAX users)",
+    []
+)
+REGISTRY.gauge(
+    "botan_gateway_connections",
+    "Open WebSocket connections",
+    ["kind"],
+    callback=lambda: {"chat": len(manager.active_connections), "obs": len(manager.obs_connections)}
+)
+REGISTRY.gauge(
+    "botan_gateway_connections_by_encoding",
+    "Open WebSocket connections by negotiated frame encoding",
+    ["kind", "encoding"],
+    callback=lambda: manager.encoding_counts()
+)
+REGISTRY.gauge(
+    "botan_gateway_send_queue_depth",
+    "Messages waiting in WebSocket send queues",
+    ["kind"],
+    callback=lambda: manager.queue_depths()
+)
+
+INLINE_AUDIO_BYTES = REGISTRY.counter(
+    "botan_gateway_inline_audio_bytes_total",
+    "Audio bytes pushed over WebSocket binary frames"
+)
+ADMISSION_REJECTED = REGISTRY.counter(
+    "botan_gateway_admission_rejected_total",
+    "Chat requests shed before reaching core",
+    ["reason"]
+)
+REGISTRY.gauge(
+    "botan_gateway_admission",
+    "Admitted in-flight chat turns and turns waiting for admission",
+    ["state"],
+    callback=lambda: {"inflight": admission.inflight, "queued": admission.waiting}
+)
+
+class OverloadedError(Exception):
+    """受け付けられないリクエスト（429 / type: busy で即時応答）"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """
+    user_id ごとのトークンバケット
+
+    バケットは LRU で最大 max_users 件まで保持する。
+    """
+
+    def __init__(self, rate: float, burst: int, max_users: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # user_id → [tokens, updated]
+
+    def check(self, user_id: str):
+        if self.rate <= 0:
+            return
+
+        now = time.monotonic()
+        bucket = self._buckets.pop(user_id, None) or [float(self.burst), now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+
+        self._buckets[user_id] = bucket
+        if len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+
+        if bucket[0] < 1.0:
+            ADMISSION_REJECTED.inc(reason="rate_limited")
+            raise OverloadedError("rate_limited", (1.0 - bucket[0]) / self.rate)
+        bucket[0] -= 1.0
+
+class AdmissionController:
+    """
+    全体の同時実行数を制限し、待ち行列が満杯なら即座に拒否する
+
+    過負荷時に全リクエストが遅くなるのではなく、受け付けたリクエストの
+    レイテンシを保つために早めに捨てる。
+    """
+
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_inflight) if max_inflight > 0 else None
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore is None:
+            yield
+            return
+
+        if not self._semaphore.locked():
+            # 空きがあれば待たずに取れる（wait_for を通すと取れるまでの間 waiting に数えてしまう）
+            await self._semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                ADMISSION_REJECTED.inc(reason="queue_full")
+                raise OverloadedError("queue_full", 1.0)
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                ADMISSION_REJECTED.inc(reason="queue_timeout")
+                raise OverloadedError("queue_timeout", 1.0)
+            finally:
+                self.waiting -= 1
+
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+
+rate_limiter = RateLimiter(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST, RATE_LIMIT_MAX_USERS)
+admission = AdmissionController(ADMISSION_MAX_INFLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+_seen_users: "OrderedDict[str, None]" = OrderedDict()  # 最近見た user_id（LRU）
+
+def _core_outcome(core_data: dict) -> str:
+    """Core が応答を生成できず定型文を返した（ok: false）ターンは fallback として数える"""
+    return "ok" if core_data.get("ok", True) else "fallback"
+
+def record_turn(transport: str, user_id: str, outcome: str, started: float):
+    """チャット1ターン分のメトリクスを記録"""
+    if user_id in _seen_users:
+        _seen_users.move_to_end(user_id)
+    else:
+        _seen_users[user_id] = None
+        if len(_seen_users) > SEEN_USERS_MAX:
+            _seen_users.popitem(last=False)
+        CONVERSATIONS.inc()
+    CHAT_REQUESTS.inc(transport=transport, outcome=outcome)
+    CHAT_LATENCY.observe(time.perf_counter() - started, transport=transport, outcome=outcome)
+
+COALESCED_REQUESTS = REGISTRY.counter(
+    "botan_gateway_coalesced_requests_total",
+    "Chat requests by single-flight role (leader calls core, others share its result)",
+    ["kind", "role"]
+)
+
+def normalize_message(message: str) -> str:
+    """
+    同一メッセージ判定用の正規化（全角/半角・大小文字・空白の揺れを吸収）
+    """
+    return " ".join(unicodedata.normalize("NFKC", message).lower().split())
+
+class _SharedStream:
+    """
+    1本のストリームを複数の購読者に配信（途中参加は先頭から再生）
+    """
+
+    def __init__(self, source):
+        self.events: List[dict] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = asyncio.Condition()
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for event in source:
+                async with self._cond:
+                    self.events.append(event)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.done or len(self.events) > index)
+                batch = self.events[index:]
+                index = len(self.events)
+                finished = self.done and index == len(self.events)
+            for event in batch:
+                yield event
+            if finished:
+                if self.error:
+                    raise self.error
+                return
+
+class SingleFlight:
+    """
+    同一キーのリクエストを1回のアップストリーム呼び出しにまとめる
+
+    実行中の呼び出しに相乗りし、完了後も window 秒間は結果を共有する。
+    呼び出しは独立したタスクで実行するので、先頭の要求者が切断しても
+    他の待機者には結果が届く。
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._streams: Dict[tuple, _SharedStream] = {}
+        # key → (有効期限, 結果)。window が一定なので挿入順 = 期限順
+        self._recent: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._recent:
+            key, (expires_at, _) = next(iter(self._recent.items()))
+            if expires_at > now:
+                break
+            self._recent.popitem(last=False)
+            self._streams.pop(key, None)
+
+    async def do(self, key: tuple, call):
+        self._prune()
+        if key in self._recent:
+            COALESCED_REQUESTS.inc(kind="blocking", role="replayed")
+            return self._recent[key][1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            COALESCED_REQUESTS.inc(kind="blocking", role="leader")
+            task = asyncio.create_task(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            COALESCED_REQUESTS.inc(kind="blocking", role="joined")
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: tuple, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if self.window > 0 and not task.cancelled() and task.exception() is None:
+            self._recent[key] = (time.monotonic() + self.window, task.result())
+
+    def stream(self, key: tuple, open_stream):
+        """
+        ストリームを共有して購読する（async generator を返す）
+        """
+        self._prune()
+        shared = self._streams.get(key)
+        if shared is None or (shared.done and (shared.error or key not in self._recent)):
+            COALESCED_REQUESTS.inc(kind="stream", role="leader")
+            shared = _SharedStream(open_stream())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda t: self._finish_stream(key, shared))
+        else:
+            COALESCED_REQUESTS.inc(kind="stream", role="replayed" if shared.done else "joined")
+        return shared.subscribe()
+
+    def _finish_stream(self, key: tuple, shared: _SharedStream):
+        if shared.error or self.window <= 0:
+            if self._streams.get(key) is shared:
+                self._streams.pop(key, None)
+            return
+        self._recent[key] = (time.monotonic() + self.window, None)
+
+coalescer = SingleFlight(COALESCE_WINDOW) if COALESCE_ENABLED else None
+
+def _is_upstream_failure(exc: Exception) -> bool:
+    """4xx はアップストリームの故障ではない"""
+    return not (isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500)
+
+core_breaker = CircuitBreaker(
+    "core",
+    default_timeout=CORE_TIMEOUT,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    timeout_floor=CORE_TIMEOUT_MIN,
+    is_failure=_is_upstream_failure
+)
+voice_breaker = CircuitBreaker(
+    "voice",
+    default_timeout=VOICE_TIMEOUT,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=BREAKER_RESET_TIMEOUT,
+    timeout_floor=VOICE_TIMEOUT_MIN,
+    is_failure=_is_upstream_failure
+)
+
+def _upstream_timeout(breaker: CircuitBreaker) -> httpx.Timeout:
+    return httpx.Timeout(breaker.timeout(), connect=HTTP_CONNECT_TIMEOUT)
+
+async def call_core_chat(user_message: str, user_id: str, enable_reflection: bool) -> dict:
+    """
+    Core Serviceの /chat を呼び出す（COALESCE_ENABLED 時は同一リクエストを集約）
+    """
+    if coalescer:
+        key = (normalize_message(user_message), user_id, enable_reflection)
+        return await coalescer.do(key, lambda: _post_core_chat(user_message, user_id, enable_reflection))
+    return await _post_core_chat(user_message, user_id, enable_reflection)
+
+async def _post_core_chat(user_message: str, user_id: str, enable_reflection: bool) -> dict:
+    with core_breaker.guard(), UPSTREAM_LATENCY.time(upstream="core", endpoint="/chat"):
+        core_response = await core_client.post(
+            "/chat",
+            json={
+                "message": user_message,
+                "user_id": user_id,
+                "enable_reflection": enable_reflection
+            },
+            timeout=_upstream_timeout(core_breaker)
+        )
+        core_response.raise_for_status()
+        return core_response.json()
+
+async def synthesize_voice(text: str) -> Optional[str]:
+    """
+    Voice Serviceで音声生成し、音声URLを返す（失敗時は None）
+    """
+    with voice_breaker.guard(), UPSTREAM_LATENCY.time(upstream="voice", endpoint="/synthesize"):
+        voice_response = await voice_client.post(
+            "/synthesize",
+            json={"text": text},
+            timeout=_upstream_timeout(voice_breaker)
+        )
+        voice_response.raise_for_status()
+        voice_data = voice_response.json()
+    if voice_data.get("status") == "success":
+        return f"/api/audio/{voice_data['filename']}"
+    return None
+
+async def synthesize_voice_or_skip(text: str):
+    """
+    音声合成（Voice Serviceが不調なら待たずに諦め、テキストだけ返せるようにする）
+
+    Returns:
+        (audio_url, audio_status)。audio_status は ok / skipped / failed
+    """
+    if not voice_breaker.available():
+        return None, "skipped"
+    try:
+        audio_url = await synthesize_voice(text)
+    except CircuitOpenError:
+        return None, "skipped"
+    except Exception as e:
+        logger.error(f"Voice synthesis failed: {e}")
+        return None, "failed"
+    return audio_url, "ok" if audio_url else "failed"
+
+async def stream_voice(text: str):
+    """
+    Voice Serviceの /synthesize/stream から生成中の音声をチャンク単位で返す
+    """
+    with voice_breaker.guard(), UPSTREAM_LATENCY.time(upstream="voice", endpoint="/synthesize/stream"):
+        async with voice_client.stream(
+            "POST",
+            "/synthesize/stream",
+            json={"text": text},
+            timeout=_upstream_timeout(voice_breaker)
+        ) as voice_response:
+            voice_response.raise_for_status()
+            async for chunk in voice_response.aiter_bytes(INLINE_AUDIO_FRAME_BYTES):
+                yield chunk
+
 # REST API - チャット
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """
     RESTful チャットエンドポイント
     """
+    try:
+        rate_limiter.check(request.user_id)
+        async with admission.admit():
+            return await _handle_rest_chat(request)
+    except OverloadedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Busy: {e.reason}",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
+
+async def _handle_rest_chat(request: ChatRequest) -> ChatResponse:
+    started = time.perf_counter()
+    outcome = "error"
     try:
         logger.info(f"Chat request from user_id={request.user_id}: {request.message}")
 
         # Core Serviceに転送
-        async with httpx.AsyncClient() as client:
-            core_response = await client.post(
-                f"{CORE_SERVICE_URL}/chat",
-                json={
-                    "message": request.message,
-                    "user_id": request.user_id,
-                    "enable_reflection": request.enable_reflection
-                },
-                timeout=30.0
-            )
-            core_data = core_response.json()
+        core_data = await call_core_chat(
+            request.message,
+            request.user_id,
+            request.enable_reflection
+        )
 
         botan_response = core_data.get("response", "...")
         reflection = core_data.get("reflection")
@@ -145,129 +1019,504 @@ async def chat(request: ChatRequest):
 
         # Voice Serviceで音声生成（enable_voice=True時）
         audio_url = None
+        audio_status = None
         if request.enable_voice:
-            async with httpx.AsyncClient() as client:
-                voice_response = await client.post(
-                    f"{VOICE_SERVICE_URL}/synthesize",
-                    json={"text": botan_response},
-                    timeout=30.0
-                )
-                voice_data = voice_response.json()
-                if voice_data.get("status") == "success":
-                    audio_url = f"/api/audio/{voice_data['filename']}"
+            audio_url, audio_status = await synthesize_voice_or_skip(botan_response)
 
         response = ChatResponse(
             response=botan_response,
             audio_url=audio_url,
+            audio_status=audio_status,
             reflection=reflection,
             reasoning=reasoning
         )
 
+        outcome = _core_outcome(core_data)
         return response
 
+    except CircuitOpenError as e:
+        outcome = "unavailable"
+        raise HTTPException(
+            status_code=503,
+            detail="Core service unavailable",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))}
+        )
     except httpx.TimeoutException:
         logger.error("Service timeout")
+        outcome = "timeout"
         raise HTTPException(status_code=504, detail="Service timeout")
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        record_turn("rest", request.user_id, outcome, started)
+
+class SentenceSegmenter:
+    """
+    ストリーミング応答を日本語の文末（。！？〜 など）で区切る
+
+    文末記号の連続（「！？」「〜！」）や直後の閉じ括弧は同じ文に含める。
+    短すぎる文は次の文とまとめて合成する。
+    """
+
+    BOUNDARY_CHARS = set("。！？!?〜～…♪\n")
+    CLOSING_CHARS = set("」』）)】\"'")
+
+    def __init__(self, min_chars: int = 4):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """トークンを追加し、確定した文を返す"""
+        self.buffer += delta
+        segments = []
+        start = 0
+        i = 0
+        length = len(self.buffer)
+
+        while i < length:
+            if self.buffer[i] not in self.BOUNDARY_CHARS:
+                i += 1
+                continue
+
+            # 文末記号と閉じ括弧の連続をまとめる
+            end = i + 1
+            while end < length and (
+                self.buffer[end] in self.BOUNDARY_CHARS or self.buffer[end] in self.CLOSING_CHARS
+            ):
+                end += 1
+
+            if end == length:
+                # 続きのトークンで記号が続く可能性があるので確定しない
+                break
+
+            segment = self.buffer[start:end].strip()
+            if len(segment) >= self.min_chars:
+                segments.append(segment)
+                start = end
+            i = end
+
+        self.buffer = self.buffer[start:]
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """残りのテキストを返す（応答完了時）"""
+        segment = self.buffer.strip()
+        self.buffer = ""
+        return segment or None
+
+class VoicePipeline:
+    """
+    文ごとに音声合成を並行して開始し、完成した音声URLを文の順に通知する
+    """
+
+    def __init__(self, on_chunk):
+        self.on_chunk = on_chunk
+        self.segmenter = SentenceSegmenter(min_chars=VOICE_SEGMENT_MIN_CHARS)
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.audio_urls: List[str] = []
+        self.submitted = 0
+        self.emitter = asyncio.create_task(self._emit_in_order())
+
+    def feed(self, delta: str):
+        for segment in self.segmenter.feed(delta):
+            self._submit(segment)
+
+    def _submit(self, text: str):
+        task = asyncio.create_task(self._synthesize(self.submitted, text))
+        self.pending.put_nowait((self.submitted, text, task))
+        self.submitted += 1
+
+    async def _synthesize(self, index: int, text: str) -> Optional[str]:
+        try:
+            return await synthesize_voice(text)
+        except Exception as e:
+            logger.error(f"Segment synthesis failed: {e}")
+        return None
+
+    async def _emit_in_order(self):
+        while True:
+            item = await self.pending.get()
+            if item is None:
+                return
+            await self._emit(*item)
+
+    async def _emit(self, index: int, text: str, task: asyncio.Task):
+        audio_url = await task
+        if audio_url:
+            self.audio_urls.append(audio_url)
+            await self.on_chunk(index, text, audio_url)
+
+    async def finish(self, full_text: str) -> List[str]:
+        """
+        残りのテキストを合成し、全チャンクの通知完了を待つ
+
+        Returns:
+            文の順に並んだ音声URLリスト
+        """
+        rest = self.segmenter.flush()
+        if rest:
+            self._submit(rest)
+        elif self.submitted == 0 and full_text:
+            # トークンが届かなかった場合（エラー応答など）は全文を合成
+            self._submit(full_text)
+        self.pending.put_nowait(None)
+        await self.emitter
+        return self.audio_urls
+
+    def cancel(self):
+        self.emitter.cancel()
+        while not self.pending.empty():
+            item = self.pending.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+class InlineVoicePipeline(VoicePipeline):
+    """
+    音声URLの代わりに、合成中の音声をバイナリフレームとして文の順に送る
+
+    後続の文も並行して合成し、順番が来るまでメモリにためておく。
+    on_chunk(index, seq, audio, last, ok) はフレームごとに呼ばれる。
+    """
+
+    def __init__(self, on_chunk):
+        self.buffers: Dict[int, asyncio.Queue] = {}
+        self.segments = 0
+        super().__init__(on_chunk)
+
+    def _submit(self, text: str):
+        self.buffers[self.submitted] = asyncio.Queue()
+        super()._submit(text)
+
+    async def _synthesize(self, index: int, text: str) -> bool:
+        buffer = self.buffers[index]
+        try:
+            async for chunk in stream_voice(text):
+                buffer.put_nowait(chunk)
+            return True
+        except Exception as e:
+            logger.error(f"Segment synthesis failed: {e}")
+            return False
+        finally:
+            buffer.put_nowait(None)
+
+    async def _emit(self, index: int, text: str, task: asyncio.Task):
+        buffer = self.buffers[index]
+        seq = 0
+        while True:
+            chunk = await buffer.get()
+            if chunk is None:
+                break
+            await self.on_chunk(index, seq, chunk, False, True)
+            seq += 1
+        del self.buffers[index]
+        ok = await task
+        await self.on_chunk(index, seq, b"", True, ok)
+        if ok:
+            self.segments += 1
+
+def stream_core_chat(user_message: str, user_id: str, enable_reflection: bool):
+    """
+    Core Serviceの /chat/stream (NDJSON) をイベント単位で返す
+    （COALESCE_ENABLED 時は同一リクエストでストリームを共有）
+    """
+    if coalescer:
+        key = ("stream", normalize_message(user_message), user_id, enable_reflection)
+        return coalescer.stream(key, lambda: _open_core_stream(user_message, user_id, enable_reflection))
+    return _open_core_stream(user_message, user_id, enable_reflection)
+
+async def _open_core_stream(user_message: str, user_id: str, enable_reflection: bool):
+    started = time.perf_counter()
+    first_token = True
+    # ストリームの所要時間は応答の長さで変わるため、タイムアウトのサンプルにしない
+    with core_breaker.guard(observe=False), UPSTREAM_LATENCY.time(upstream="core", endpoint="/chat/stream"):
+        async with core_client.stream(
+            "POST",
+            "/chat/stream",
+            json={
+                "message": user_message,
+                "user_id": user_id,
+                "enable_reflection": enable_reflection
+            },
+            timeout=_upstream_timeout(core_breaker)
+        ) as core_response:
+            core_response.raise_for_status()
+            async for line in core_response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if first_token and event.get("type") == "delta":
+                    CORE_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    first_token = False
+                yield event
 
 # WebSocket - リアルタイムチャット
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
     """
     WebSocketチャットエンドポイント（OBS連携用）
+
+    メッセージごとにタスクを起動し、1接続で複数リクエストを並行処理する。
+    応答は完了順に返り、request_id で対応付ける。
     """
     await manager.connect(websocket)
 
+    in_flight = set()
+    semaphore = asyncio.Semaphore(WS_MAX_INFLIGHT) if WS_MAX_INFLIGHT > 0 else None
+
+    async def run(message_data: dict, request_id: str):
+        try:
+            if semaphore:
+                async with semaphore:
+                    await handle_chat_message(message_data, request_id, websocket)
+            else:
+                await handle_chat_message(message_data, request_id, websocket)
+        except asyncio.CancelledError:
+            logger.info(f"Request {request_id} cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Request {request_id} failed: {e}")
+
     try:
         while True:
             # クライアントからメッセージ受信
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = await manager.receive_message(websocket)
 
             logger.info(f"WebSocket message: {message_data}")
 
-            user_message = message_data.get("message", "")
-            user_id = message_data.get("user_id", "default")
-            enable_voice = message_data.get("enable_voice", False)
-            enable_reflection = message_data.get("enable_reflection", False)
+            if message_data.get("type") == "hello":
+                await manager.negotiate(message_data, websocket)
+                continue
 
-            # Core Serviceに転送して応答取得
-            try:
-                async with httpx.AsyncClient() as client:
-                    core_response = await client.post(
-                        f"{CORE_SERVICE_URL}/chat",
-                        json={
-                            "message": user_message,
-                            "user_id": user_id,
-                            "enable_reflection": enable_reflection
-                        },
-                        timeout=30.0
-                    )
-                    core_data = core_response.json()
-
-                botan_response = core_data.get("response", "...")
-                reflection = core_data.get("reflection")
-                reasoning = core_data.get("reasoning")
-
-                # Voice Serviceで音声生成（enable_voice=True時）
-                audio_url = None
-                if enable_voice:
-                    async with httpx.AsyncClient() as client:
-                        voice_response = await client.post(
-                            f"{VOICE_SERVICE_URL}/synthesize",
-                            json={"text": botan_response},
-                            timeout=30.0
-                        )
-                        voice_data = voice_response.json()
-                        if voice_data.get("status") == "success":
-                            audio_url = f"/api/audio/{voice_data['filename']}"
-
-                # レスポンス作成
-                response = {
-                    "type": "chat_response",
-                    "response": botan_response,
-                    "audio_url": audio_url,
-                    "reflection": reflection,
-                    "reasoning": reasoning,
-                    "timestamp": message_data.get("timestamp")
-                }
-
-            except httpx.TimeoutException:
-                logger.error("Service timeout in WebSocket")
-                response = {
-                    "type": "error",
-                    "error": "Service timeout",
-                    "timestamp": message_data.get("timestamp")
-                }
-            except Exception as e:
-                logger.error(f"Error in WebSocket chat: {e}")
-                response = {
-                    "type": "error",
-                    "error": str(e),
-                    "timestamp": message_data.get("timestamp")
-                }
-
-            # レスポンス送信
-            await manager.send_message(response, websocket)
-
-            # OBSクライアントに字幕を送信
-            if response.get("type") == "chat_response":
-                subtitle_data = {
-                    "type": "subtitle",
-                    "text": response.get("response"),
-                    "speaker": "botan",
-                    "timestamp": response.get("timestamp")
-                }
-                await manager.broadcast_to_obs(subtitle_data)
+            request_id = str(message_data.get("request_id") or uuid.uuid4().hex)
+            task = asyncio.create_task(run(message_data, request_id))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         logger.info("Client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+    finally:
         manager.disconnect(websocket)
+        # 切断時は処理中のリクエストをキャンセル
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+async def handle_chat_message(message_data: dict, request_id: str, websocket: WebSocket):
+    """
+    /ws/chat の1リクエストを処理（レート制限・アドミッション制御付き）
+
+    受け付けられない場合は即座に type: "busy" を返す。
+    """
+    try:
+        rate_limiter.check(message_data.get("user_id", "default"))
+        async with admission.admit():
+            await process_chat_message(message_data, request_id, websocket)
+    except OverloadedError as e:
+        await manager.send_message({
+            "type": "busy",
+            "request_id": request_id,
+            "reason": e.reason,
+            "retry_after": round(e.retry_after, 2),
+            "timestamp": message_data.get("timestamp")
+        }, websocket)
+
+async def process_chat_message(message_data: dict, request_id: str, websocket: WebSocket):
+    """
+    /ws/chat の1リクエストを処理（Core → Voice → 送信 → OBS字幕）
+    """
+    user_message = message_data.get("message", "")
+    user_id = message_data.get("user_id", "default")
+    enable_voice = message_data.get("enable_voice", False)
+    enable_reflection = message_data.get("enable_reflection", False)
+    stream = message_data.get("stream", False)
+
+    # Voice Serviceが停止中（ブレーカー open）なら音声を待たずにテキストだけ返す
+    audio_status = None
+    if enable_voice and not voice_breaker.available():
+        enable_voice = False
+        audio_status = "skipped"
+    voice_pipeline = enable_voice and message_data.get("voice_pipeline", VOICE_PIPELINE_ENABLED)
+    inline_audio = enable_voice and message_data.get("inline_audio", manager.wants_inline_audio(websocket))
+    timestamp = message_data.get("timestamp")
+    started = time.perf_counter()
+
+    async def send_audio_chunk(index: int, text: str, audio_url: str):
+        await manager.send_message({
+            "type": "audio_chunk",
+            "request_id": request_id,
+            "index": index,
+            "text": text,
+            "audio_url": audio_url,
+            "timestamp": timestamp
+        }, websocket)
+
+    async def send_audio_frame(index: int, seq: int, audio: bytes, last: bool, ok: bool):
+        header = {"request_id": request_id, "segment": index, "seq": seq, "last": last}
+        if last:
+            header["ok"] = ok
+        frame = encode_audio_frame(header, audio)
+        INLINE_AUDIO_BYTES.inc(len(audio))
+        await manager.send_audio(frame, websocket)
+        await manager.broadcast_audio_to_obs(frame)
+
+    pipeline = None
+    events = None
+    core_data = {}
+
+    # Core Serviceに転送して応答取得
+    try:
+        audio_url = None
+        audio_urls = None
+
+        if stream or voice_pipeline or enable_reflection:
+            # トークンを受信次第 chat_delta / subtitle_delta として転送し、
+            # 文が完成するたびに音声合成を開始。
+            # 反射ありの場合もストリームを使い、応答を先に返して反射は後続フレームで送る
+            if voice_pipeline:
+                pipeline = InlineVoicePipeline(send_audio_frame) if inline_audio else VoicePipeline(send_audio_chunk)
+            events = stream_core_chat(user_message, user_id, enable_reflection)
+            async for event in events:
+                if event.get("type") == "delta":
+                    if pipeline:
+                        pipeline.feed(event["content"])
+                    if not stream:
+                        continue
+                    await manager.send_message({
+                        "type": "chat_delta",
+                        "request_id": request_id,
+                        "delta": event["content"],
+                        "timestamp": timestamp
+                    }, websocket)
+                    await manager.broadcast_to_obs({
+                        "type": "subtitle_delta",
+                        "request_id": request_id,
+                        "delta": event["content"],
+                        "speaker": "botan",
+                        "timestamp": timestamp
+                    })
+                elif event.get("type") == "done":
+                    # 残り（反射の後続イベント）は応答を送った後に読む
+                    core_data = event
+                    break
+        else:
+            core_data = await call_core_chat(user_message, user_id, enable_reflection)
+
+        botan_response = core_data.get("response", "...")
+        reflection = core_data.get("reflection")
+        reasoning = core_data.get("reasoning")
+
+        # Voice Serviceで音声生成（enable_voice=True時）
+        audio_segments = None
+        if inline_audio and not pipeline:
+            # 文ごとに区切らない場合も、全文を1セグメントとしてストリーム送信
+            pipeline = InlineVoicePipeline(send_audio_frame)
+        if pipeline:
+            audio_urls = await pipeline.finish(botan_response)
+            if inline_audio:
+                audio_segments = pipeline.segments
+            audio_status = "ok" if audio_urls or audio_segments else "failed"
+            pipeline = None
+            audio_url = audio_urls[0] if audio_urls else None
+        elif enable_voice:
+            audio_url, audio_status = await synthesize_voice_or_skip(botan_response)
+
+        # レスポンス作成（ストリーミング時は chat_done で完了を通知）
+        response = {
+            "type": "chat_done" if stream else "chat_response",
+            "request_id": request_id,
+            "response": botan_response,
+            "audio_url": audio_url,
+            "audio_urls": audio_urls,
+            "audio_status": audio_status,
+            "reflection": reflection,
+            "reasoning": reasoning,
+            "timestamp": timestamp
+        }
+        if inline_audio:
+            # 音声はこのフレームより前にバイナリフレームで送信済み
+            response["audio_inline"] = True
+            response["audio_segments"] = audio_segments
+
+    except CircuitOpenError as e:
+        response = {
+            "type": "error",
+            "request_id": request_id,
+            "error": "Service unavailable",
+            "retry_after": round(e.retry_after, 2),
+            "timestamp": timestamp
+        }
+    except httpx.TimeoutException:
+        logger.error("Service timeout in WebSocket")
+        response = {
+            "type": "error",
+            "request_id": request_id,
+            "error": "Service timeout",
+            "timestamp": timestamp
+        }
+    except Exception as e:
+        logger.error(f"Error in WebSocket chat: {e}")
+        response = {
+            "type": "error",
+            "request_id": request_id,
+            "error": str(e),
+            "timestamp": timestamp
+        }
+    finally:
+        if pipeline:
+            pipeline.cancel()
+
+    if response["type"] == "error":
+        outcome = {
+            "Service timeout": "timeout",
+            "Service unavailable": "unavailable"
+        }.get(response["error"], "error")
+    else:
+        outcome = _core_outcome(core_data)
+    record_turn("ws", user_id, outcome, started)
+
+    # レスポンス送信
+    await manager.send_message(response, websocket)
+
+    # OBSクライアントに字幕を送信
+    if response.get("type") in ("chat_response", "chat_done"):
+        subtitle_data = {
+            "type": "subtitle_done" if stream else "subtitle",
+            "request_id": request_id,
+            "text": response.get("response"),
+            "speaker": "botan",
+            "timestamp": response.get("timestamp")
+        }
+        await manager.broadcast_to_obs(subtitle_data)
+
+    if events is not None:
+        await send_reflection_followup(events, core_data, request_id, timestamp, websocket)
+
+async def send_reflection_followup(events, core_data: dict, request_id: str, timestamp, websocket: WebSocket):
+    """
+    応答より後に完了した反射+推論を reflection フレームで送る
+
+    Core が REFLECTION_TIMING=parallel で動いている場合、done は reflection_pending: true で届き、
+    反射の結果は同じストリームの後続イベントになる。
+    """
+    try:
+        # done の後はストリームの終わりまで読み切る（途中で閉じると失敗として計測される）
+        async for event in events:
+            if event.get("type") == "reflection" and core_data.get("reflection_pending"):
+                await manager.send_message({
+                    "type": "reflection",
+                    "request_id": request_id,
+                    "reflection": event.get("reflection"),
+                    "reasoning": event.get("reasoning"),
+                    "timestamp": timestamp
+                }, websocket)
+    except Exception as e:
+        logger.warning(f"Reflection follow-up for {request_id} failed: {e}")
+    finally:
+        await events.aclose()
 
 # WebSocket - OBS字幕配信
 @app.websocket("/ws/obs")
@@ -281,13 +1530,15 @@ async def websocket_obs(websocket: WebSocket):
     try:
         while True:
             # OBSからのメッセージ受信（接続維持用）
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = await manager.receive_message(websocket)
 
             logger.info(f"OBS WebSocket message: {message_data}")
 
+            if message_data.get("type") == "hello":
+                await manager.negotiate(message_data, websocket)
+
             # 接続確認メッセージ
-            if message_data.get("type") == "obs_connect":
+            elif message_data.get("type") == "obs_connect":
                 await manager.send_message({
                     "type": "connected",
                     "message": "OBS connected successfully"
@@ -302,32 +1553,64 @@ async def websocket_obs(websocket: WebSocket):
 
 # 音声エンドポイント
 @app.get("/api/audio/{filename}")
-async def get_audio(filename: str):
+async def get_audio(filename: str, request: Request):
     """
     生成された音声ファイルを取得
-    """
-    try:
-        # Voice Serviceから音声ファイル取得
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{VOICE_SERVICE_URL}/audio/{filename}",
-                timeout=10.0
-            )
 
-            if response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Audio file not found")
+    Voice Serviceの応答をバッファせずにそのまま中継する。
+    Range / If-None-Match はアップストリームに転送し、206 / 304 もそのまま返す。
+    """
+    forward_headers = {
+        name: request.headers[name]
+        for name in AUDIO_FORWARD_REQUEST_HEADERS
+        if name in request.headers
+    }
 
-            return Response(
-                content=response.content,
-                media_type="audio/mpeg",
-                headers={"Content-Disposition": f"inline; filename={filename}"}
-            )
+    try:
+        # Voice Serviceから音声ファイル取得（ストリーミング）
+        upstream_request = voice_client.build_request(
+            "GET",
+            f"/audio/{filename}",
+            headers=forward_headers,
+            timeout=AUDIO_TIMEOUT
+        )
+        with UPSTREAM_LATENCY.time(upstream="voice", endpoint="/audio"):
+            upstream = await voice_client.send(upstream_request, stream=True)
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Voice service timeout")
     except Exception as e:
         logger.error(f"Audio fetch error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if upstream.status_code == 404:
+        await upstream.aclose()
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    if upstream.status_code not in (200, 206, 304):
+        await upstream.aclose()
+        raise HTTPException(status_code=502, detail=f"Voice service returned {upstream.status_code}")
+
+    headers = {
+        name: upstream.headers[name]
+        for name in AUDIO_PASSTHROUGH_RESPONSE_HEADERS
+        if name in upstream.headers
+    }
+    # ファイル名はテキストのハッシュなので内容は変わらない
+    headers["Cache-Control"] = AUDIO_CACHE_CONTROL
+    headers["Content-Disposition"] = f"inline; filename={filename}"
+
+    if upstream.status_code == 304:
+        await upstream.aclose()
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        media_type="audio/mpeg",
+        headers=headers,
+        background=BackgroundTask(upstream.aclose)
+    )
+
 # 設定エンドポイント
 @app.get("/api/config")
 async def get_config():
@@ -359,13 +1642,32 @@ async def get_stats():
     """
     会話統計取得
     """
+    # 評価スコアは Core Service が集計している
+    average_score = 0.0
+    try:
+        core_stats = (await core_client.get("/stats", timeout=2.0)).json()
+        average_score = core_stats.get("average_score", 0.0)
+    except Exception as e:
+        logger.warning(f"Core stats unavailable: {e}")
+
     return {
-        "total_conversations": 0,
-        "total_turns": 0,
-        "average_score": 0.0,
-        "active_connections": len(manager.active_connections)
+        "total_conversations": int(CONVERSATIONS.value()),
+        "total_turns": int(CHAT_REQUESTS.value(outcome="ok")),
+        "average_score": average_score,
+        "active_connections": len(manager.active_connections),
+        "obs_connections": len(manager.obs_connections),
+        "send_queue_depth": manager.queue_depths(),
+        "breakers": breaker_snapshots(),
+        "metrics": REGISTRY.snapshot()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus メトリクス
+    """
+    return Response(content=REGISTRY.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Gateway Latency Benchmark
+API Gatewayとアップストリーム呼び出しのレイテンシ計測
+
+Usage:
+    python benchmark_gateway.py pool [--url URL] [-n N]
+    python benchmark_gateway.py chat [--url URL] [-n N] [--concurrency C]
+    python benchmark_gateway.py ttft [--ws-url URL] [-n N]
+    python benchmark_gateway.py crowd [--url URL] [-n N] [--message TEXT]
+    python benchmark_gateway.py encode [--subscribers S] [-n N]
+    python benchmark_gateway.py reflection [--ollama-host URL] [--model M] [-n N]
+
+モデルのないマシンでは scripts/fake_ollama.py を起動し、Core の OLLAMA_HOST
+（reflection では --ollama-host）をそこに向けると同じ手順で計測できる。
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+def summarize(name, samples):
+    """レイテンシ統計を表示（ミリ秒）"""
+    samples = sorted(samples)
+    n = len(samples)
+    if n == 0:
+        print(f"{name:28s}: no samples")
+        return
+
+    def pct(p):
+        return samples[min(n - 1, int(n * p))]
+
+    print(
+        f"{name:28s}: n={n:4d} "
+        f"mean={statistics.mean(samples):7.2f}ms "
+        f"p50={pct(0.50):7.2f}ms "
+        f"p95={pct(0.95):7.2f}ms "
+        f"p99={pct(0.99):7.2f}ms"
+    )
+
+async def bench_new_client_per_request(url, n):
+    """変更前: リクエスト毎にAsyncClientを生成"""
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            await client.get(url, timeout=10.0)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def bench_shared_client(url, n):
+    """変更後: keep-alive付き共有AsyncClient"""
+    samples = []
+    async with httpx.AsyncClient() as client:
+        # 最初の接続確立は計測から除外
+        await client.get(url, timeout=10.0)
+        for _ in range(n):
+            start = time.perf_counter()
+            await client.get(url, timeout=10.0)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def run_pool(args):
+    print("=" * 60)
+    print("Connection Pool Benchmark (before / after)")
+    print(f"Target: {args.url}")
+    print("=" * 60)
+
+    before = await bench_new_client_per_request(args.url, args.n)
+    after = await bench_shared_client(args.url, args.n)
+
+    summarize("before: client per request", before)
+    summarize("after: shared pool", after)
+
+    saved = statistics.mean(before) - statistics.mean(after)
+    print(f"\nSaved per call: {saved:.2f}ms")
+
+async def run_chat(args):
+    print("=" * 60)
+    print("REST /api/chat Latency Benchmark")
+    print(f"Target: {args.url}  concurrency={args.concurrency}")
+    print("=" * 60)
+
+    samples = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(args.url, json={
+                        "message": f"ベンチマーク #{i}",
+                        "user_id": f"bench_{i % args.concurrency}",
+                        "enable_voice": args.voice
+                    })
+                    response.raise_for_status()
+                    samples.append((time.perf_counter() - start) * 1000)
+                except Exception as e:
+                    errors += 1
+                    print(f"  request #{i} failed: {e}")
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.n)))
+        wall = time.perf_counter() - wall_start
+
+    summarize("/api/chat", samples)
+    print(f"errors={errors}  throughput={len(samples) / wall:.2f} req/s")
+
+async def run_ttft(args):
+    """/ws/chat のストリーミング有無で最初の文字が届くまでの時間を比較"""
+    import websockets
+
+    print("=" * 60)
+    print("WebSocket Time-To-First-Token Benchmark")
+    print(f"Target: {args.ws_url}")
+    print("=" * 60)
+
+    results = {}
+    async with websockets.connect(args.ws_url) as websocket:
+        for stream in (False, True):
+            ttft, total = [], []
+            failures = {"busy": 0, "error": 0}
+            for i in range(args.n):
+                request_id = f"bench-{int(stream)}-{i}"
+                start = time.perf_counter()
+                await websocket.send(json.dumps({
+                    "type": "chat",
+                    "request_id": request_id,
+                    "message": f"ベンチマーク #{i}",
+                    "user_id": "bench_ttft",
+                    "stream": stream,
+                    "timestamp": time.time()
+                }))
+                first = None
+                while True:
+                    frame = await websocket.recv()
+                    if isinstance(frame, bytes):
+                        continue  # インライン音声
+                    data = json.loads(frame)
+                    if data.get("request_id") != request_id:
+                        continue  # 前のリクエストの後続フレーム（反射など）
+                    kind = data.get("type")
+                    # busy（混雑で拒否）と error も終端。失敗は件数だけ数え、レイテンシには入れない
+                    if kind in failures:
+                        failures[kind] += 1
+                        break
+                    if first is None and kind in ("chat_delta", "chat_response", "chat_done"):
+                        first = (time.perf_counter() - start) * 1000
+                    if kind in ("chat_response", "chat_done"):
+                        ttft.append(first)
+                        total.append((time.perf_counter() - start) * 1000)
+                        break
+            results[stream] = (ttft, total, failures)
+
+    for stream, (ttft, total, failures) in results.items():
+        label = "stream" if stream else "blocking"
+        summarize(f"{label}: first token", ttft)
+        summarize(f"{label}: full reply", total)
+        print(f"{label + ': failed':28s}: busy={failures['busy']} error={failures['error']}")
+
+async def run_crowd(args):
+    """同じメッセージを同時に送る（配信中のコメント連投を再現）"""
+    print("=" * 60)
+    print("Crowd Spam Benchmark (identical concurrent messages)")
+    print(f"Target: {args.url}  n={args.n}  message={args.message}")
+    print("=" * 60)
+
+    samples = []
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        async def one():
+            start = time.perf_counter()
+            response = await client.post(args.url, json={
+                "message": args.message,
+                "user_id": args.user_id
+            })
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.n)))
+        wall = time.perf_counter() - wall_start
+
+        stats_url = args.url.replace("/api/chat", "/api/stats")
+        stats = (await client.get(stats_url)).json()
+
+    summarize("/api/chat (crowd)", samples)
+    print(f"wall={wall * 1000:.2f}ms")
+    for sample in stats.get("metrics", {}).get("botan_gateway_coalesced_requests_total", []):
+        print(f"  coalesced {sample['labels']}: {int(sample['value'])}")
+
+def sample_chat_response():
+    """反射・推論付きの典型的な chat_response"""
+    return {
+        "type": "chat_response",
+        "request_id": "0f3c9a2e5b7d4e1f8a6c2b9d0e4f7a1c",
+        "response": "え、マジで！？オジサンそれめっちゃいいじゃん〜！牡丹も行ってみたいかも♪ 今度どんな感じだったか教えてね！",
+        "audio_url": "/api/audio/botan_1a2b3c4d5e6f.mp3",
+        "audio_urls": ["/api/audio/botan_1a2b3c4d5e6f.mp3", "/api/audio/botan_6f5e4d3c2b1a.mp3"],
+        "reflection": {
+            "intent": "週末に行った場所の話を共有したい",
+            "emotion": "喜び",
+            "key_points": ["週末", "カフェ", "新しいお店"],
+            "tone": "カジュアル"
+        },
+        "reasoning": {
+            "approach": "共感して話を広げる",
+            "botan_elements": ["明るさ", "ギャル語", "好奇心"],
+            "avoid": ["説教", "知識をひけらかす"],
+            "direction": "楽しそうに反応して詳細を聞く"
+        },
+        "timestamp": 1760000000.123
+    }
+
+def run_encode(args):
+    """コーデック・フィールド選択ごとのシリアライズコストとフレームサイズ（オフライン）"""
+    from ws_codec import WireFormat, available_encodings
+
+    print("=" * 60)
+    print("WebSocket Frame Encoding Benchmark")
+    print(f"subscribers={args.subscribers}  frames={args.n}  available={available_encodings()}")
+    print("=" * 60)
+
+    message = sample_chat_response()
+    subtitle_fields = "text,delta,response,speaker"
+
+    variants = []
+    for encoding in available_encodings():
+        variants.append((f"{encoding}", WireFormat.negotiate(encoding)))
+        variants.append((f"{encoding} +fields", WireFormat.negotiate(encoding, subtitle_fields)))
+
+    print(f"{'variant':20s} {'bytes':>6s} {'encode':>9s} {'fan-out/sub':>12s} {'fan-out/once':>13s} {'wire total':>11s}")
+    for name, wire in variants:
+        payload = wire.encode(message)
+        size = len(payload if isinstance(payload, bytes) else payload.encode("utf-8"))
+
+        start = time.perf_counter()
+        for _ in range(args.n):
+            wire.encode(message)
+        per_frame = (time.perf_counter() - start) / args.n
+
+        # 変更前の送り方: 購読者ごとにエンコード
+        start = time.perf_counter()
+        for _ in range(args.subscribers):
+            wire.encode(message)
+        per_subscriber = time.perf_counter() - start
+
+        # 変更後の送り方: エンコード設定ごとに1回
+        start = time.perf_counter()
+        shared = wire.encode(message)
+        payloads = [shared for _ in range(args.subscribers)]
+        once = time.perf_counter() - start
+
+        print(
+            f"{name:20s} {size:6d} "
+            f"{per_frame * 1e6:7.2f}us "
+            f"{per_subscriber * 1000:10.2f}ms "
+            f"{once * 1000:11.3f}ms "
+            f"{size * len(payloads) / 1024:9.1f}KB"
+        )
+
+REFLECTION_INPUTS = [
+    "今日めっちゃ疲れた...",
+    "牡丹って何歳？",
+    "最近何してる？",
+    "週末に新しいカフェ行ってきたよ！",
+    "仕事でミスして怒られちゃった"
+]
+
+async def run_reflection(args):
+    """反射+推論: 2回呼び出し（two_pass）と構造化出力1回（single_pass）の比較（Ollama直接）"""
+    from ollama_client import OllamaClient
+    from reflection_reasoning import REFLECTION_RESULTS, ReflectionReasoningSystem
+
+    print("=" * 60)
+    print("Reflection A/B Benchmark (two_pass vs single_pass)")
+    print(f"Ollama: {args.ollama_host}  model={args.model}  n={args.n}")
+    print("=" * 60)
+
+    profile = "17歳の明るく元気な女子高生ギャル「牡丹」"
+    client = OllamaClient(args.ollama_host, timeout=120.0, keep_alive="30m")
+    system = ReflectionReasoningSystem(model_name=args.model, client=client)
+
+    async def two_pass(text):
+        reflection = await system.reflect_async(text)
+        return reflection, await system.reason_async(text, reflection, profile)
+
+    async def single_pass(text):
+        return await system.reflect_and_reason_async(text, "", profile)
+
+    try:
+        # モデルのロードは計測から除外
+        await client.generate(args.model, timeout=300.0)
+
+        # 交互に実行して、時間帯による差（他の負荷など）を両方に均等にかける
+        samples = {"two_pass": [], "single_pass": []}
+        for i in range(args.n):
+            text = REFLECTION_INPUTS[i % len(REFLECTION_INPUTS)]
+            for mode, run in (("two_pass", two_pass), ("single_pass", single_pass)):
+                start = time.perf_counter()
+                await run(text)
+                samples[mode].append((time.perf_counter() - start) * 1000)
+    finally:
+        await client.aclose()
+
+    for mode, values in samples.items():
+        summarize(mode, values)
+    for sample in REFLECTION_RESULTS.snapshot():
+        print(f"  {sample['labels']}: {int(sample['value'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Botan gateway latency benchmark")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    pool = sub.add_parser("pool", help="per-request client vs shared pool")
+    pool.add_argument("--url", default="http://localhost:8001/health")
+    pool.add_argument("-n", type=int, default=200)
+
+    chat = sub.add_parser("chat", help="end-to-end /api/chat latency")
+    chat.add_argument("--url", default="http://localhost:8000/api/chat")
+    chat.add_argument("-n", type=int, default=20)
+    chat.add_argument("--concurrency", type=int, default=1)
+    chat.add_argument("--voice", action="store_true")
+
+    ttft = sub.add_parser("ttft", help="WebSocket time-to-first-token, blocking vs stream")
+    ttft.add_argument("--ws-url", default="ws://localhost:8000/ws/chat")
+    ttft.add_argument("-n", type=int, default=10)
+
+    crowd = sub.add_parser("crowd", help="identical concurrent messages (single-flight)")
+    crowd.add_argument("--url", default="http://localhost:8000/api/chat")
+    crowd.add_argument("-n", type=int, default=30)
+    crowd.add_argument("--message", default="こんにちは")
+    crowd.add_argument("--user-id", default="stream_chat")
+
+    encode = sub.add_parser("encode", help="frame serialization cost and size per encoding (offline)")
+    encode.add_argument("--subscribers", type=int, default=500)
+    encode.add_argument("-n", type=int, default=5000)
+
+    reflection = sub.add_parser("reflection", help="reflection two-call vs single structured call (Ollama)")
+    reflection.add_argument("--ollama-host", default="http://localhost:11434")
+    reflection.add_argument("--model", default="qwen2.5:3b")
+    reflection.add_argument("-n", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.mode == "pool":
+        asyncio.run(run_pool(args))
+    elif args.mode == "chat":
+        asyncio.run(run_chat(args))
+    elif args.mode == "ttft":
+        asyncio.run(run_ttft(args))
+    elif args.mode == "crowd":
+        asyncio.run(run_crowd(args))
+    elif args.mode == "encode":
+        run_encode(args)
+    elif args.mode == "reflection":
+        asyncio.run(run_reflection(args))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nBenchmark interrupted by user")
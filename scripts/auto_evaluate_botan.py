@@ -2,27 +2,87 @@
 """
 牡丹キャラクター性 AI自動評価スクリプト
 Claude Codeが自動で評価を10回繰り返す
+
+全イテレーションの質問を Core Service の /chat/batch にまとめて投げ、
+EVAL_CONCURRENCY 件ずつ並列に処理する。Core に接続できない場合や
+バッチが途中で失敗した場合は、残りを Ollama に1件ずつ直接問い合わせる。
 """
 
+import os
 import requests
 import json
 from datetime import datetime
 import time
 
-def ask_botan(prompt, model="elyza:botan_v2"):
-    """牡丹に質問"""
-    url = "http://localhost:11434/api/generate"
+from ollama_client import OllamaSyncClient
 
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
+CORE_SERVICE_URL = os.getenv("CORE_SERVICE_URL", "http://localhost:8001")
+EVAL_MODEL = os.getenv("EVAL_MODEL", "elyza:botan_v2")
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+
+def ask_botan_batch(prompts, model=EVAL_MODEL, concurrency=EVAL_CONCURRENCY):
+    """
+    Core Service の /chat/batch で質問をまとめて処理
+
+    Yields:
+        dict: 終わった順の result イベント（index で prompts と対応）、最後に summary
+    """
+    response = requests.post(
+        f"{CORE_SERVICE_URL}/chat/batch",
+        json={"prompts": prompts, "model": model, "concurrency": concurrency},
+        stream=True,
+        timeout=(5, 300)
+    )
+    response.raise_for_status()
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            yield json.loads(line)
+
+def ask_all(prompts, model=EVAL_MODEL):
+    """
+    全質問の応答を prompts と同じ順で返す
 
+    バッチが途中で失敗したり一部の結果が返らなかった場合は、
+    応答のない質問だけ Ollama に1件ずつ問い合わせる。
+
+    Returns:
+        tuple: (応答のリスト, バッチのスループット情報 or None)
+    """
+    responses = [None] * len(prompts)
+    summary = None
+    try:
+        done = 0
+        for event in ask_botan_batch(prompts, model):
+            if event.get("type") == "summary":
+                summary = event
+                continue
+            done += 1
+            response = event["response"] if event.get("ok") else f"エラー: {event.get('error')}"
+            responses[event["index"]] = response
+            print(f"  [{done}/{len(prompts)}] {event['prompt']} → {response[:40]}")
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Core Service ({CORE_SERVICE_URL}) のバッチ処理に失敗しました: {e}")
+
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if not missing:
+        return responses, summary
+
+    print(f"⚠️ {len(missing)}件の応答がないため、Ollama に1件ずつ問い合わせます")
+    # Core を通さずに問い合わせる（接続先は OLLAMA_HOST）
+    llm = OllamaSyncClient()
+    try:
+        for i in missing:
+            responses[i] = ask_botan(llm, prompts[i], model)
+            # API負荷軽減のため少し待機
+            time.sleep(0.5)
+    finally:
+        llm.close()
+    return responses, summary
+
+def ask_botan(llm, prompt, model=EVAL_MODEL):
+    """牡丹に質問"""
     try:
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        result = response.json()
+        result = llm.generate(model, prompt, timeout=30)
         return result['response']
     except Exception as e:
         return f"エラー: {e}"
@@ -283,7 +343,7 @@ def run_auto_evaluation(num_iterations=10):
     all_results = {
         "evaluator": "AI (Claude Code)",
         "timestamp": datetime.now().isoformat(),
-        "model": "elyza:botan_v2",
+        "model": EVAL_MODEL,
         "num_iterations": num_iterations,
         "iterations": []
     }
@@ -293,6 +353,19 @@ def run_auto_evaluation(num_iterations=10):
     print(f"繰り返し回数: {num_iterations}回")
     print("="*70)
 
+    # 全イテレーションの質問を先にまとめて投げる
+    prompts = [
+        prompt
+        for _ in range(num_iterations)
+        for category_data in test_cases
+        for prompt in category_data["tests"]
+    ]
+    print(f"\n📨 {len(prompts)}件の質問を処理中（並列 {EVAL_CONCURRENCY}）...")
+    responses, batch_summary = ask_all(prompts)
+    if batch_summary:
+        all_results["throughput"] = batch_summary
+    next_response = iter(responses)
+
     for iteration in range(1, num_iterations + 1):
         print(f"\n{'='*70}")
         print(f"🔄 イテレーション {iteration}/{num_iterations}")
@@ -316,8 +389,8 @@ def run_auto_evaluation(num_iterations=10):
             for prompt in tests:
                 print(f"  質問: {prompt}")
 
-                # 牡丹に質問
-                response = ask_botan(prompt)
+                # 牡丹の応答（バッチで取得済み）
+                response = next(next_response)
                 print(f"  応答: {response[:80]}{'...' if len(response) > 80 else ''}")
 
                 # AI評価
@@ -339,9 +412,6 @@ def run_auto_evaluation(num_iterations=10):
                     "reasons": reasons
                 })
 
-                # API負荷軽減のため少し待機
-                time.sleep(0.5)
-
         # イテレーションの平均スコア
         avg_score = total_score / total_count if total_count > 0 else 0
         iteration_results["average_score"] = avg_score
@@ -372,6 +442,10 @@ def run_auto_evaluation(num_iterations=10):
     print(f"  最大スコア: {all_results['overall_stats']['max_score']:.2f}/5.0")
     print(f"  平均スコア: {all_results['overall_stats']['average_score']:.2f}/5.0")
     print(f"  総テスト数: {all_results['overall_stats']['total_tests']}")
+    if batch_summary:
+        print(f"  処理時間: {batch_summary['wall_seconds']:.1f}秒 "
+              f"({batch_summary['prompts_per_second']:.2f}件/秒, "
+              f"{batch_summary['tokens_per_second']:.1f}トークン/秒)")
     print(f"\n💾 結果保存: {filename}")
 
     return filename
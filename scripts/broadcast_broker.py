@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+ローカル用 pub/sub ブローカー（Redis互換のサブセット）
+
+Redis を用意せずに複数ワーカーのゲートウェイを動かす・試すための代替。
+PING / AUTH / SUBSCRIBE / UNSUBSCRIBE / PUBLISH / QUIT のみ対応。
+
+Usage:
+    python scripts/broadcast_broker.py --port 6379
+    python scripts/broadcast_broker.py --unix /tmp/botan-bus.sock
+
+    BROADCAST_BUS=redis://localhost:6379 uvicorn api.main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+from typing import Dict, Set
+
+from broadcast_bus import RespError, read_resp
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def _push(kind: bytes, channel: bytes, value) -> bytes:
+    tail = b":%d\r\n" % value if isinstance(value, int) else _bulk(value)
+    return b"*3\r\n" + _bulk(kind) + _bulk(channel) + tail
+
+class Broker:
+    def __init__(self):
+        # channel → 購読中の writer
+        self.subscribers: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscriptions: Set[bytes] = set()
+        try:
+            while True:
+                try:
+                    command = await read_resp(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except RespError:
+                    continue
+                if not isinstance(command, list) or not command:
+                    continue
+
+                name = command[0].upper()
+                args = command[1:]
+
+                if name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                elif name == b"SUBSCRIBE":
+                    for channel in args:
+                        subscriptions.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(_push(b"subscribe", channel, len(subscriptions)))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args or list(subscriptions):
+                        subscriptions.discard(channel)
+                        self.subscribers.get(channel, set()).discard(writer)
+                        writer.write(_push(b"unsubscribe", channel, len(subscriptions)))
+                elif name == b"PUBLISH" and len(args) == 2:
+                    channel, data = args
+                    receivers = list(self.subscribers.get(channel, ()))
+                    frame = _push(b"message", channel, data)
+                    for receiver in receivers:
+                        receiver.write(frame)
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif name == b"QUIT":
+                    writer.write(b"+OK\r\n")
+                    await writer.drain()
+                    return
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % name)
+
+                await writer.drain()
+        finally:
+            for channel in subscriptions:
+                self.subscribers.get(channel, set()).discard(writer)
+            writer.close()
+
+async def serve(args):
+    broker = Broker()
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.unlink(args.unix)
+        server = await asyncio.start_unix_server(broker.handle, path=args.unix)
+        print(f"[BUS] Listening on unix://{args.unix}")
+    else:
+        server = await asyncio.start_server(broker.handle, host=args.host, port=args.port)
+        print(f"[BUS] Listening on redis://{args.host}:{args.port}")
+
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local pub/sub broker for the Botan gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--unix", help="Unix socket path (instead of TCP)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\n[BUS] Stopped")
+
+if __name__ == "__main__":
+    main()
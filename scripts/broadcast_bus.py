@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ブロードキャストバス（OBS字幕・全体配信をプロセス間で共有）
+
+uvicorn --workers N で起動すると WebSocket 接続は各ワーカーに分散する。
+字幕を全ワーカーのOBSクライアントに届けるため、配信はバス経由で行い、
+各ワーカーは受け取ったメッセージを自分の接続に配る。
+
+    BROADCAST_BUS=local                      プロセス内（単一ワーカー、既定）
+    BROADCAST_BUS=redis://localhost:6379     Redis互換の pub/sub（TCP）
+    BROADCAST_BUS=unix:///tmp/botan-bus.sock Redis互換の pub/sub（Unixソケット）
+
+Redis互換バックエンドは PUBLISH / SUBSCRIBE だけを使うため、Redis 本体の
+ほか scripts/broadcast_broker.py（ローカル用の代替ブローカー）でも動く。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Iterable, List, Optional, Union
+from urllib.parse import unquote, urlparse
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+Message = Union[dict, bytes]
+Handler = Callable[[str, Message], Awaitable[None]]
+
+BUS_MESSAGES = REGISTRY.counter(
+    "botan_bus_messages_total",
+    "Broadcast bus messages",
+    ["direction", "channel"]
+)
+BUS_ERRORS = REGISTRY.counter(
+    "botan_bus_errors_total",
+    "Broadcast bus connection and publish errors",
+    ["operation"]
+)
+
+class BroadcastBus:
+    """
+    バスの共通インターフェース
+
+    publish したメッセージは、自プロセスを含む全購読者の handler に届く。
+    メッセージは dict（JSON）または bytes（音声フレームなど）。
+    """
+
+    backend = ""
+
+    async def start(self, channels: Iterable[str], handler: Handler):
+        raise NotImplementedError
+
+    async def publish(self, channel: str, message: Message):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def status(self) -> dict:
+        return {"backend": self.backend, "connected": True}
+
+class InProcessBus(BroadcastBus):
+    """単一プロセス用（シリアライズなしでそのまま渡す）"""
+
+    backend = "local"
+
+    def __init__(self):
+        self.channels = set()
+        self.handler: Optional[Handler] = None
+
+    async def start(self, channels: Iterable[str], handler: Handler):
+        self.channels = set(channels)
+        self.handler = handler
+
+    async def publish(self, channel: str, message: Message):
+        BUS_MESSAGES.inc(direction="published", channel=channel)
+        if self.handler and channel in self.channels:
+            BUS_MESSAGES.inc(direction="received", channel=channel)
+            await self.handler(channel, message)
+
+# ---- RESP (Redis Serialization Protocol) ----
+
+class RespError(Exception):
+    pass
+
+def encode_command(*args) -> bytes:
+    """コマンドを RESP の bulk string 配列にエンコード"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+async def read_resp(reader: asyncio.StreamReader):
+    """
+    RESP の値を1つ読む
+
+    Raises:
+        asyncio.IncompleteReadError: 接続が閉じた
+        RespError: エラー応答 (-ERR ...)
+    """
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode("utf-8")
+    if kind == b"-":
+        raise RespError(body.decode("utf-8"))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_resp(reader) for _ in range(length)]
+    # インラインコマンド（telnet などから "PING\r\n"）
+    return [part.encode("utf-8") for part in line.decode("utf-8").split()]
+
+def _encode_message(message: Message) -> bytes:
+    # 先頭1バイトで種類を区別: J = JSON, B = バイナリ
+    if isinstance(message, bytes):
+        return b"B" + message
+    return b"J" + json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _decode_message(data: bytes) -> Message:
+    if data[:1] == b"B":
+        return data[1:]
+    return json.loads(data[1:].decode("utf-8"))
+
+class RedisBus(BroadcastBus):
+    """
+    Redis互換 pub/sub バックエンド（購読用と発行用に1本ずつ接続）
+
+    接続が切れた場合は購読側がバックオフしながら再接続する。
+    発行に失敗した場合は例外を投げる（呼び出し側でローカル配信に切り替える）。
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, reconnect_delay: float = 0.5, max_reconnect_delay: float = 5.0):
+        self.url = url
+        parsed = urlparse(url)
+        self.unix_path = parsed.path if parsed.scheme == "unix" else None
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.channels: List[str] = []
+        self.handler: Optional[Handler] = None
+        self.subscribed = False
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._publisher = None  # (reader, writer)
+        self._publish_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _connect(self):
+        if self.unix_path:
+            reader, writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await writer.drain()
+            await read_resp(reader)
+        return reader, writer
+
+    async def start(self, channels: Iterable[str], handler: Handler):
+        self.channels = list(channels)
+        self.handler = handler
+        self._subscriber_task = asyncio.create_task(self._subscribe_loop())
+
+    async def _subscribe_loop(self):
+        delay = self.reconnect_delay
+        while not self._closed:
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                writer.write(encode_command("SUBSCRIBE", *self.channels))
+                await writer.drain()
+                logger.info(f"Broadcast bus subscribed: {self.url} {self.channels}")
+                delay = self.reconnect_delay
+
+                while True:
+                    reply = await read_resp(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    kind = reply[0]
+                    if kind == b"subscribe":
+                        self.subscribed = True
+                    elif kind == b"message" and len(reply) == 3:
+                        channel = reply[1].decode("utf-8")
+                        BUS_MESSAGES.inc(direction="received", channel=channel)
+                        try:
+                            await self.handler(channel, _decode_message(reply[2]))
+                        except Exception as e:
+                            logger.error(f"Broadcast bus handler failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                BUS_ERRORS.inc(operation="subscribe")
+                logger.warning(f"Broadcast bus disconnected ({e!r}), retrying in {delay:.1f}s")
+            finally:
+                self.subscribed = False
+                if writer is not None:
+                    writer.close()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def publish(self, channel: str, message: Message):
+        data = _encode_message(message)
+        async with self._publish_lock:
+            # 切れていたら1回だけ再接続して送り直す
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = await self._connect()
+                    reader, writer = self._publisher
+                    writer.write(encode_command("PUBLISH", channel, data))
+                    await writer.drain()
+                    await read_resp(reader)
+                    BUS_MESSAGES.inc(direction="published", channel=channel)
+                    return
+                except (OSError, asyncio.IncompleteReadError, RespError) as e:
+                    BUS_ERRORS.inc(operation="publish")
+                    self._drop_publisher()
+                    if attempt == 1:
+                        raise ConnectionError(f"Broadcast bus publish failed: {e}") from e
+
+    def _drop_publisher(self):
+        if self._publisher is not None:
+            self._publisher[1].close()
+            self._publisher = None
+
+    async def close(self):
+        self._closed = True
+        if self._subscriber_task:
+            self._subscriber_task.cancel()
+            try:
+                await self._subscriber_task
+            except asyncio.CancelledError:
+                pass
+        self._drop_publisher()
+
+    def status(self) -> dict:
+        return {"backend": self.backend, "url": self.url, "connected": self.subscribed}
+
+def create_bus(url: Optional[str]) -> BroadcastBus:
+    """
+    BROADCAST_BUS の値からバスを作る
+
+    Raises:
+        ValueError: 未対応のスキーム
+    """
+    if not url or url in ("local", "memory"):
+        return InProcessBus()
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "unix"):
+        return RedisBus(url)
+    raise ValueError(f"Unsupported BROADCAST_BUS: {url}")
@@ -7,7 +7,7 @@
 - 音声合成・再生機能
 """
 
-import requests
+import httpx
 import json
 import sys
 from datetime import datetime
@@ -18,6 +18,8 @@ from auto_evaluate_botan import evaluate_response
 
 # user_reaction_analyzer.py から他己評価関数をインポート
 from user_reaction_analyzer import analyze_user_reaction, calculate_combined_score
+from ollama_client import OllamaSyncClient
+from conversation_log import ConversationLog, new_turn_id
 
 # voice_synthesis.py から音声合成システムをインポート
 try:
@@ -46,11 +48,15 @@ except Exception as e:
 class LearningBotanChat:
     def __init__(self, model_name="elyza:botan_custom", enable_voice=False, enable_reflection=False):
         self.model_name = model_name
-        self.api_url = "http://localhost:11434/api/chat"
+        self.llm = OllamaSyncClient()  # 接続先は OLLAMA_HOST
         self.conversation_history = []
         self.chat_messages = []  # Ollama用の会話履歴
         self.session_start = datetime.now()
 
+        # ターンごとの会話ログ（終了時の保存を待たずに追記、落ちても残る）
+        self.log = ConversationLog(str(Path("../data/conversation_logs")))
+        self.log_user_id = f"cli-{self.session_start.strftime('%Y%m%d_%H%M%S')}"
+
         # 音声合成システム
         self.enable_voice = enable_voice and VOICE_AVAILABLE
         self.voice_system = None
@@ -91,8 +97,8 @@ class LearningBotanChat:
     def check_ollama(self):
         """Ollamaが起動しているか確認"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            return response.status_code == 200
+            self.llm.tags(timeout=2)
+            return True
         except:
             return False
 
@@ -204,36 +210,15 @@ class LearningBotanChat:
             "content": user_input
         })
 
-        payload = {
-            "model": self.model_name,
-            "messages": self.chat_messages,
-            "stream": True
-        }
-
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                stream=True,
-                timeout=60
-            )
-
             full_response = ""
             print("牡丹: ", end="", flush=True)
 
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        data = json.loads(line)
-                        if "message" in data and "content" in data["message"]:
-                            token = data["message"]["content"]
-                            print(token, end="", flush=True)
-                            full_response += token
-
-                        if data.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
+            for data in self.llm.chat_stream(self.model_name, self.chat_messages, timeout=60):
+                if "message" in data and "content" in data["message"]:
+                    token = data["message"]["content"]
+                    print(token, end="", flush=True)
+                    full_response += token
 
             print()  # 改行
 
@@ -253,7 +238,7 @@ class LearningBotanChat:
 
             return full_response
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"\n❌ エラー: {e}")
             return None
 
@@ -359,7 +344,7 @@ class LearningBotanChat:
         print("  - メッセージを入力してEnterで送信")
         print("  - 'exit' または 'quit' で終了（自動保存）")
         print("  - 'score' で現在のセッション統計を表示")
-        print("  - 'clear' で会話履歴をクリア（保存されません）")
+        print("  - 'clear' で会話履歴をクリア（以降は新しい会話として記録）")
         print("=" * 70)
         print()
 
@@ -439,6 +424,7 @@ class LearningBotanChat:
                 if user_input.lower() == 'clear':
                     self.conversation_history.clear()
                     self.chat_messages.clear()
+                    self.log.append("reset", user_id=self.log_user_id)
                     print("✅ 会話履歴をクリアしました\n")
                     continue
 
@@ -472,6 +458,11 @@ class LearningBotanChat:
                         "reasons": reaction_reasons,
                         "combined_score": combined_score
                     }
+                    self.log.append(
+                        "annotation",
+                        turn_id=prev_turn["turn_id"],
+                        fields={"reaction_evaluation": prev_turn["reaction_evaluation"]}
+                    )
 
                     # 他己評価の簡潔な表示
                     if reaction_score >= 1.0:
@@ -495,12 +486,23 @@ class LearningBotanChat:
                     print(f"   💬 自己評価: {score_emoji} ({evaluation['score']}/5)")
 
                     # 履歴に追加（他己評価は次のターンで追加される）
+                    turn_id = new_turn_id()
                     self.conversation_history.append({
+                        "turn_id": turn_id,
                         "timestamp": datetime.now().isoformat(),
                         "user": user_input,
                         "botan": response,
                         "evaluation": evaluation
                     })
+                    self.log.append(
+                        "turn",
+                        turn_id=turn_id,
+                        user_id=self.log_user_id,
+                        model=self.model_name,
+                        user=user_input,
+                        assistant=response,
+                        evaluation=evaluation
+                    )
 
                 print()  # 空行
 
@@ -511,6 +513,8 @@ class LearningBotanChat:
             except Exception as e:
                 print(f"\n❌ エラーが発生しました: {e}\n")
 
+        self.log.close()
+
 if __name__ == "__main__":
     # 音声機能の確認
     enable_voice = False
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+トークン予算つきの会話コンテキスト
+
+Ollama に送る履歴を概算トークン数の予算内に収める。
+最近のターンはそのまま送り、予算からあふれた古いターンは
+バックグラウンドで要約（rolling summary）にまとめ、履歴の先頭に user / assistant の
+やりとりとして渡す（system メッセージにすると Modelfile の SYSTEM（牡丹の人格）が
+使われなくなるため）。要約は応答生成の後に非同期で作るため、応答のレイテンシには乗らない。
+
+    window = ContextWindow(store, summarize, budget_tokens=2048)
+    messages, info = window.build(session, user_input)
+    ...
+    window.record_turn(session, user_input, response)   # 必要なら要約を予約
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from metrics import REGISTRY
+from session_store import Session, SessionStore, Turn
+
+logger = logging.getLogger(__name__)
+
+# メッセージ1件あたりのロール・区切りぶん
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 要約は先頭の user / assistant の1往復で渡す
+SUMMARY_PREFIX = "（ここまでの会話の要約だよ）\n"
+SUMMARY_ACK = "うん、覚えてる！続きね〜"
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    "botan_core_prompt_tokens",
+    "Approximate prompt tokens per request (full = whole history, sent = after windowing)",
+    ["stage"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+SUMMARIES = REGISTRY.counter(
+    "botan_core_context_summaries_total",
+    "Background summarizations of old turns",
+    ["outcome"]
+)
+
+# 要約関数: (これまでの要約, 畳むターン) → 新しい要約
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+# 要約を反映した後の通知: (セッション, 畳んだターン, 要約, 要約のトークン数)
+FoldListener = Callable[[Session, List[Turn], str, int], None]
+
+def estimate_tokens(text: str) -> int:
+    """
+    トークン数の概算（トークナイザなし）
+
+    日本語（かな・漢字など）は1文字≒1トークン、英数字は4文字≒1トークンとみなす。
+    """
+    wide = sum(1 for ch in text if ord(ch) >= 0x3000)
+    return wide + (len(text) - wide + 3) // 4
+
+def turn_tokens(user_text: str, assistant_text: str) -> int:
+    return estimate_tokens(user_text) + estimate_tokens(assistant_text) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+# 要約の1往復のうち、要約本文以外のぶん
+SUMMARY_OVERHEAD_TOKENS = turn_tokens(SUMMARY_PREFIX, SUMMARY_ACK)
+
+class ContextWindow:
+    """
+    Args:
+        store: セッションストア（要約の反映に使う）
+        summarize: 古いターンを要約する非同期関数
+        budget_tokens: 1リクエストで送る履歴（要約 + 最近のターン + 今回の入力）の上限
+        fold_ratio: 履歴がこの割合の予算を超えたら、古いターンを要約に畳む
+        keep_ratio: 畳んだ後に残す最近のターンの割合（予算比）
+        on_fold: 要約を反映したときに呼ぶ関数（会話ログへの記録用）
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        summarize: Summarizer,
+        budget_tokens: int = 2048,
+        fold_ratio: float = 0.75,
+        keep_ratio: float = 0.5,
+        on_fold: Optional[FoldListener] = None
+    ):
+        self.store = store
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.fold_ratio = fold_ratio
+        self.keep_ratio = keep_ratio
+        self.on_fold = on_fold
+        self._tasks: Set[asyncio.Task] = set()
+
+    def build(self, session: Session, user_input: str) -> Tuple[List[Dict], Dict]:
+        """
+        Ollama chat API 用のメッセージ列を作る
+
+        要約は予算の fold_ratio を超えた時点で作るため、通常は全ターンが予算に収まり、
+        先頭（要約 + 古いターン）は次の要約まで変わらず後ろに追記されるだけになる。
+        これで Ollama の KV キャッシュ（プレフィックス再利用）が効く。
+
+        Returns:
+            (messages, info) — info は送ったトークン数などの内訳
+        """
+        summary, summary_tokens, turns = session.snapshot()
+        input_tokens = estimate_tokens(user_input) + MESSAGE_OVERHEAD_TOKENS
+        summary_cost = summary_tokens + SUMMARY_OVERHEAD_TOKENS if summary else 0
+
+        # 新しい順に、予算に収まるところまで原文で送る
+        remaining = self.budget_tokens - input_tokens - summary_cost
+        kept = 0
+        for turn in reversed(turns):
+            if turn[2] > remaining:
+                break
+            remaining -= turn[2]
+            kept += 1
+        recent = turns[len(turns) - kept:] if kept else []
+
+        messages = []
+        if summary:
+            # Ollama は先頭が system でないときだけ Modelfile の SYSTEM を付けるので、system にはしない
+            messages.append({"role": "user", "content": SUMMARY_PREFIX + summary})
+            messages.append({"role": "assistant", "content": SUMMARY_ACK})
+        for user_text, assistant_text, _ in recent:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": assistant_text})
+        messages.append({"role": "user", "content": user_input})
+
+        full_tokens = input_tokens + session.folded_tokens + sum(turn[2] for turn in turns)
+        sent_tokens = input_tokens + summary_cost + sum(turn[2] for turn in recent)
+        PROMPT_TOKENS.observe(full_tokens, stage="full")
+        PROMPT_TOKENS.observe(sent_tokens, stage="sent")
+
+        return messages, {
+            "prompt_tokens": sent_tokens,
+            "history_tokens": full_tokens,
+            "turns_sent": len(recent),
+            "turns_omitted": len(turns) - len(recent),
+            "summarized": bool(summary)
+        }
+
+    def record_turn(self, session: Session, user_text: str, assistant_text: str):
+        """ターンを記録し、履歴が予算を超えそうなら要約をバックグラウンドで予約"""
+        self.store.record_turn(session, user_text, assistant_text, turn_tokens(user_text, assistant_text))
+        self._maybe_fold(session)
+
+    def _maybe_fold(self, session: Session):
+        if session.summarizing:
+            return
+        _, summary_tokens, turns = session.snapshot()
+        history_tokens = summary_tokens + sum(turn[2] for turn in turns)
+        if history_tokens <= self.budget_tokens * self.fold_ratio:
+            return
+
+        # 最近のターンを keep_ratio ぶん残し、それより古いものを畳む
+        keep_budget = self.budget_tokens * self.keep_ratio
+        kept = 0
+        for turn in reversed(turns):
+            if turn[2] > keep_budget:
+                break
+            keep_budget -= turn[2]
+            kept += 1
+        folded = turns[:len(turns) - kept]
+        if not folded:
+            return
+
+        session.summarizing = True
+        task = asyncio.create_task(self._fold(session, folded))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session: Session, folded: List[Turn]):
+        try:
+            previous, _, _ = session.snapshot()
+            summary = (await self.summarize(previous, folded)).strip()
+            if not summary:
+                SUMMARIES.inc(outcome="empty")
+                return
+            summary_tokens = estimate_tokens(summary)
+            # 進行中のターン（build → 生成 → 記録）の途中で履歴を書き換えない
+            async with session.turn_lock:
+                self.store.fold(session, folded, summary, summary_tokens)
+            SUMMARIES.inc(outcome="ok")
+            if self.on_fold:
+                self.on_fold(session, folded, summary, summary_tokens)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 失敗しても畳まれなかったターンは予算外として送られないだけ（次のターンで再試行）
+            SUMMARIES.inc(outcome="error")
+            logger.warning(f"Context summarization failed for {session.user_id}: {e}")
+        finally:
+            session.summarizing = False
+
+    async def aclose(self):
+        """実行中の要約を止める（shutdown 用）"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
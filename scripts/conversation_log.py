@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+追記専用の会話ログ（JSONL、バックグラウンド書き込み）
+
+会話のターン・要約・リセットを1行1レコードで追記する。
+append はキューに積むだけで、書き込みは専用スレッドがまとめて行い
+（溜まったぶんを1回の write + fsync でコミットする group commit）、
+応答の経路ではディスクを待たない。
+
+ファイルは directory/conversations.jsonl に追記し、max_bytes を超えたら
+conversations-YYYYmmdd-HHMMSS.jsonl(.gz) にローテートする。
+プロセスが落ちても、最後に書きかけた1行以外は残る（読み込み時に読み飛ばす）。
+
+    log = ConversationLog("conversation_logs")
+    log.append("turn", user_id="u1", user="おはよ", assistant="おはよ〜！", tokens=12)
+    log.append("reset", user_id="u1")
+    log.restore(session_store, max_age=1800)   # 起動時にセッションを復元
+    log.close()
+
+学習データの書き出し:
+    python scripts/conversation_log.py export conversation_logs dataset.jsonl
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = "conversations.jsonl"
+ROTATED_PREFIX = "conversations-"
+
+LOG_RECORDS = REGISTRY.counter(
+    "botan_conversation_log_records_total",
+    "Conversation log records by outcome (written, dropped)",
+    ["outcome"]
+)
+LOG_COMMIT_SECONDS = REGISTRY.histogram(
+    "botan_conversation_log_commit_seconds",
+    "Time to write and fsync one batch of conversation log records",
+    []
+)
+
+_STOP = object()
+
+def new_turn_id() -> str:
+    return uuid.uuid4().hex
+
+def _rotated_order(name: str):
+    # conversations-YYYYmmdd-HHMMSS[-N].jsonl(.gz) → (時刻, 同じ秒の連番)
+    parts = name[len(ROTATED_PREFIX):].split(".", 1)[0].split("-")
+    return parts[0] + parts[1], int(parts[2]) if len(parts) > 2 else 0
+
+def log_files(directory: str) -> List[str]:
+    """ローテート済み（古い順）→ 書き込み中の順にファイルを返す"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    rotated = sorted(
+        (name for name in names if name.startswith(ROTATED_PREFIX) and name.endswith((".jsonl", ".jsonl.gz"))),
+        key=_rotated_order
+    )
+    files = [os.path.join(directory, name) for name in rotated]
+    if ACTIVE_FILE in names:
+        files.append(os.path.join(directory, ACTIVE_FILE))
+    return files
+
+def iter_records(directory: str, since: Optional[float] = None) -> Iterator[Dict]:
+    """
+    全レコードを書き込み順に返す
+
+    since を指定すると、それより前に最終更新されたファイル（中身がすべて古い）は読まない。
+    壊れた行（クラッシュ時の書きかけなど）は読み飛ばす。
+    """
+    for path in log_files(directory):
+        if since is not None and os.path.getmtime(path) < since:
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt line in {path}")
+                    continue
+                yield record
+
+class ConversationLog:
+    """
+    Args:
+        directory: ログを置くディレクトリ
+        max_bytes: 書き込み中のファイルがこのサイズを超えたらローテート
+        compress: ローテートしたファイルを gzip 圧縮する
+        max_batch: 1回のコミットでまとめる最大レコード数
+        queue_size: 書き込み待ちの上限（超えたら append は捨てて数える）
+        fsync: コミットごとに fsync する（False なら OS のバッファに任せる）
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        compress: bool = True,
+        max_batch: int = 512,
+        queue_size: int = 10000,
+        fsync: bool = True
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.path = os.path.join(directory, ACTIVE_FILE)
+        self.written = 0
+        self.dropped = 0
+        self.commits = 0
+        self.rotations = 0
+        os.makedirs(directory, exist_ok=True)
+        # 開けない（権限・ボリューム未マウントなど）なら起動時にエラーにする
+        self._file = open(self.path, "a", encoding="utf-8")
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._thread.start()
+
+    def append(self, event: str, **fields):
+        """レコードを書き込み待ちに積む（ブロックしない）"""
+        if self._closed:
+            return
+        record = {"ts": time.time(), "event": event, **fields}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS.inc(outcome="dropped")
+
+    def close(self, timeout: float = 5.0):
+        """書き込み待ちをすべてコミットしてからスレッドを止める"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                # 前のコミット中に溜まったぶんをまとめて書く
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(record is _STOP for record in batch)
+                records = [record for record in batch if record is not _STOP]
+                if records:
+                    try:
+                        self._commit(records)
+                    except Exception:
+                        # 想定外のエラーでもスレッドは止めない（止まるとキューが溢れるまで黙って溜まる）
+                        self._drop(records)
+                        logger.exception("Conversation log commit failed")
+                if stop:
+                    return
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+    def _open(self):
+        """書き込み中のファイルを開き直す（失敗したら None のまま、次のコミットで再試行）"""
+        try:
+            self._file = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            self._file = None
+            logger.warning(f"Could not open conversation log {self.path}: {e}")
+
+    def _drop(self, records: List[Dict]):
+        self.dropped += len(records)
+        LOG_RECORDS.inc(len(records), outcome="dropped")
+
+    def _commit(self, records: List[Dict]):
+        if self._file is None:
+            self._open()
+            if self._file is None:
+                self._drop(records)
+                return
+        try:
+            with LOG_COMMIT_SECONDS.time():
+                self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+        except OSError as e:
+            self._drop(records)
+            logger.warning(f"Conversation log write failed: {e}")
+            return
+        self.written += len(records)
+        self.commits += 1
+        LOG_RECORDS.inc(len(records), outcome="written")
+
+        if self._file.tell() >= self.max_bytes:
+            self._file.close()
+            try:
+                self._rotate()
+            except Exception as e:
+                # ローテートに失敗しても書き込みは同じファイルに続ける
+                logger.warning(f"Conversation log rotation failed: {e}")
+            self._open()
+
+    def _rotate(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rotated = os.path.join(self.directory, f"{ROTATED_PREFIX}{stamp}.jsonl")
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = os.path.join(self.directory, f"{ROTATED_PREFIX}{stamp}-{suffix}.jsonl")
+            suffix += 1
+        os.replace(self.path, rotated)
+        self.rotations += 1
+        if not self.compress:
+            return
+        # 圧縮し終えてから置き換える（途中で落ちても元のファイルが残る）
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(rotated + ".gz.tmp", rotated + ".gz")
+        os.remove(rotated)
+
+    def restore(self, store, max_age: float = 0, max_turns: int = 50) -> int:
+        """
+        ログを再生してセッションを復元する（起動時、append より前に呼ぶ）
+
+        リセット後のターンと最新の要約だけを戻す。max_age 秒以上前に
+        最後に使われたセッションは戻さない（0 なら全部）。
+
+        Returns:
+            復元したセッション数
+        """
+        now = time.time()
+        since = now - max_age if max_age > 0 else None
+        states: Dict[str, Dict] = {}
+        for record in iter_records(self.directory, since):
+            event = record.get("event")
+            user_id = record.get("user_id")
+            if event == "reset":
+                if user_id is None:
+                    states.clear()
+                else:
+                    states.pop(user_id, None)
+            elif event == "turn":
+                state = states.setdefault(user_id, {
+                    "turns": deque(maxlen=max_turns if max_turns > 0 else None),
+                    "summary": "",
+                    "summary_tokens": 0
+                })
+                state["turns"].append((record["user"], record["assistant"], record.get("tokens", 0)))
+                state["ts"] = record["ts"]
+            elif event == "summary" and user_id in states:
+                state = states[user_id]
+                for _ in range(min(record.get("folded", 0), len(state["turns"]))):
+                    state["turns"].popleft()
+                state["summary"] = record["summary"]
+                state["summary_tokens"] = record.get("tokens", 0)
+
+        if since is not None:
+            states = {user_id: state for user_id, state in states.items() if state["ts"] >= since}
+
+        # 最後に使われたのが古い順に登録し、LRU の順序を合わせる
+        for user_id, state in sorted(states.items(), key=lambda item: item[1]["ts"]):
+            store.restore(
+                user_id,
+                list(state["turns"]),
+                summary=state["summary"],
+                summary_tokens=state["summary_tokens"],
+                idle_seconds=now - state["ts"]
+            )
+        return len(states)
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "commits": self.commits,
+            "rotations": self.rotations
+        }
+
+def export_dataset(directory: str, output: str) -> int:
+    """
+    ターンを学習データ（1行1会話の messages 形式）として書き出す
+
+    annotation レコード（評価など）は turn_id で対応するターンにまとめる。
+    """
+    turns: Dict[str, Dict] = {}
+    for record in iter_records(directory):
+        if record.get("event") == "turn":
+            turns[record.get("turn_id") or new_turn_id()] = record
+        elif record.get("event") == "annotation" and record.get("turn_id") in turns:
+            turns[record["turn_id"]].update(record.get("fields", {}))
+
+    with open(output, "w", encoding="utf-8") as f:
+        for turn_id, record in turns.items():
+            sample = {
+                key: value for key, value in record.items()
+                if key not in ("event", "user", "assistant", "tokens")
+            }
+            sample["turn_id"] = turn_id
+            sample["messages"] = [
+                {"role": "user", "content": record["user"]},
+                {"role": "assistant", "content": record["assistant"]}
+            ]
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    return len(turns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Botan conversation log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write turns as a chat-format JSONL dataset")
+    export.add_argument("directory")
+    export.add_argument("output")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = export_dataset(args.directory, args.output)
+        print(f"Exported {count} turns to {args.output}")
+
+if __name__ == "__main__":
+    main()
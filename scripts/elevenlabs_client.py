@@ -5,6 +5,7 @@ Uses ElevenLabs v3 API with kuon voice
 """
 
 import os
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 from elevenlabs import ElevenLabs, VoiceSettings
@@ -74,20 +75,7 @@ class BotanVoiceClient:
                 return str(output_path)
 
             # Generate speech
-            # Note: optimize_streaming_latency is supported in turbo and v2 models, but not in v3
-            convert_params = {
-                "voice_id": self.voice_id,
-                "output_format": "mp3_44100_128",
-                "text": text,
-                "model_id": self.model,
-                "voice_settings": self.voice_settings
-            }
-
-            # Add optimize_streaming_latency for turbo and v2 models
-            if "turbo" in self.model or "v2" in self.model:
-                convert_params["optimize_streaming_latency"] = 4
-
-            audio_generator = self.client.text_to_speech.convert(**convert_params)
+            audio_generator = self.client.text_to_speech.convert(**self._convert_params(text))
 
             # Save to file
             with open(output_path, "wb") as f:
@@ -99,6 +87,54 @@ class BotanVoiceClient:
             print(f"[ERROR] Text-to-speech failed: {e}")
             raise
 
+    def text_to_speech_stream(self, text: str, output_path: str):
+        """
+        Convert text to speech, yielding audio chunks as they arrive
+
+        The audio is written to a temporary file next to output_path and
+        moved into place only once the whole stream has been received, so a
+        partially generated file never shows up in the cache.
+
+        Args:
+            text: Text to convert to speech
+            output_path: Where to store the complete audio
+
+        Yields:
+            MP3 audio chunks (bytes)
+        """
+        output_path = Path(output_path)
+        partial_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex}.part")
+
+        try:
+            audio_generator = self.client.text_to_speech.convert(**self._convert_params(text))
+            with open(partial_path, "wb") as f:
+                for chunk in audio_generator:
+                    f.write(chunk)
+                    yield chunk
+            partial_path.replace(output_path)
+        except Exception as e:
+            print(f"[ERROR] Text-to-speech stream failed: {e}")
+            raise
+        finally:
+            if partial_path.exists():
+                partial_path.unlink()
+
+    def _convert_params(self, text: str) -> dict:
+        # Note: optimize_streaming_latency is supported in turbo and v2 models, but not in v3
+        convert_params = {
+            "voice_id": self.voice_id,
+            "output_format": "mp3_44100_128",
+            "text": text,
+            "model_id": self.model,
+            "voice_settings": self.voice_settings
+        }
+
+        # Add optimize_streaming_latency for turbo and v2 models
+        if "turbo" in self.model or "v2" in self.model:
+            convert_params["optimize_streaming_latency"] = 4
+
+        return convert_params
+
     def get_available_voices(self):
         """Get list of available voices"""
         try:
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Ollama の代わりに動くローカルサーバー（決定的な出力・タイミング）
+
+モデルのないマシン（CI など）でスタック全体のベンチマーク・負荷試験を行うためのもの。
+/api/chat・/api/generate・/api/tags・/api/ps を Ollama と同じ形式で返す。
+出力は入力をそのまま返す（echo）か固定文（canned）で、乱数は使わない。
+最初のトークンまでの時間（--ttft）と生成速度（--tokens-per-second）を指定でき、
+done の行の eval_count / eval_duration なども設定値どおりに返す。
+
+Usage:
+    python scripts/fake_ollama.py --port 11500 --ttft 0.2 --tokens-per-second 30
+    python scripts/fake_ollama.py --mode canned --reply "えー、マジで？" --load-seconds 3
+
+    OLLAMA_HOST=http://localhost:11500 uvicorn services.core.service:app --port 8001
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+DEFAULT_MODELS = ["elyza:botan_custom", "elyza:botan_v2", "qwen2.5:3b"]
+DEFAULT_REPLY = "えー、マジで？それめっちゃいいじゃん！"
+
+# 英数字は単語、それ以外は1文字を1トークンとみなす
+_TOKEN_PATTERN = re.compile(r"\s*[A-Za-z0-9_]+|\s*[^\sA-Za-z0-9_]|\s+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+def _schema_value(schema: Dict):
+    """JSONスキーマを満たす固定の値（構造化出力の format 用）"""
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: _schema_value(sub) for key, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_schema_value(schema.get("items", {"type": "string"}))]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return "fake"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class FakeModel:
+    """
+    Args:
+        models: /api/tags に出すモデル（それ以外は 404）
+        ttft: リクエストから最初のトークンまでの秒数（prompt_eval_duration）
+        tokens_per_second: 2トークン目以降の生成速度
+        mode: echo（入力をそのまま返す）/ canned（reply を返す）
+        reply: canned で返す文
+        load_seconds: モデルの初回（アンロード後も）ロードにかかる秒数
+        parallel: 同時に生成する数（Ollama の OLLAMA_NUM_PARALLEL 相当、超えたぶんは待たされる）
+    """
+
+    def __init__(
+        self,
+        models: List[str] = DEFAULT_MODELS,
+        ttft: float = 0.2,
+        tokens_per_second: float = 30.0,
+        mode: str = "echo",
+        reply: str = DEFAULT_REPLY,
+        load_seconds: float = 0.0,
+        parallel: int = 4
+    ):
+        if mode not in ("echo", "canned"):
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.models = list(models)
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.mode = mode
+        self.reply = reply
+        self.load_seconds = load_seconds
+        self.loaded: Dict[str, float] = {}  # モデル名 → ロードした時刻
+        self._slots = asyncio.Semaphore(parallel)
+
+    def resolve(self, model: str) -> Optional[str]:
+        """Ollama と同じく、タグ省略時は :latest とみなす"""
+        for name in (model, f"{model}:latest"):
+            if name in self.models:
+                return name
+        return None
+
+    def output(self, user_text: str, format=None) -> str:
+        text = user_text if self.mode == "echo" else self.reply
+        if isinstance(format, dict):
+            return json.dumps(_schema_value(format), ensure_ascii=False)
+        if format == "json":
+            return json.dumps({"response": text}, ensure_ascii=False)
+        return text
+
+    async def run(
+        self,
+        model: str,
+        prompt_text: str,
+        output: str,
+        options: Dict,
+        keep_alive
+    ) -> AsyncIterator[Dict]:
+        """トークンを設定どおりの間隔で返し、最後に計測値つきの done を返す"""
+        tokens = tokenize(output)
+        done_reason = "stop"
+        num_predict = options.get("num_predict")
+        if isinstance(num_predict, int) and 0 <= num_predict < len(tokens):
+            tokens = tokens[:num_predict]
+            done_reason = "length"
+
+        async with self._slots:
+            load_duration = 0.0
+            if model not in self.loaded:
+                load_duration = self.load_seconds
+                await asyncio.sleep(load_duration)
+                self.loaded[model] = time.time()
+
+            await asyncio.sleep(self.ttft)
+            interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+            for i, token in enumerate(tokens):
+                if i > 0 and interval:
+                    await asyncio.sleep(interval)
+                yield {"token": token}
+
+            if keep_alive in (0, "0", "0s", "0m"):
+                self.loaded.pop(model, None)
+
+        eval_seconds = len(tokens) * interval
+        yield {
+            "done": True,
+            "done_reason": done_reason,
+            "total_duration": int((load_duration + self.ttft + eval_seconds) * 1e9),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": len(tokenize(prompt_text)),
+            "prompt_eval_duration": int(self.ttft * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_seconds * 1e9)
+        }
+
+def create_app(fake: FakeModel) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+
+    def not_found(model: str):
+        return JSONResponse({"error": f"model '{model}' not found"}, status_code=404)
+
+    async def respond(body: Dict, prompt_text: str, user_text: str, wrap):
+        """stream（既定 true）なら NDJSON、false なら1つにまとめて返す"""
+        model = fake.resolve(body.get("model", ""))
+        if model is None:
+            return not_found(body.get("model", ""))
+
+        events = fake.run(
+            model,
+            prompt_text,
+            fake.output(user_text, body.get("format")),
+            body.get("options") or {},
+            body.get("keep_alive")
+        )
+
+        if body.get("stream", True):
+            async def lines():
+                async for event in events:
+                    if "token" in event:
+                        line = {"model": model, "created_at": _now(), **wrap(event["token"]), "done": False}
+                    else:
+                        line = {"model": model, "created_at": _now(), **wrap(""), **event}
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        text = ""
+        async for event in events:
+            if "token" in event:
+                text += event["token"]
+            else:
+                final = event
+        return {"model": model, "created_at": _now(), **wrap(text), **final}
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name, "size": 0} for name in fake.models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": name, "model": name, "size": 0} for name in fake.loaded]}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        prompt_text = "\n".join(m.get("content", "") for m in messages)
+        return await respond(
+            body,
+            prompt_text,
+            user_text,
+            lambda text: {"message": {"role": "assistant", "content": text}}
+        )
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt")
+        if not prompt:
+            # prompt なしはモデルのロードのみ
+            model = fake.resolve(body.get("model", ""))
+            if model is None:
+                return not_found(body.get("model", ""))
+            load_duration = 0.0
+            if model not in fake.loaded:
+                load_duration = fake.load_seconds
+                await asyncio.sleep(load_duration)
+                fake.loaded[model] = time.time()
+            return {
+                "model": model,
+                "created_at": _now(),
+                "response": "",
+                "done": True,
+                "done_reason": "load",
+                "load_duration": int(load_duration * 1e9)
+            }
+        return await respond(body, prompt, prompt, lambda text: {"response": text})
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stand-in for the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--mode", choices=["echo", "canned"], default="echo")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="reply text for --mode canned")
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="comma-separated model names")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="simulated cold model load")
+    parser.add_argument("--parallel", type=int, default=4, help="concurrent generations (OLLAMA_NUM_PARALLEL)")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    fake = FakeModel(
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        mode=args.mode,
+        reply=args.reply,
+        load_seconds=args.load_seconds,
+        parallel=args.parallel
+    )
+    print(f"[FAKE] Ollama stand-in on http://{args.host}:{args.port} "
+          f"(mode={args.mode}, ttft={args.ttft}s, {args.tokens_per_second} tok/s)")
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
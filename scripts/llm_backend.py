@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+LLM バックエンドのインターフェース
+
+Core Service・反射＋推論・自動評価・CLI チャットは、Ollama を直接叩かず
+このインターフェース越しに呼び出す。実装は ollama_client の
+OllamaClient（非同期、Core 用）と OllamaSyncClient（同期、スクリプト用）。
+
+接続先は OLLAMA_HOST で切り替える。モデルのないマシン（CI など）では
+scripts/fake_ollama.py を起動してそこに向ければ、スタック全体をそのまま動かせる。
+
+    OLLAMA_HOST=http://localhost:11500 python scripts/chat_with_learning.py
+
+新しいバックエンドは LLMBackend / SyncLLMBackend を継承し、abstractmethod を
+すべて実装する（足りなければインスタンス化の時点で TypeError になる）。
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+
+def default_host() -> str:
+    """接続先（OLLAMA_HOST、未設定ならローカルの Ollama）"""
+    return os.getenv("OLLAMA_HOST", DEFAULT_OLLAMA_HOST)
+
+class LLMBackend(ABC):
+    """
+    非同期バックエンド
+
+    戻り値は Ollama REST API の JSON と同じ形（chat は message.content、
+    generate は response、最終行の done / eval_count などの計測値）。
+    """
+
+    @abstractmethod
+    async def chat(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **extra) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        timeout: Optional[float] = None,
+        **extra
+    ) -> AsyncIterator[Dict]:
+        """トークンごとの行を返し、done: true の行で終わる"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generate(
+        self,
+        model: str,
+        prompt: Optional[str] = None,
+        options: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def tags(self, timeout: Optional[float] = None) -> List[str]:
+        """使えるモデル名の一覧"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def loaded(self, timeout: Optional[float] = None) -> List[str]:
+        """メモリにロード済みのモデル名の一覧"""
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class SyncLLMBackend(ABC):
+    """同期バックエンド（CLI・評価スクリプト用、戻り値は LLMBackend と同じ）"""
+
+    @abstractmethod
+    def chat(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **extra) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def generate(
+        self,
+        model: str,
+        prompt: Optional[str] = None,
+        options: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def tags(self, timeout: Optional[float] = None) -> List[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+軽量メトリクス (Counter / Gauge / Histogram)
+
+API Gateway・Core・Voice の各サービスで共通に使う。
+外部依存なしで Prometheus テキスト形式と JSON の両方を出力できる。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def snapshot(self):
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """ラベルを部分指定した場合はその合計"""
+        with self._lock:
+            return sum(
+                v for key, v in self._values.items()
+                if all(key[self.labelnames.index(k)] == str(val) for k, val in labels.items())
+            )
+
+    def samples(self):
+        with self._lock:
+            return [
+                (self.name, _format_labels(self.labelnames, key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {"labels": dict(zip(self.labelnames, key)), "value": value}
+                for key, value in sorted(self._values.items())
+            ]
+
+class Gauge(_Metric):
+    """
+    現在値メトリクス
+
+    callback を渡すと出力時に {ラベル値タプル: 値} を取得する
+    （接続数やキュー長のように、別の場所に実体がある値向け）。
+    """
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _current(self) -> Dict[Tuple[str, ...], float]:
+        if self._callback is not None:
+            try:
+                return {
+                    (key if isinstance(key, tuple) else (key,)): value
+                    for key, value in self._callback().items()
+                }
+            except Exception:
+                return {}
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [
+            (self.name, _format_labels(self.labelnames, tuple(str(k) for k in key)), value)
+            for key, value in sorted(self._current().items())
+        ]
+
+    def snapshot(self):
+        return [
+            {"labels": dict(zip(self.labelnames, key)), "value": value}
+            for key, value in sorted(self._current().items())
+        ]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # key → [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        処理時間を計測するコンテキストマネージャ
+
+        ラベルに outcome がある場合は自動で ok / timeout / error を付ける。
+        """
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException as e:
+            outcome = "timeout" if "Timeout" in type(e).__name__ else "error"
+            raise
+        finally:
+            if "outcome" in self.labelnames and "outcome" not in labels:
+                labels = dict(labels, outcome=outcome)
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        for key, data in items:
+            for i, bound in enumerate(self.buckets):
+                result.append((
+                    f"{self.name}_bucket",
+                    _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'),
+                    data[i]
+                ))
+            result.append((f"{self.name}_sum", _format_labels(self.labelnames, key), data[-2]))
+            result.append((f"{self.name}_count", _format_labels(self.labelnames, key), data[-1]))
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        return [
+            {
+                "labels": dict(zip(self.labelnames, key)),
+                "count": int(data[-1]),
+                "sum": data[-2],
+                "avg": data[-2] / data[-1] if data[-1] else 0.0
+            }
+            for key, data in items
+        ]
+
+class MetricsRegistry:
+    """
+    メトリクスの登録と出力
+
+    同じ名前で再登録した場合は既存のメトリクスを返す
+    （複数モジュールから同じメトリクスを共有できる）。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = (), callback=None) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames, callback=callback)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheus テキスト形式 (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """JSON 出力用"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+# プロセス共通のレジストリ
+REGISTRY = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+非同期 Ollama クライアント（コネクションプール共有）
+
+Core Service の応答生成・反射・ヘルスチェックで1つのクライアントを共有する。
+呼び出し中もイベントループを止めないため、同時に処理できるユーザー数は
+Ollama 側の並列度（OLLAMA_NUM_PARALLEL）で決まる。
+
+    client = OllamaClient("http://localhost:11434")
+    data = await client.chat("elyza:botan_custom", messages, timeout=30)
+    async for event in client.chat_stream("elyza:botan_custom", messages):
+        ...
+    await client.aclose()
+
+CLI・評価スクリプト向けには同じ形の同期版 OllamaSyncClient がある。
+host を省略すると OLLAMA_HOST（llm_backend.default_host）に接続する。
+"""
+
+import json
+import os
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+from llm_backend import LLMBackend, SyncLLMBackend, default_host
+from metrics import REGISTRY
+
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "8"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+
+# load_duration がこれを超えた応答は「モデルのロードを待った（コールド）」とみなす
+COLD_LOAD_THRESHOLD = float(os.getenv("OLLAMA_COLD_LOAD_THRESHOLD", "0.5"))
+
+OLLAMA_MODEL_LOADS = REGISTRY.counter(
+    "botan_ollama_model_loads_total",
+    "Responses that had to wait for Ollama to load the model",
+    ["model"]
+)
+OLLAMA_LOAD_SECONDS = REGISTRY.histogram(
+    "botan_ollama_load_seconds",
+    "Model load time reported by Ollama (load_duration) for cold responses",
+    ["model"],
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+def load_seconds(data: Dict) -> float:
+    """Ollama の応答（または stream の最終行）からモデルのロード時間（秒）を取り出す"""
+    return data.get("load_duration", 0) / 1e9
+
+def is_cold(data: Dict) -> bool:
+    return load_seconds(data) > COLD_LOAD_THRESHOLD
+
+def _observe_load(model: str, data: Dict):
+    if is_cold(data):
+        OLLAMA_MODEL_LOADS.inc(model=model)
+        OLLAMA_LOAD_SECONDS.observe(load_seconds(data), model=model)
+
+def _payload(model: str, stream: bool, keep_alive, extra: Dict) -> Dict:
+    payload = {"model": model, "stream": stream, **extra}
+    if keep_alive is not None:
+        payload.setdefault("keep_alive", keep_alive)
+    return payload
+
+def _parse_line(line: str) -> Optional[Dict]:
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+class OllamaClient(LLMBackend):
+    """
+    Ollama REST API の薄いラッパー
+
+    Args:
+        host: OllamaサーバーのURL（省略時は OLLAMA_HOST）
+        timeout: 読み込みタイムアウトの既定値（呼び出しごとに上書き可）
+        keep_alive: 全リクエストに付ける keep_alive（"30m"、-1 で無期限など）。
+            リクエストごとに値が違うとアンロード時刻が揺れるため、ここで統一する
+        transport: テスト用に httpx のトランスポートを差し替える
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        timeout: float = 30.0,
+        keep_alive=None,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections: int = OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        host = host or default_host()
+        self.host = host
+        self.keep_alive = keep_alive
+        self._client = httpx.AsyncClient(
+            base_url=host,
+            timeout=httpx.Timeout(timeout, connect=OLLAMA_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY
+            ),
+            transport=transport
+        )
+
+    def _timeout(self, timeout: Optional[float]):
+        if timeout is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(timeout, connect=min(timeout, OLLAMA_CONNECT_TIMEOUT))
+
+    def _payload(self, model: str, stream: bool, extra: Dict) -> Dict:
+        return _payload(model, stream, self.keep_alive, extra)
+
+    def _observe_load(self, model: str, data: Dict):
+        _observe_load(model, data)
+
+    async def chat(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **extra) -> Dict:
+        """POST /api/chat（stream=false）"""
+        payload = self._payload(model, False, {"messages": messages, **extra})
+        response = await self._client.post("/api/chat", json=payload, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        data = response.json()
+        self._observe_load(model, data)
+        return data
+
+    async def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        timeout: Optional[float] = None,
+        **extra
+    ) -> AsyncIterator[Dict]:
+        """
+        POST /api/chat（stream=true）の NDJSON を1行ずつ返す
+
+        done: true の行を返したところで終了する（load_duration などはこの行に入る）。
+        """
+        payload = self._payload(model, True, {"messages": messages, **extra})
+        async with self._client.stream(
+            "POST", "/api/chat", json=payload, timeout=self._timeout(timeout)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                data = _parse_line(line)
+                if data is None:
+                    continue
+                if data.get("done", False):
+                    self._observe_load(model, data)
+                    yield data
+                    return
+                yield data
+
+    async def generate(
+        self,
+        model: str,
+        prompt: Optional[str] = None,
+        options: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Dict:
+        """
+        POST /api/generate（stream=false）
+
+        prompt を省略するとモデルのロードのみ行う。
+        """
+        payload = self._payload(model, False, extra)
+        if prompt is not None:
+            payload["prompt"] = prompt
+        if options:
+            payload["options"] = options
+        response = await self._client.post("/api/generate", json=payload, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        data = response.json()
+        self._observe_load(model, data)
+        return data
+
+    async def tags(self, timeout: Optional[float] = None) -> List[str]:
+        """インストール済みモデル名の一覧"""
+        response = await self._client.get("/api/tags", timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    async def loaded(self, timeout: Optional[float] = None) -> List[str]:
+        """メモリにロード済みのモデル名の一覧（/api/ps）"""
+        response = await self._client.get("/api/ps", timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    async def aclose(self):
+        await self._client.aclose()
+
+class OllamaSyncClient(SyncLLMBackend):
+    """
+    OllamaClient の同期版（コネクションは httpx.Client で使い回す）
+
+    Args:
+        host: OllamaサーバーのURL（省略時は OLLAMA_HOST）
+        timeout: 読み込みタイムアウトの既定値（呼び出しごとに上書き可）
+        keep_alive: 全リクエストに付ける keep_alive
+    """
+
+    def __init__(self, host: Optional[str] = None, timeout: float = 30.0, keep_alive=None):
+        host = host or default_host()
+        self.host = host
+        self.keep_alive = keep_alive
+        self._client = httpx.Client(
+            base_url=host,
+            timeout=httpx.Timeout(timeout, connect=OLLAMA_CONNECT_TIMEOUT)
+        )
+
+    def _timeout(self, timeout: Optional[float]):
+        if timeout is None:
+            return httpx.USE_CLIENT_DEFAULT
+        return httpx.Timeout(timeout, connect=min(timeout, OLLAMA_CONNECT_TIMEOUT))
+
+    def chat(self, model: str, messages: List[Dict], timeout: Optional[float] = None, **extra) -> Dict:
+        payload = _payload(model, False, self.keep_alive, {"messages": messages, **extra})
+        response = self._client.post("/api/chat", json=payload, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        data = response.json()
+        _observe_load(model, data)
+        return data
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Iterator[Dict]:
+        payload = _payload(model, True, self.keep_alive, {"messages": messages, **extra})
+        with self._client.stream("POST", "/api/chat", json=payload, timeout=self._timeout(timeout)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                data = _parse_line(line)
+                if data is None:
+                    continue
+                yield data
+                if data.get("done", False):
+                    _observe_load(model, data)
+                    return
+
+    def generate(
+        self,
+        model: str,
+        prompt: Optional[str] = None,
+        options: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        **extra
+    ) -> Dict:
+        payload = _payload(model, False, self.keep_alive, extra)
+        if prompt is not None:
+            payload["prompt"] = prompt
+        if options:
+            payload["options"] = options
+        response = self._client.post("/api/generate", json=payload, timeout=self._timeout(timeout))
+        response.raise_for_status()
+        data = response.json()
+        _observe_load(model, data)
+        return data
+
+    def tags(self, timeout: Optional[float] = None) -> List[str]:
+        response = self._client.get("/api/tags", timeout=self._timeout(timeout))
+        response.raise_for_status()
+        return [m.get("name") for m in response.json().get("models", [])]
+
+    def close(self):
+        self._client.close()
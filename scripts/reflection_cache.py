@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+反射・推論結果のキャッシュ（LRU + TTL）
+
+「おはよー」のような定型の入力は、同じ文脈なら反射・推論の結果もほぼ同じになる。
+正規化した入力と直近の文脈のハッシュをキーに結果を覚えておき、
+ヒットしたら LLM を呼ばずに返す。
+
+    cache = ReflectionCache(max_entries=1024, ttl=3600, path="reflection_cache.json")
+    result = cache.get("reflect", user_input, context)
+    if result is None:
+        result = ...
+        cache.put("reflect", user_input, context, result)
+    cache.save()   # path を指定した場合、再起動後も引き継ぐ
+
+path を指定すると save_every 件の追加ごとにも書き出すので、
+クラッシュしても失うのは直近の数件だけになる。
+
+値は JSON で保持するため、get が返すのは毎回新しいコピーになる。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_VERSION = 1
+
+REFLECTION_CACHE_REQUESTS = REGISTRY.counter(
+    "botan_reflection_cache_requests_total",
+    "Reflection/reasoning cache lookups by kind and result (hit, miss)",
+    ["kind", "result"]
+)
+REFLECTION_CACHE_EVICTIONS = REGISTRY.counter(
+    "botan_reflection_cache_evictions_total",
+    "Reflection/reasoning cache entries dropped (capacity, ttl)",
+    ["reason"]
+)
+
+def normalize_input(text: str) -> str:
+    """全角・半角、大文字・小文字、空白の違いをならす"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())
+
+class ReflectionCache:
+    """
+    Args:
+        max_entries: 保持する件数の上限（超えたら最後に使われたのが古い順に破棄）
+        ttl: 保存してからの有効期間（秒、0 以下で無期限）
+        path: 永続化先の JSON ファイル（省略時はメモリのみ）。存在すれば起動時に読み込む
+        save_every: path 指定時、この件数を追加するたびに書き出す（0 で終了時の save のみ）
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600,
+        path: Optional[str] = None,
+        save_every: int = 50
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_every = save_every
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        # key → (保存時刻（time.time）, 値のJSON)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+
+    @staticmethod
+    def key(kind: str, user_input: str, context: str = "") -> str:
+        material = "\0".join((kind, normalize_input(user_input), context))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, kind: str, user_input: str, context: str = "") -> Optional[Any]:
+        key = self.key(kind, user_input, context)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0], time.time()):
+                del self._entries[key]
+                REFLECTION_CACHE_EVICTIONS.inc(reason="ttl")
+                entry = None
+            if entry is None:
+                self.misses += 1
+                REFLECTION_CACHE_REQUESTS.inc(kind=kind, result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        REFLECTION_CACHE_REQUESTS.inc(kind=kind, result="hit")
+        return json.loads(entry[1])
+
+    def put(self, kind: str, user_input: str, context: str, value: Any):
+        key = self.key(kind, user_input, context)
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._entries[key] = (time.time(), encoded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                REFLECTION_CACHE_EVICTIONS.inc(reason="capacity")
+            self._unsaved += 1
+            due = bool(self.path) and self.save_every > 0 and self._unsaved >= self.save_every
+            if due:
+                self._unsaved = 0
+        if due:
+            # 呼び出し元（Core のイベントループ）をファイル書き込みで止めない
+            threading.Thread(target=self.save, name="reflection-cache-save", daemon=True).start()
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+        return count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def load(self):
+        """path から読み込む（期限切れは捨て、上限を超えるぶんは古い方から捨てる）"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load reflection cache {self.path}: {e}")
+            return
+        if data.get("version") != CACHE_FILE_VERSION:
+            logger.warning(f"Ignoring reflection cache {self.path}: unsupported version {data.get('version')}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, stored_at, encoded in data.get("entries", []):
+                if not self._expired(stored_at, now):
+                    self._entries[key] = (stored_at, encoded)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            count = len(self._entries)
+        logger.info(f"Loaded {count} reflection cache entries from {self.path}")
+
+    def save(self):
+        """path に書き出す（一時ファイルに書いてから置き換えるので、途中で落ちても前の内容が残る）"""
+        if not self.path:
+            return
+        # 後から取った内容が先に書かれて古い内容で上書きされないよう、取得から置き換えまでを直列にする
+        with self._save_lock:
+            now = time.time()
+            with self._lock:
+                entries = [
+                    [key, stored_at, encoded]
+                    for key, (stored_at, encoded) in self._entries.items()
+                    if not self._expired(stored_at, now)
+                ]
+                self._unsaved = 0
+            tmp_path = f"{self.path}.tmp"
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": CACHE_FILE_VERSION, "entries": entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save reflection cache {self.path}: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries = len(self._entries)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "persistent": bool(self.path)
+        }
@@ -6,22 +6,119 @@
 1. 反射（Reflection）: ユーザー入力の意図・感情を分析
 2. 推論（Reasoning）: 適切な応答戦略を考える
 3. 応答生成: 最終的な回答を生成
+
+反射と推論は2回の呼び出し（reflect → reason）で行うほか、
+reflect_and_reason で1回の構造化出力（Ollama の format にJSONスキーマを指定）にまとめられる。
+cache を渡すと、同じ入力・文脈に対する結果を再利用して呼び出しを省く。
 """
 
-import requests
 import json
+from contextlib import nullcontext
+
+from metrics import REGISTRY
+from ollama_client import OllamaSyncClient
+
+OLLAMA_LATENCY = REGISTRY.histogram(
+    "botan_ollama_request_seconds",
+    "Latency of calls to Ollama",
+    ["endpoint", "model", "outcome"]
+)
+REFLECTION_RESULTS = REGISTRY.counter(
+    "botan_reflection_results_total",
+    "Reflection/reasoning outputs by validation result (ok, partial, fallback)",
+    ["mode", "outcome"]
+)
+
+# JSONを読めなかったとき・項目が欠けたときの既定値
+REFLECTION_DEFAULTS = {
+    "intent": "不明",
+    "emotion": "ニュートラル",
+    "key_points": [],
+    "tone": "カジュアル"
+}
+REASONING_DEFAULTS = {
+    "approach": "カジュアルな会話",
+    "botan_elements": ["明るさ", "ギャル語"],
+    "avoid": ["説教"],
+    "direction": "楽しく返す"
+}
+
+def _schema_type(default):
+    if isinstance(default, list):
+        return {"type": "array", "items": {"type": "string"}}
+    return {"type": "string"}
+
+# 1回で反射と推論をまとめて出力させるときのスキーマ（Ollama の format に渡す）
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        key: _schema_type(default)
+        for key, default in {**REFLECTION_DEFAULTS, **REASONING_DEFAULTS}.items()
+    },
+    "required": list(REFLECTION_DEFAULTS) + list(REASONING_DEFAULTS)
+}
+
+def _extract_json(response):
+    """応答テキスト中の最初の { から最後の } までを JSON として読む（失敗時 None）"""
+    try:
+        if "{" in response and "}" in response:
+            json_start = response.find("{")
+            json_end = response.rfind("}") + 1
+            return json.loads(response[json_start:json_end])
+    except ValueError:
+        pass
+    return None
+
+# 既定値で埋めた結果（読めなかった・項目が欠けた）はキャッシュしない
+_INCOMPLETE_KEYS = ("raw_analysis", "raw_reasoning", "invalid_fields")
+
+def _complete(*results):
+    return not any(key in result for result in results for key in _INCOMPLETE_KEYS)
+
+def _valid_field(value, default):
+    """スキーマどおりの型か（文字列は空でないこと、配列は文字列のみ）"""
+    if isinstance(default, list):
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+    return isinstance(value, str) and bool(value.strip())
 
 class ReflectionReasoningSystem:
-    def __init__(self, model_name="qwen2.5:3b", ollama_host="http://localhost:11434"):
+    def __init__(
+        self,
+        model_name="qwen2.5:3b",
+        ollama_host=None,
+        breaker=None,
+        client=None,
+        cache=None,
+        sync_client=None
+    ):
         """
         反射＋推論システムの初期化
 
         Args:
             model_name: 思考プロセス用のモデル（軽量モデル推奨）
-            ollama_host: OllamaサーバーのURL
+            ollama_host: OllamaサーバーのURL（省略時は OLLAMA_HOST）
+            breaker: resilience.CircuitBreaker（省略時はタイムアウト30秒固定）
+            client: llm_backend.LLMBackend（reflect_async / reason_async で使用）
+            cache: reflection_cache.ReflectionCache（省略時はキャッシュしない）
+            sync_client: llm_backend.SyncLLMBackend（reflect / reason で使用、
+                省略時は ollama_host への OllamaSyncClient を最初の呼び出しで作る）
         """
         self.model_name = model_name
-        self.api_url = f"{ollama_host}/api/generate"
+        self.ollama_host = ollama_host
+        self.breaker = breaker
+        self.client = client
+        self.cache = cache
+        self.sync_client = sync_client
+
+    def _cached(self, kind, user_input, context):
+        if self.cache is None:
+            return None
+        return self.cache.get(f"{kind}:{self.model_name}", user_input, context)
+
+    def _store(self, kind, user_input, context, value, *results):
+        if self.cache is not None and _complete(*results):
+            self.cache.put(f"{kind}:{self.model_name}", user_input, context, value)
+        return value
 
     def reflect(self, user_input, conversation_context=""):
         """
@@ -34,13 +131,26 @@ class ReflectionReasoningSystem:
         Returns:
             dict: 分析結果（意図、感情、重要ポイント）
         """
-        prompt = f"""以下のユーザー入力を分析してください。
-
-【ユーザー入力】
-{user_input}
-
-【過去の文脈】
-{conversation_context if conversation_context else "なし"}
+        cached = self._cached("reflect", user_input, conversation_context)
+        if cached is not None:
+            return cached
+        response = self._generate(self._reflection_prompt(user_input, conversation_context))
+        result = self._parse_reflection(response)
+        return self._store("reflect", user_input, conversation_context, result, result)
+
+    async def reflect_async(self, user_input, conversation_context=""):
+        """reflect の非同期版（self.client を使う）"""
+        cached = self._cached("reflect", user_input, conversation_context)
+        if cached is not None:
+            return cached
+        response = await self._generate_async(self._reflection_prompt(user_input, conversation_context))
+        result = self._parse_reflection(response)
+        return self._store("reflect", user_input, conversation_context, result, result)
+
+    # プロンプトは固定の指示を先頭に、毎回変わる入力を末尾に置く
+    # （Ollama がリクエスト間で先頭部分の KV キャッシュを再利用できるように）
+    def _reflection_prompt(self, user_input, conversation_context):
+        return f"""以下のユーザー入力を分析してください。
 
 【分析項目】
 1. 意図（何を求めているか）
@@ -49,28 +159,23 @@ class ReflectionReasoningSystem:
 4. 応答のトーン（カジュアル/フォーマル/励まし/共感など）
 
 JSON形式で返してください。
-"""
 
-        response = self._generate(prompt)
+【過去の文脈】
+{conversation_context if conversation_context else "なし"}
 
-        try:
-            # JSON抽出を試みる
-            if "{" in response and "}" in response:
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-                return json.loads(json_str)
-        except:
-            pass
+【ユーザー入力】
+{user_input}
+"""
+
+    def _parse_reflection(self, response):
+        result = _extract_json(response)
+        if result is not None:
+            REFLECTION_RESULTS.inc(mode="two_pass", outcome="ok")
+            return result
 
         # JSONパースに失敗した場合、テキストとして返す
-        return {
-            "intent": "不明",
-            "emotion": "ニュートラル",
-            "key_points": [],
-            "tone": "カジュアル",
-            "raw_analysis": response
-        }
+        REFLECTION_RESULTS.inc(mode="two_pass", outcome="fallback")
+        return {**REFLECTION_DEFAULTS, "raw_analysis": response}
 
     def reason(self, user_input, reflection_result, character_profile):
         """
@@ -84,17 +189,36 @@ JSON形式で返してください。
         Returns:
             dict: 応答戦略（アプローチ、含めるべき要素）
         """
-        prompt = f"""牡丹として、以下の情報を元に応答戦略を考えてください。
+        context = self._reasoning_context(reflection_result, character_profile)
+        cached = self._cached("reason", user_input, context)
+        if cached is not None:
+            return cached
+        response = self._generate(self._reasoning_prompt(user_input, reflection_result, character_profile))
+        result = self._parse_reasoning(response)
+        return self._store("reason", user_input, context, result, result)
+
+    async def reason_async(self, user_input, reflection_result, character_profile):
+        """reason の非同期版（self.client を使う）"""
+        context = self._reasoning_context(reflection_result, character_profile)
+        cached = self._cached("reason", user_input, context)
+        if cached is not None:
+            return cached
+        response = await self._generate_async(
+            self._reasoning_prompt(user_input, reflection_result, character_profile)
+        )
+        result = self._parse_reasoning(response)
+        return self._store("reason", user_input, context, result, result)
+
+    def _reasoning_context(self, reflection_result, character_profile):
+        # 反射結果がキャッシュから来れば同じ文字列になり、推論もそのままヒットする
+        return json.dumps(reflection_result, ensure_ascii=False, sort_keys=True) + "\n" + character_profile
+
+    def _reasoning_prompt(self, user_input, reflection_result, character_profile):
+        return f"""牡丹として、以下の情報を元に応答戦略を考えてください。
 
 【キャラクター】
 {character_profile}
 
-【ユーザー入力】
-{user_input}
-
-【入力分析結果】
-{json.dumps(reflection_result, ensure_ascii=False, indent=2)}
-
 【応答戦略を考える】
 1. どのような応答アプローチが適切か（質問に答える/共感する/励ます/冗談を言う など）
 2. 牡丹らしさをどう表現するか（ギャル語、絵文字的表現、明るさ）
@@ -102,27 +226,118 @@ JSON形式で返してください。
 4. 具体的な応答の方向性
 
 JSON形式で返してください。
+
+【入力分析結果】
+{json.dumps(reflection_result, ensure_ascii=False, indent=2)}
+
+【ユーザー入力】
+{user_input}
 """
 
-        response = self._generate(prompt)
+    def _parse_reasoning(self, response):
+        result = _extract_json(response)
+        if result is not None:
+            REFLECTION_RESULTS.inc(mode="two_pass", outcome="ok")
+            return result
 
-        try:
-            # JSON抽出を試みる
-            if "{" in response and "}" in response:
-                json_start = response.find("{")
-                json_end = response.rfind("}") + 1
-                json_str = response[json_start:json_end]
-                return json.loads(json_str)
-        except:
-            pass
+        REFLECTION_RESULTS.inc(mode="two_pass", outcome="fallback")
+        return {**REASONING_DEFAULTS, "raw_reasoning": response}
 
-        return {
-            "approach": "カジュアルな会話",
-            "botan_elements": ["明るさ", "ギャル語"],
-            "avoid": ["説教"],
-            "direction": "楽しく返す",
-            "raw_reasoning": response
-        }
+    def reflect_and_reason(self, user_input, conversation_context, character_profile):
+        """
+        反射と推論を1回の呼び出しで行う（構造化出力）
+
+        Args:
+            user_input: ユーザーの入力
+            conversation_context: 過去の会話コンテキスト
+            character_profile: キャラクタープロファイル（牡丹の設定）
+
+        Returns:
+            tuple: (反射結果, 推論結果) — 形式は reflect / reason と同じ
+        """
+        context = f"{conversation_context}\n{character_profile}"
+        cached = self._cached("combined", user_input, context)
+        if cached is not None:
+            return tuple(cached)
+        response = self._generate(
+            self._combined_prompt(user_input, conversation_context, character_profile),
+            max_tokens=400,
+            format=COMBINED_SCHEMA
+        )
+        results = self._parse_combined(response)
+        return self._store("combined", user_input, context, results, *results)
+
+    async def reflect_and_reason_async(self, user_input, conversation_context, character_profile):
+        """reflect_and_reason の非同期版（self.client を使う）"""
+        context = f"{conversation_context}\n{character_profile}"
+        cached = self._cached("combined", user_input, context)
+        if cached is not None:
+            return tuple(cached)
+        response = await self._generate_async(
+            self._combined_prompt(user_input, conversation_context, character_profile),
+            max_tokens=400,
+            format=COMBINED_SCHEMA
+        )
+        results = self._parse_combined(response)
+        return self._store("combined", user_input, context, results, *results)
+
+    def _combined_prompt(self, user_input, conversation_context, character_profile):
+        return f"""牡丹として、ユーザー入力を分析し、応答戦略を考えてください。
+
+【キャラクター】
+{character_profile}
+
+【出力項目】
+- intent: 意図（何を求めているか）
+- emotion: 感情（喜怒哀楽、ニュートラル）
+- key_points: 重要ポイント（キーワード、固有名詞）の配列
+- tone: 応答のトーン（カジュアル/フォーマル/励まし/共感など）
+- approach: 適切な応答アプローチ（質問に答える/共感する/励ます/冗談を言う など）
+- botan_elements: 牡丹らしさの表現（ギャル語、絵文字的表現、明るさ）の配列
+- avoid: 避けるべきこと（説教くさい、知識をひけらかす など）の配列
+- direction: 具体的な応答の方向性
+
+すべての項目を含むJSONだけを返してください。
+
+【過去の文脈】
+{conversation_context if conversation_context else "なし"}
+
+【ユーザー入力】
+{user_input}
+"""
+
+    def _parse_combined(self, response):
+        """
+        スキーマどおりか項目ごとに検証し、不正な項目は既定値で埋める
+
+        JSONとして読めない場合は全項目を既定値にする（fallback）。
+        """
+        data = _extract_json(response)
+        if not isinstance(data, dict):
+            REFLECTION_RESULTS.inc(mode="single_pass", outcome="fallback")
+            return (
+                {**REFLECTION_DEFAULTS, "raw_analysis": response},
+                dict(REASONING_DEFAULTS)
+            )
+
+        invalid = []
+        results = []
+        for defaults in (REFLECTION_DEFAULTS, REASONING_DEFAULTS):
+            result = {}
+            for key, default in defaults.items():
+                value = data.get(key)
+                if _valid_field(value, default):
+                    result[key] = value
+                else:
+                    result[key] = default
+                    invalid.append(key)
+            results.append(result)
+
+        reflection_result, reasoning_result = results
+        if invalid:
+            reflection_result["invalid_fields"] = invalid
+        REFLECTION_RESULTS.inc(mode="single_pass", outcome="partial" if invalid else "ok")
+        return reflection_result, reasoning_result
 
     def enhance_response(self, original_response, reasoning_result):
         """
@@ -146,35 +361,63 @@ JSON形式で返してください。
 
         return original_response
 
-    def _generate(self, prompt, max_tokens=500):
+    def _generate(self, prompt, max_tokens=500, format=None):
         """
         Ollamaで推論を実行
 
         Args:
             prompt: プロンプト
             max_tokens: 最大トークン数
+            format: 出力形式（"json" またはJSONスキーマ）
 
         Returns:
             str: 生成されたテキスト
         """
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": 0.3  # 分析タスクなので低めの温度
-            }
-        }
+        extra = {"format": format} if format is not None else {}
+        if self.sync_client is None:
+            self.sync_client = OllamaSyncClient(self.ollama_host)
+
+        breaker = self.breaker
+        try:
+            with breaker.guard() if breaker else nullcontext(), \
+                    OLLAMA_LATENCY.time(endpoint="/api/generate", model=self.model_name):
+                data = self.sync_client.generate(
+                    self.model_name,
+                    prompt,
+                    options=self._options(max_tokens),
+                    timeout=breaker.timeout() if breaker else 30,
+                    **extra
+                )
+            return data.get("response", "")
+        except Exception as e:
+            print(f"[ERROR] 推論エラー: {e}")
+            return ""
 
+    async def _generate_async(self, prompt, max_tokens=500, format=None):
+        """_generate の非同期版（共有の OllamaClient を使い、イベントループを止めない）"""
+        extra = {"format": format} if format is not None else {}
+        breaker = self.breaker
         try:
-            response = requests.post(self.api_url, json=payload, timeout=30)
-            data = response.json()
+            with breaker.guard() if breaker else nullcontext(), \
+                    OLLAMA_LATENCY.time(endpoint="/api/generate", model=self.model_name):
+                data = await self.client.generate(
+                    self.model_name,
+                    prompt,
+                    options=self._options(max_tokens),
+                    timeout=breaker.timeout() if breaker else 30,
+                    **extra
+                )
             return data.get("response", "")
         except Exception as e:
             print(f"[ERROR] 推論エラー: {e}")
             return ""
 
+    def _options(self, max_tokens):
+        return {
+            "num_predict": max_tokens,
+            "temperature": 0.3  # 分析タスクなので低めの温度
+        }
+
 def main():
     """テスト用メイン関数"""
     print("=" * 60)
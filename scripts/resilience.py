@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+サーキットブレーカーと適応タイムアウト
+
+API Gateway（Core / Voice 呼び出し）と Core（Ollama 呼び出し）で共通に使う。
+失敗が続いたアップストリームへの呼び出しを一定時間止め（open）、
+タイムアウトは固定値ではなく最近の成功レイテンシのパーセンタイルから決める。
+
+    breaker = CircuitBreaker("voice", default_timeout=30)
+    with breaker.guard():
+        await client.post(..., timeout=breaker.timeout())
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from metrics import REGISTRY
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# name → CircuitBreaker（メトリクス出力用）
+_breakers: Dict[str, "CircuitBreaker"] = {}
+
+REGISTRY.gauge(
+    "botan_circuit_breaker_state",
+    "Circuit breaker state (0=closed, 1=half_open, 2=open)",
+    ["upstream"],
+    callback=lambda: {name: _STATE_VALUES[b.state] for name, b in list(_breakers.items())}
+)
+REGISTRY.gauge(
+    "botan_upstream_timeout_seconds",
+    "Current adaptive timeout per upstream",
+    ["upstream"],
+    callback=lambda: {name: b.timeout() for name, b in list(_breakers.items())}
+)
+BREAKER_TRANSITIONS = REGISTRY.counter(
+    "botan_circuit_breaker_transitions_total",
+    "Circuit breaker state transitions",
+    ["upstream", "state"]
+)
+BREAKER_REJECTED = REGISTRY.counter(
+    "botan_circuit_breaker_rejected_total",
+    "Calls short-circuited while the breaker was open",
+    ["upstream"]
+)
+BREAKER_SLOW_CALLS = REGISTRY.counter(
+    "botan_circuit_breaker_slow_calls_total",
+    "Successful calls counted as failures for exceeding the slow-call threshold",
+    ["upstream"]
+)
+
+class CircuitOpenError(Exception):
+    """ブレーカーが open のため呼び出さなかった"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit open for {name}")
+        self.name = name
+        self.retry_after = retry_after
+
+class AdaptiveTimeout:
+    """
+    最近の成功レイテンシの p(percentile) × multiplier をタイムアウトにする
+
+    サンプルが min_samples 未満の間は default を使い、結果は
+    [floor, ceiling] に収める（ceiling の既定値は default）。
+    """
+
+    def __init__(
+        self,
+        default: float,
+        floor: Optional[float] = None,
+        ceiling: Optional[float] = None,
+        percentile: float = 0.99,
+        multiplier: float = 2.0,
+        window: int = 100,
+        min_samples: int = 20
+    ):
+        self.default = default
+        self.floor = floor if floor is not None else min(1.0, default)
+        self.ceiling = ceiling if ceiling is not None else default
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, p: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    def current(self) -> float:
+        with self._lock:
+            enough = len(self._samples) >= self.min_samples
+        if not enough:
+            return self.default
+        return max(self.floor, min(self.ceiling, self.quantile(self.percentile) * self.multiplier))
+
+class CircuitBreaker:
+    """
+    連続失敗で open → reset_timeout 後に1件だけ試す half_open → 成功で closed
+
+    slow_call_threshold を指定すると、それより遅い成功も失敗として数える
+    （応答はするが遅すぎるアップストリームを切り離すため）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        default_timeout: float,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        slow_call_threshold: Optional[float] = None,
+        timeout_floor: Optional[float] = None,
+        is_failure: Optional[Callable[[Exception], bool]] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.is_failure = is_failure or (lambda e: True)
+        self.timeouts = AdaptiveTimeout(default_timeout, floor=timeout_floor)
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        _breakers[name] = self
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def _transition(self, state: str):
+        if self._state != state:
+            self._state = state
+            BREAKER_TRANSITIONS.inc(upstream=self.name, state=state)
+
+    def available(self) -> bool:
+        """呼び出しが通る見込みがあるか（状態は変えない）"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def timeout(self) -> float:
+        return self.timeouts.current()
+
+    def _acquire(self):
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._transition(HALF_OPEN)
+                self._probing = True
+                return
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        BREAKER_REJECTED.inc(upstream=self.name)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _record_success(self, elapsed: Optional[float]):
+        if elapsed is not None:
+            self.timeouts.observe(elapsed)
+            if self.slow_call_threshold is not None and elapsed > self.slow_call_threshold:
+                BREAKER_SLOW_CALLS.inc(upstream=self.name)
+                self._record_failure()
+                return
+        with self._lock:
+            self._probing = False
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def _record_failure(self):
+        with self._lock:
+            self._probing = False
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def _release(self):
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self, observe: bool = True):
+        """
+        呼び出しをブレーカーで保護する
+
+        Args:
+            observe: 所要時間を適応タイムアウトのサンプルにするか
+
+        Raises:
+            CircuitOpenError: open 中（half_open で試行中の場合も含む）
+        """
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if self.is_failure(e):
+                self._record_failure()
+            else:
+                # アップストリームは応答している（4xx など）
+                self._record_success(None)
+            raise
+        except BaseException:
+            # キャンセル・ジェネレータの途中終了は成否に数えない
+            self._release()
+            raise
+        else:
+            self._record_success(time.perf_counter() - started if observe else None)
+
+    def snapshot(self) -> Dict:
+        p50 = self.timeouts.quantile(0.5)
+        p99 = self.timeouts.quantile(0.99)
+        with self._lock:
+            state = self._current_state()
+            failures = self._failures
+        return {
+            "state": state,
+            "consecutive_failures": failures,
+            "timeout_seconds": round(self.timeout(), 3),
+            "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+            "latency_p99_seconds": round(p99, 3) if p99 is not None else None
+        }
+
+def breaker_snapshots() -> Dict[str, Dict]:
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
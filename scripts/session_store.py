@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+ユーザーごとの会話セッション管理
+
+Core Service が user_id ごとに会話履歴を持つために使う。
+セッション数・無操作時間・全体のメモリ量に上限を設け、超えた分は
+最後に使われたのが古い順（LRU）に破棄する。
+
+    store = SessionStore(max_sessions=1000, idle_ttl=1800, max_bytes=64 * 1024 * 1024)
+    session = store.get(user_id)
+    messages = session.messages(user_input)   # Ollama に送る履歴 + 今回の入力
+    ...
+    store.record_turn(session, user_input, response)
+
+古いターンを要約にまとめる処理は context_window.ContextWindow が行う。
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+SESSION_EVICTIONS = REGISTRY.counter(
+    "botan_core_session_evictions_total",
+    "Sessions or turns dropped by the session store",
+    ["reason"]
+)
+
+# 1ターン = (ユーザー入力, 牡丹の応答, 概算トークン数)
+Turn = Tuple[str, str, int]
+
+def _turn_size(turn: Turn) -> int:
+    return len(turn[0].encode("utf-8")) + len(turn[1].encode("utf-8"))
+
+class Session:
+    """
+    1ユーザーぶんの会話履歴
+
+    履歴はメッセージの dict ではなく (入力, 応答, トークン数) のタプルで持ち、
+    Ollama に送るときだけ dict に展開する。要約済みのターンは summary_text に
+    まとめられ、turns からは取り除かれる。
+
+    lock は個々のフィールドの読み書きを守るだけなので、1ターン全体
+    （履歴の組み立て → 応答生成 → 記録）は turn_lock を持って行う。
+    同じユーザーの同時リクエストは到着順に1ターンずつ処理され、
+    後のターンのプロンプトには前のターンが必ず入る。
+    """
+
+    __slots__ = (
+        "user_id", "turns", "size", "tokens", "summary_text", "summary_tokens", "folded_tokens",
+        "summarizing", "created_at", "last_active", "lock", "turn_lock"
+    )
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.turns: Deque[Turn] = deque()
+        self.size = 0
+        self.tokens = 0
+        self.summary_text = ""
+        self.summary_tokens = 0
+        self.folded_tokens = 0  # 要約に畳んだターンの元のトークン数
+        self.summarizing = False
+        self.created_at = time.time()
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+        self.turn_lock = asyncio.Lock()
+
+    def messages(self, user_input: Optional[str] = None) -> List[Dict]:
+        """Ollama chat API 用のメッセージ列（user_input を渡すと末尾に追加）"""
+        with self.lock:
+            turns = list(self.turns)
+        messages = []
+        for user_text, assistant_text, _ in turns:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": assistant_text})
+        if user_input is not None:
+            messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def recent_turns(self, max_turns: int) -> List[Turn]:
+        with self.lock:
+            return list(self.turns)[-max_turns:] if max_turns > 0 else []
+
+    def snapshot(self) -> Tuple[str, int, List[Turn]]:
+        """(要約, 要約のトークン数, ターン一覧) を一貫した状態で取得"""
+        with self.lock:
+            return self.summary_text, self.summary_tokens, list(self.turns)
+
+    def _append(self, turn: Turn, max_turns: int) -> Tuple[int, int]:
+        """ターンを追加し、(増えたバイト数, 押し出したターン数) を返す"""
+        with self.lock:
+            added = _turn_size(turn)
+            self.turns.append(turn)
+            self.size += added
+            self.tokens += turn[2]
+            dropped = 0
+            while max_turns > 0 and len(self.turns) > max_turns:
+                added -= self._popleft()
+                dropped += 1
+            return added, dropped
+
+    def _drop_oldest(self) -> int:
+        """最古のターンを捨て、減ったバイト数を返す（空なら 0）"""
+        with self.lock:
+            if not self.turns:
+                return 0
+            return self._popleft()
+
+    def _popleft(self) -> int:
+        turn = self.turns.popleft()
+        removed = _turn_size(turn)
+        self.size -= removed
+        self.tokens -= turn[2]
+        return removed
+
+    def _fold(self, folded: List[Turn], summary: str, summary_tokens: int) -> int:
+        """
+        先頭の folded ターンを要約に置き換え、増えたバイト数を返す
+
+        要約中に押し出されたターンは飛ばす（同一オブジェクトかで判定）。
+        """
+        with self.lock:
+            folded_ids = {id(turn) for turn in folded}
+            delta = 0
+            while self.turns and id(self.turns[0]) in folded_ids:
+                self.folded_tokens += self.turns[0][2]
+                delta -= self._popleft()
+            summary_delta = len(summary.encode("utf-8")) - len(self.summary_text.encode("utf-8"))
+            self.size += summary_delta
+            delta += summary_delta
+            self.summary_text = summary
+            self.summary_tokens = summary_tokens
+            return delta
+
+    def summary(self, now: Optional[float] = None) -> Dict:
+        now = now if now is not None else time.monotonic()
+        with self.lock:
+            turns = len(self.turns)
+            size = self.size
+            tokens = self.tokens
+            summary_tokens = self.summary_tokens
+        return {
+            "user_id": self.user_id,
+            "turns": turns,
+            "tokens": tokens,
+            "summary_tokens": summary_tokens,
+            "bytes": size,
+            "created_at": self.created_at,
+            "idle_seconds": round(now - self.last_active, 1)
+        }
+
+class SessionStore:
+    """
+    user_id → Session（LRU + 無操作TTL + メモリ上限）
+
+    Args:
+        max_sessions: 保持するセッション数の上限
+        idle_ttl: この秒数使われなかったセッションは破棄（0 で無効）
+        max_bytes: 全セッションの履歴テキストの合計バイト数の上限
+        max_turns: 1セッションあたりに保持するターン数の上限（0 で無制限）
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 1800.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_turns: int = 50
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Session:
+        """セッションを取得（なければ作成）し、最近使ったものとして記録"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.pop(user_id, None)
+            if session is None:
+                session = Session(user_id)
+            session.last_active = now
+            self._sessions[user_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._evict_oldest("capacity")
+            return session
+
+    def peek(self, user_id: str) -> Optional[Session]:
+        """LRU の順序を変えずに取得"""
+        with self._lock:
+            return self._sessions.get(user_id)
+
+    def record_turn(self, session: Session, user_text: str, assistant_text: str, tokens: int = 0):
+        """1ターンを履歴に追加し、メモリ上限を超えたら古いものから削る"""
+        with self._lock:
+            added, dropped = session._append((user_text, assistant_text, tokens), self.max_turns)
+            if dropped:
+                SESSION_EVICTIONS.inc(dropped, reason="max_turns")
+            session.last_active = time.monotonic()
+            # 応答生成中にリセット・破棄されたセッションは数えない
+            if self._sessions.get(session.user_id) is not session:
+                return
+            self._bytes += added
+            self._enforce_memory(session)
+
+    def fold(self, session: Session, folded: List[Turn], summary: str, summary_tokens: int):
+        """古いターンを要約に置き換える（リセット・破棄済みのセッションなら何もしない）"""
+        with self._lock:
+            if self._sessions.get(session.user_id) is not session:
+                return
+            self._bytes += session._fold(folded, summary, summary_tokens)
+            self._enforce_memory(session)
+
+    def restore(
+        self,
+        user_id: str,
+        turns: List[Turn],
+        summary: str = "",
+        summary_tokens: int = 0,
+        idle_seconds: float = 0.0
+    ) -> Session:
+        """会話ログから復元したセッションを登録（起動時用、idle_seconds ぶん前に使われた扱い）"""
+        session = self.get(user_id)
+        for user_text, assistant_text, tokens in turns:
+            self.record_turn(session, user_text, assistant_text, tokens)
+        if summary:
+            self.fold(session, [], summary, summary_tokens)
+        session.last_active = time.monotonic() - idle_seconds
+        return session
+
+    def reset(self, user_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(user_id, None)
+            if session is None:
+                return False
+            self._bytes -= session.size
+            return True
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._sessions)
+            self._sessions.clear()
+            self._bytes = 0
+            return count
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _expire(self, now: float):
+        # 先頭ほど最終利用が古いので、期限内のものに当たったら止める
+        if self.idle_ttl <= 0:
+            return
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active < self.idle_ttl:
+                break
+            self._evict_oldest("idle")
+
+    def _evict_oldest(self, reason: str):
+        _, session = self._sessions.popitem(last=False)
+        self._bytes -= session.size
+        SESSION_EVICTIONS.inc(reason=reason)
+
+    def _enforce_memory(self, current: Session):
+        # 他のセッションを古い順に破棄し、それでも足りなければ現在のセッションの古いターンを削る
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions.values()))
+            if oldest is current:
+                break
+            self._evict_oldest("memory")
+        while self._bytes > self.max_bytes:
+            removed = current._drop_oldest()
+            if not removed:
+                break
+            self._bytes -= removed
+            SESSION_EVICTIONS.inc(reason="memory_turns")
+
+    def list_sessions(self, limit: int = 100) -> List[Dict]:
+        """最近使われた順のセッション概要"""
+        now = time.monotonic()
+        with self._lock:
+            sessions = list(reversed(self._sessions.values()))[:limit]
+        return [session.summary(now) for session in sessions]
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            count = len(self._sessions)
+            total = self._bytes
+            turns = sum(len(session.turns) for session in self._sessions.values())
+            tokens = sum(session.tokens + session.summary_tokens for session in self._sessions.values())
+        return {
+            "count": count,
+            "turns": turns,
+            "tokens": tokens,
+            "bytes": total,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "idle_ttl_seconds": self.idle_ttl
+        }
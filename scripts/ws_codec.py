@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+WebSocket フレームのエンコード (json / orjson / msgpack)
+
+クライアントは接続時に encoding と fields（受け取るフィールド）を指定できる。
+既定は標準ライブラリの json（テキストフレーム）で、orjson / msgpack は
+インストールされている場合のみ使える。
+
+    json     テキストフレーム（標準ライブラリ）
+    orjson   テキストフレーム（同じJSON、エンコードが速い）
+    msgpack  バイナリフレーム（フレームが小さい）
+
+音声はエンコード設定に関係なく専用のバイナリフレームで送る:
+
+    b"BA\x01" | ヘッダ長 (uint16 BE) | ヘッダ (UTF-8 JSON) | 音声バイト列
+
+msgpack のフレームは常に map (先頭 0x80-0x8f / 0xde / 0xdf) なので、
+先頭3バイトで区別できる。
+"""
+
+import json
+import struct
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+DEFAULT_ENCODING = "json"
+
+# フィールド指定があっても必ず送るフィールド（振り分けと対応付けに必要）
+REQUIRED_FIELDS = frozenset({"type", "request_id"})
+
+# 制御フレームはフィールド指定に関係なく全フィールド送る
+CONTROL_FRAME_TYPES = frozenset({"connected", "hello_ack", "error", "busy"})
+
+Payload = Union[str, bytes]
+
+class FrameCodec:
+    def __init__(
+        self,
+        name: str,
+        dumps: Callable[[Any], Payload],
+        loads: Callable[[Payload], Any],
+        binary: bool
+    ):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        self.binary = binary
+
+def _build_codecs() -> Dict[str, FrameCodec]:
+    codecs = {
+        "json": FrameCodec(
+            "json",
+            lambda message: json.dumps(message, ensure_ascii=False),
+            json.loads,
+            binary=False
+        )
+    }
+    if orjson is not None:
+        codecs["orjson"] = FrameCodec(
+            "orjson",
+            lambda message: orjson.dumps(message).decode("utf-8"),
+            orjson.loads,
+            binary=False
+        )
+    if msgpack is not None:
+        codecs["msgpack"] = FrameCodec(
+            "msgpack",
+            lambda message: msgpack.packb(message, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+            binary=True
+        )
+    return codecs
+
+CODECS = _build_codecs()
+
+def available_encodings():
+    return list(CODECS)
+
+def parse_fields(value: Union[None, str, Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """
+    "text,delta" / ["text", "delta"] を frozenset に変換
+
+    未指定・空の場合は None（全フィールド）。
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    fields = frozenset(field.strip() for field in value if field and field.strip())
+    return fields or None
+
+class WireFormat:
+    """
+    1接続ぶんのエンコード設定（コーデック + フィールド選択）
+
+    key が同じ接続同士は同じバイト列を共有できる。
+    """
+
+    def __init__(self, codec: FrameCodec, fields: Optional[FrozenSet[str]] = None):
+        self.codec = codec
+        self.fields = fields
+        self.key = (codec.name, fields)
+
+    @classmethod
+    def negotiate(cls, encoding: Optional[str], fields=None) -> "WireFormat":
+        """
+        クライアントの指定から WireFormat を作る
+
+        Raises:
+            ValueError: 未対応（または未インストール）の encoding
+        """
+        name = (encoding or DEFAULT_ENCODING).lower()
+        codec = CODECS.get(name)
+        if codec is None:
+            raise ValueError(
+                f"Unsupported encoding: {name} (available: {', '.join(available_encodings())})"
+            )
+        return cls(codec, parse_fields(fields))
+
+    def select(self, message: dict) -> dict:
+        if self.fields is None or message.get("type") in CONTROL_FRAME_TYPES:
+            return message
+        return {
+            key: value for key, value in message.items()
+            if key in self.fields or key in REQUIRED_FIELDS
+        }
+
+    def encode(self, message: dict) -> Payload:
+        return self.codec.dumps(self.select(message))
+
+    def describe(self) -> dict:
+        return {
+            "encoding": self.codec.name,
+            "fields": sorted(self.fields) if self.fields is not None else None
+        }
+
+DEFAULT_WIRE_FORMAT = WireFormat(CODECS[DEFAULT_ENCODING])
+
+AUDIO_FRAME_MAGIC = b"BA\x01"
+_AUDIO_HEADER_LENGTH = struct.Struct(">H")
+
+def encode_audio_frame(header: dict, audio: bytes) -> bytes:
+    """
+    音声バイナリフレームを作る
+
+    Args:
+        header: request_id / segment / seq / last など
+        audio: 音声バイト列（最終フレームは空でもよい）
+    """
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return AUDIO_FRAME_MAGIC + _AUDIO_HEADER_LENGTH.pack(len(header_bytes)) + header_bytes + audio
+
+def is_audio_frame(payload) -> bool:
+    return isinstance(payload, bytes) and payload.startswith(AUDIO_FRAME_MAGIC)
+
+def decode_audio_frame(frame: bytes):
+    """
+    Returns:
+        (header, audio)。音声フレームでなければ None
+    """
+    if not frame.startswith(AUDIO_FRAME_MAGIC):
+        return None
+    offset = len(AUDIO_FRAME_MAGIC)
+    (length,) = _AUDIO_HEADER_LENGTH.unpack_from(frame, offset)
+    offset += _AUDIO_HEADER_LENGTH.size
+    header = json.loads(frame[offset:offset + length].decode("utf-8"))
+    return header, frame[offset + length:]
@@ -4,18 +4,171 @@ Core Service - Ollama Integration
 牡丹の会話処理を担当
 """
 
-import requests
+import asyncio
 import json
 import os
-from typing import Optional, Dict, List
+import time
+from typing import Optional, Dict, AsyncIterator, List, Tuple
 from pathlib import Path
 import sys
 
+import httpx
+
 # scripts/から既存モジュールをインポート
 sys.path.append(str(Path(__file__).parent.parent.parent / "scripts"))
 
+from llm_backend import LLMBackend, default_host
+from ollama_client import OllamaClient, is_cold
 from reflection_reasoning import ReflectionReasoningSystem
+from reflection_cache import ReflectionCache
 from user_reaction_analyzer import analyze_user_reaction, calculate_combined_score
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from resilience import CircuitBreaker, breaker_snapshots
+from session_store import Session, SessionStore, Turn
+from context_window import ContextWindow, turn_tokens
+from conversation_log import ConversationLog, new_turn_id
+
+# タイムアウト・サーキットブレーカー設定（*_TIMEOUT は適応タイムアウトの上限）
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "30"))
+OLLAMA_TIMEOUT_MIN = float(os.getenv("OLLAMA_TIMEOUT_MIN", "5"))
+REFLECTION_TIMEOUT = float(os.getenv("REFLECTION_TIMEOUT", "30"))
+REFLECTION_SLOW_THRESHOLD = float(os.getenv("REFLECTION_SLOW_THRESHOLD", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# 会話セッション（user_id ごと）の上限
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "50"))
+
+# モデルをメモリに載せておく時間（全リクエストで同じ値を送る。-1 で無期限）
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+REFLECTION_MODEL = os.getenv("REFLECTION_MODEL", "qwen2.5:3b")
+
+# 反射+推論の実行方式: two_pass（reflect → reason の2回）/ single_pass（構造化出力で1回）
+REFLECTION_MODE = os.getenv("REFLECTION_MODE", "two_pass")
+if REFLECTION_MODE not in ("two_pass", "single_pass"):
+    raise ValueError(f"Unsupported REFLECTION_MODE: {REFLECTION_MODE}")
+
+# 反射を応答生成の前に待つ（before）か、生成と並行して走らせる（parallel）か。
+# 反射の結果は生成プロンプトには入らないため、parallel なら応答の待ち時間は生成だけになる
+REFLECTION_TIMING = os.getenv("REFLECTION_TIMING", "parallel")
+if REFLECTION_TIMING not in ("before", "parallel"):
+    raise ValueError(f"Unsupported REFLECTION_TIMING: {REFLECTION_TIMING}")
+# ストリームで反射の完了を待つ間に送る ping の間隔（Gateway の読み込みタイムアウト対策）
+STREAM_PING_INTERVAL = float(os.getenv("STREAM_PING_INTERVAL", "2"))
+
+# 1リクエストで送る履歴の概算トークン予算（あふれた古いターンは要約にまとめる）
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", REFLECTION_MODEL)
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "256"))
+SUMMARY_TIMEOUT = float(os.getenv("SUMMARY_TIMEOUT", "60"))
+
+# 会話ログ（追記専用 JSONL）の置き場所。指定すると全ターンを記録し、起動時にセッションを復元する
+CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR") or None
+CONVERSATION_LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# /chat/batch: 同時に Ollama へ投げる数（既定 / リクエストで指定できる上限）と1回の件数上限。
+# 対話の応答と同じ Ollama を使うため、上限は OLLAMA_NUM_PARALLEL より小さめにしておく
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "1000"))
+
+# 反射・推論結果のキャッシュ（件数 0 で無効、パス指定で再起動後も引き継ぐ）
+REFLECTION_CACHE_SIZE = int(os.getenv("REFLECTION_CACHE_SIZE", "1024"))
+REFLECTION_CACHE_TTL = float(os.getenv("REFLECTION_CACHE_TTL", "3600"))
+REFLECTION_CACHE_PATH = os.getenv("REFLECTION_CACHE_PATH") or None
+REFLECTION_CACHE_SAVE_EVERY = int(os.getenv("REFLECTION_CACHE_SAVE_EVERY", "50"))
+
+# メトリクス
+OLLAMA_LATENCY = REGISTRY.histogram(
+    "botan_ollama_request_seconds",
+    "Latency of calls to Ollama",
+    ["endpoint", "model", "outcome"]
+)
+OLLAMA_FIRST_TOKEN = REGISTRY.histogram(
+    "botan_ollama_first_token_seconds",
+    "Time to first streamed token from Ollama (load=cold when the model had to be loaded)",
+    ["model", "load"]
+)
+CHAT_REQUESTS = REGISTRY.counter(
+    "botan_core_chat_requests_total",
+    "Chat requests handled by core",
+    ["mode", "outcome"]
+)
+CHAT_LATENCY = REGISTRY.histogram(
+    "botan_core_chat_seconds",
+    "Core chat latency including reflection",
+    ["mode", "outcome"]
+)
+REFLECTION_LATENCY = REGISTRY.histogram(
+    "botan_core_reflection_seconds",
+    "Reflection + reasoning latency before response generation",
+    ["mode", "outcome"]
+)
+BATCH_ITEMS = REGISTRY.counter(
+    "botan_core_batch_items_total",
+    "Prompts processed by /chat/batch",
+    ["outcome"]
+)
+EVALUATION_SCORE = REGISTRY.histogram(
+    "botan_core_evaluation_score",
+    "Combined evaluation scores (1-5)",
+    [],
+    buckets=(1, 2, 3, 4, 5)
+)
+REGISTRY.gauge(
+    "botan_ollama_model_warm",
+    "Whether each model core depends on is loaded in Ollama (1) or not (0)",
+    ["model"],
+    callback=lambda: {
+        model: int(status["warm"]) for model, status in ollama_health.status.items()
+    } if ollama_health else {}
+)
+REGISTRY.gauge(
+    "botan_core_sessions",
+    "Conversation sessions held in memory",
+    [],
+    callback=lambda: {(): len(core_service.sessions)} if core_service else {}
+)
+REGISTRY.gauge(
+    "botan_core_session_bytes",
+    "Total history text held by all sessions",
+    [],
+    callback=lambda: {(): core_service.sessions.stats()["bytes"]} if core_service else {}
+)
+REGISTRY.gauge(
+    "botan_reflection_cache_entries",
+    "Reflection/reasoning results held in the cache",
+    [],
+    callback=lambda: {(): len(core_service.reflection_cache)}
+    if core_service and core_service.reflection_cache is not None else {}
+)
+
+# Ollama が done の行で返す計測値（ns、eval_count はトークン数）
+OLLAMA_TIMING_FIELDS = (
+    "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration"
+)
+
+def _ollama_timings(data: Dict) -> Dict:
+    timings = {field: data[field] for field in OLLAMA_TIMING_FIELDS if field in data}
+    if timings.get("eval_count") and timings.get("eval_duration"):
+        timings["tokens_per_second"] = round(timings["eval_count"] / (timings["eval_duration"] / 1e9), 2)
+    return timings
+
+def _keep_alive(value: str):
+    # "-1" や "3600" は秒数として、"30m" などはそのまま Ollama に渡す
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def _is_ollama_failure(exc: Exception) -> bool:
+    """4xx（存在しないモデルなど）は Ollama の故障ではない"""
+    return not (isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500)
 
 class BotanCoreService:
     def __init__(
@@ -34,18 +187,95 @@ class BotanCoreService:
         """
         # 環境変数から設定を読み取り
         if ollama_host is None:
-            ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+            ollama_host = default_host()
 
         self.model_name = model_name
-        self.api_url = f"{ollama_host}/api/chat"
+        self.ollama_host = ollama_host
         self.enable_reflection = enable_reflection
 
-        # 会話履歴（Ollama chat API用）
-        self.chat_messages: List[Dict] = []
+        # Ollama呼び出しは応答生成・反射・ヘルスチェックで1つのプールを共有
+        self.ollama: LLMBackend = OllamaClient(ollama_host, timeout=OLLAMA_TIMEOUT, keep_alive=_keep_alive(OLLAMA_KEEP_ALIVE))
+
+        # 会話履歴（user_id ごと、Ollama chat API用）
+        self.sessions = SessionStore(
+            max_sessions=SESSION_MAX,
+            idle_ttl=SESSION_IDLE_TTL,
+            max_bytes=SESSION_MAX_BYTES,
+            max_turns=SESSION_MAX_TURNS
+        )
+        self.context = ContextWindow(
+            self.sessions,
+            self._summarize,
+            budget_tokens=CONTEXT_TOKEN_BUDGET,
+            on_fold=self._log_fold
+        )
+
+        # 会話ログ（書き込みはバックグラウンドのスレッド）と、そこからのセッション復元
+        self.conversation_log = None
+        if CONVERSATION_LOG_DIR:
+            self.conversation_log = ConversationLog(CONVERSATION_LOG_DIR, max_bytes=CONVERSATION_LOG_MAX_BYTES)
+            restored = self.conversation_log.restore(
+                self.sessions,
+                max_age=SESSION_IDLE_TTL,
+                max_turns=SESSION_MAX_TURNS
+            )
+            print(f"[CORE] Conversation log: {CONVERSATION_LOG_DIR} ({restored} sessions restored)")
+
+        # 起動時にロードしておくモデル（応答・反射・要約）
+        self.warm_models = list(dict.fromkeys(
+            [model_name] + ([REFLECTION_MODEL] if enable_reflection else []) + [SUMMARY_MODEL]
+        ))
+
+        # Ollama呼び出しのサーキットブレーカー
+        self.chat_breaker = CircuitBreaker(
+            "ollama_chat",
+            default_timeout=OLLAMA_TIMEOUT,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+            timeout_floor=OLLAMA_TIMEOUT_MIN
+        )
+        # 反射が遅いと応答（before）や反射結果の到着（parallel）が遅れるため、遅い場合も失敗扱いにして切り離す
+        self.reflection_breaker = CircuitBreaker(
+            "ollama_reflection",
+            default_timeout=REFLECTION_TIMEOUT,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+            slow_call_threshold=REFLECTION_SLOW_THRESHOLD
+        )
+        # バッチ（評価などのオフライン処理）は対話と別のブレーカーにし、失敗が続いても対話の応答は止めない。
+        # 存在しないモデル（404）などの 4xx は Ollama の故障ではないので数えない
+        self.batch_breaker = CircuitBreaker(
+            "ollama_batch",
+            default_timeout=OLLAMA_TIMEOUT,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+            is_failure=_is_ollama_failure
+        )
+        # 要約は応答の後にバックグラウンドで走るため、遅くても応答には影響しない
+        self.summary_breaker = CircuitBreaker(
+            "ollama_summary",
+            default_timeout=SUMMARY_TIMEOUT,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT
+        )
 
-        # 反射+推論システム
+        # 反射+推論システム（同じ入力・文脈の結果はキャッシュから返す）
+        self.reflection_cache = (
+            ReflectionCache(
+                max_entries=REFLECTION_CACHE_SIZE,
+                ttl=REFLECTION_CACHE_TTL,
+                path=REFLECTION_CACHE_PATH,
+                save_every=REFLECTION_CACHE_SAVE_EVERY
+            ) if enable_reflection and REFLECTION_CACHE_SIZE > 0 else None
+        )
         self.reflection_system = (
-            ReflectionReasoningSystem() if enable_reflection else None
+            ReflectionReasoningSystem(
+                model_name=REFLECTION_MODEL,
+                ollama_host=ollama_host,
+                breaker=self.reflection_breaker,
+                client=self.ollama,
+                cache=self.reflection_cache
+            ) if enable_reflection else None
         )
 
         # 牡丹のキャラクタープロファイル
@@ -59,12 +289,13 @@ class BotanCoreService:
 
         print(f"[CORE] Botan Core Service initialized")
         print(f"[CORE] Model: {self.model_name}")
-        print(f"[CORE] Reflection: {self.enable_reflection}")
+        print(f"[CORE] Reflection: {self.enable_reflection} ({REFLECTION_MODE}, {REFLECTION_TIMING})")
 
-    def chat(
+    async def chat(
         self,
         user_input: str,
-        user_id: str = "default"
+        user_id: str = "default",
+        enable_reflection: bool = True
     ) -> Dict:
         """
         ユーザー入力に対して応答を生成
@@ -72,74 +303,345 @@ class BotanCoreService:
         Args:
             user_input: ユーザーの入力
             user_id: ユーザーID
+            enable_reflection: このリクエストで反射+推論を行うか
 
         Returns:
-            応答データ（response, reflection, reasoningなど）
+            応答データ（response, reflection, reasoningなど）。
+            ok は応答が生成できたか（false なら response はフォールバックの定型文）
         """
         result = {
+            "ok": False,
             "response": "",
             "reflection": None,
             "reasoning": None,
-            "self_evaluation": None
+            "self_evaluation": None,
+            "context": None,
+            "timings": None
         }
+        session = self.sessions.get(user_id)
 
-        # 反射+推論（有効な場合）
-        if self.enable_reflection and self.reflection_system:
-            # 会話コンテキスト作成
-            context = self._get_conversation_context()
-
-            # 反射: ユーザー入力を分析
-            reflection_result = self.reflection_system.reflect(
-                user_input, context
-            )
-            result["reflection"] = reflection_result
-
-            # 推論: 応答戦略を考える
-            reasoning_result = self.reflection_system.reason(
-                user_input,
-                reflection_result,
-                self.character_profile
-            )
-            result["reasoning"] = reasoning_result
+        # 反射+推論（有効な場合、parallel なら生成と並行）
+        reflection = None
+        try:
+            # 同じユーザーのターンは1つずつ（履歴の組み立てから記録まで）。反射の完了は待たない
+            async with session.turn_lock:
+                reflection = await self._start_reflection(user_input, session, enable_reflection)
+                result["ok"] = await self._generate_reply(result, session, user_input)
+            if reflection:
+                result["reflection"], result["reasoning"] = await reflection
+        finally:
+            if reflection and not reflection.done():
+                reflection.cancel()
 
-        # Ollamaで応答生成
-        self.chat_messages.append({
-            "role": "user",
-            "content": user_input
-        })
+        return result
 
-        payload = {
-            "model": self.model_name,
-            "messages": self.chat_messages,
-            "stream": False
-        }
+    async def _generate_reply(self, result: Dict, session: Session, user_input: str) -> bool:
+        """
+        Ollamaで応答生成（履歴には応答が得られたターンだけを残す）
 
+        Returns:
+            応答が得られたか（失敗時は result["response"] にフォールバックの定型文が入る）
+        """
+        messages, result["context"] = self.context.build(session, user_input)
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                timeout=30
-            )
-            data = response.json()
+            with self.chat_breaker.guard(), OLLAMA_LATENCY.time(endpoint="/api/chat", model=self.model_name):
+                data = await self.ollama.chat(
+                    self.model_name,
+                    messages,
+                    timeout=self.chat_breaker.timeout()
+                )
 
             # 応答テキスト取得
             if "message" in data and "content" in data["message"]:
                 botan_response = data["message"]["content"]
                 result["response"] = botan_response
+                result["timings"] = _ollama_timings(data)
 
                 # 会話履歴に追加
-                self.chat_messages.append({
-                    "role": "assistant",
-                    "content": botan_response
-                })
-            else:
-                result["response"] = "ごめん、ちょっとわかんなかった..."
+                self._record_turn(session, user_input, botan_response)
+                return True
+            result["response"] = "ごめん、ちょっとわかんなかった..."
 
         except Exception as e:
             print(f"[CORE ERROR] {e}")
             result["response"] = "えーっと、調子悪いかも..."
+        return False
 
-        return result
+    async def chat_stream(
+        self,
+        user_input: str,
+        user_id: str = "default",
+        enable_reflection: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        ユーザー入力に対する応答をトークン単位で生成
+
+        Args:
+            user_input: ユーザーの入力
+            user_id: ユーザーID
+            enable_reflection: このリクエストで反射+推論を行うか
+
+        Yields:
+            {"type": "delta", "content": ...} を順に返し、応答が揃ったら
+            {"type": "done", "ok", "response", "reflection", "reasoning"}
+            （ok が false なら response はフォールバックの定型文）。
+            応答の完了時点で反射が終わっていなければ done は reflection_pending: true で返す
+            （反射を待つ間は {"type": "ping"} を送る）。
+            反射を行った場合は {"type": "reflection", "reflection", "reasoning"} を続け、
+            最後に {"type": "summary"} で Ollama の計測値（eval_count, eval_duration,
+            prompt_eval_duration など）と最初のトークンまでの時間を返す
+        """
+        session = self.sessions.get(user_id)
+        reflection = None
+        # 同じユーザーのターンは1つずつ。ターンは done の前に記録されるので、done で次に譲る
+        await session.turn_lock.acquire()
+        holding = True
+        try:
+            reflection = await self._start_reflection(user_input, session, enable_reflection)
+            async for event in self._stream_reply(session, user_input, reflection):
+                if event["type"] == "done":
+                    session.turn_lock.release()
+                    holding = False
+                yield event
+        finally:
+            if holding:
+                session.turn_lock.release()
+            if reflection and not reflection.done():
+                reflection.cancel()
+
+    async def _stream_reply(
+        self,
+        session: Session,
+        user_input: str,
+        reflection: Optional[asyncio.Task]
+    ) -> AsyncIterator[Dict]:
+        messages, context_info = self.context.build(session, user_input)
+
+        botan_response = ""
+        first_token_seconds = None
+        timings = {}
+        started = time.perf_counter()
+        try:
+            # ストリームの所要時間は応答の長さで変わるため、タイムアウトのサンプルにしない
+            with self.chat_breaker.guard(observe=False), \
+                    OLLAMA_LATENCY.time(endpoint="/api/chat", model=self.model_name):
+                async for data in self.ollama.chat_stream(
+                    self.model_name,
+                    messages,
+                    timeout=self.chat_breaker.timeout()
+                ):
+                    if "message" in data and "content" in data["message"]:
+                        token = data["message"]["content"]
+                        if token:
+                            if not botan_response:
+                                first_token_seconds = time.perf_counter() - started
+                            botan_response += token
+                            yield {"type": "delta", "content": token}
+
+                    # ロードを待ったかは最終行の load_duration でわかる
+                    if data.get("done", False):
+                        timings = _ollama_timings(data)
+                        if first_token_seconds is not None:
+                            OLLAMA_FIRST_TOKEN.observe(
+                                first_token_seconds,
+                                model=self.model_name,
+                                load="cold" if is_cold(data) else "warm"
+                            )
+
+        except Exception as e:
+            print(f"[CORE ERROR] {e}")
+
+        ok = bool(botan_response)
+        if ok:
+            self._record_turn(session, user_input, botan_response)
+        else:
+            botan_response = "えーっと、調子悪いかも..."
+        generation_seconds = time.perf_counter() - started
+
+        done = {
+            "type": "done",
+            "ok": ok,
+            "response": botan_response,
+            "reflection": None,
+            "reasoning": None,
+            "context": context_info
+        }
+        summary = {
+            "type": "summary",
+            "ok": ok,
+            "model": self.model_name,
+            "ttft_seconds": round(first_token_seconds, 4) if first_token_seconds is not None else None,
+            "generation_seconds": round(generation_seconds, 4),
+            "reflection_wait_seconds": 0.0,
+            **timings
+        }
+        if reflection is None:
+            yield done
+            yield summary
+            return
+
+        if reflection.done():
+            done["reflection"], done["reasoning"] = reflection.result()
+            yield done
+        else:
+            # 応答を先に返し、反射は後続イベントで送る
+            done["reflection_pending"] = True
+            yield done
+            waited = time.perf_counter()
+            while True:
+                finished, _ = await asyncio.wait({reflection}, timeout=STREAM_PING_INTERVAL)
+                if finished:
+                    break
+                yield {"type": "ping"}
+            summary["reflection_wait_seconds"] = round(time.perf_counter() - waited, 4)
+        reflection_result, reasoning_result = reflection.result()
+        yield {"type": "reflection", "reflection": reflection_result, "reasoning": reasoning_result}
+        yield summary
+
+    async def chat_batch(
+        self,
+        prompts: List[str],
+        model: Optional[str] = None,
+        concurrency: int = BATCH_CONCURRENCY,
+        options: Optional[Dict] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        複数のプロンプトを並列度を抑えて処理し、終わった順に返す（履歴・反射なし）
+
+        Yields:
+            {"type": "result", "index", "prompt", "response", "ok", "error", "seconds", ...Ollamaの計測値}
+            を完了順に返し、最後に {"type": "summary"} でスループットを返す
+        """
+        model = model or self.model_name
+        semaphore = asyncio.Semaphore(concurrency)
+        extra = {"options": options} if options else {}
+
+        async def run(index: int, prompt: str) -> Dict:
+            async with semaphore:
+                started = time.perf_counter()
+                item = {"type": "result", "index": index, "prompt": prompt, "response": "", "ok": False, "error": None}
+                try:
+                    # 1件ごとの所要時間はタイムアウトのサンプルにしない（対話の応答と分布が違う）
+                    with self.batch_breaker.guard(observe=False), \
+                            OLLAMA_LATENCY.time(endpoint="/api/chat", model=model):
+                        data = await self.ollama.chat(
+                            model,
+                            [{"role": "user", "content": prompt}],
+                            timeout=OLLAMA_TIMEOUT,
+                            **extra
+                        )
+                    item["response"] = data.get("message", {}).get("content", "")
+                    item["ok"] = True
+                    item.update(_ollama_timings(data))
+                except Exception as e:
+                    item["error"] = str(e) or type(e).__name__
+                item["seconds"] = round(time.perf_counter() - started, 4)
+                BATCH_ITEMS.inc(outcome="ok" if item["ok"] else "error")
+                return item
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(run(index, prompt)) for index, prompt in enumerate(prompts)]
+        succeeded = 0
+        eval_tokens = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                if item["ok"]:
+                    succeeded += 1
+                    eval_tokens += item.get("eval_count", 0)
+                yield item
+        finally:
+            # クライアントが切断したら残りは投げない
+            for task in tasks:
+                task.cancel()
+
+        wall_seconds = time.perf_counter() - started
+        yield {
+            "type": "summary",
+            "model": model,
+            "count": len(prompts),
+            "ok": succeeded,
+            "failed": len(prompts) - succeeded,
+            "concurrency": concurrency,
+            "wall_seconds": round(wall_seconds, 3),
+            "prompts_per_second": round(len(prompts) / wall_seconds, 3) if wall_seconds else 0.0,
+            "eval_tokens": eval_tokens,
+            "tokens_per_second": round(eval_tokens / wall_seconds, 2) if wall_seconds else 0.0
+        }
+
+    def _record_turn(self, session: Session, user_input: str, botan_response: str):
+        """ターンを履歴に追加し、会話ログにも記録"""
+        self.context.record_turn(session, user_input, botan_response)
+        if self.conversation_log:
+            self.conversation_log.append(
+                "turn",
+                turn_id=new_turn_id(),
+                user_id=session.user_id,
+                model=self.model_name,
+                user=user_input,
+                assistant=botan_response,
+                tokens=turn_tokens(user_input, botan_response)
+            )
+
+    def _log_fold(self, session: Session, folded: List[Turn], summary: str, summary_tokens: int):
+        if self.conversation_log:
+            self.conversation_log.append(
+                "summary",
+                user_id=session.user_id,
+                folded=len(folded),
+                summary=summary,
+                tokens=summary_tokens
+            )
+
+    async def _start_reflection(
+        self,
+        user_input: str,
+        session: Session,
+        enable_reflection: bool
+    ) -> Optional[asyncio.Task]:
+        """
+        反射+推論をタスクとして開始（無効なら None）
+
+        REFLECTION_TIMING=before の場合は完了まで待ってから返す。
+        """
+        if not (enable_reflection and self.enable_reflection and self.reflection_system):
+            return None
+        task = asyncio.create_task(self._reflect_and_reason(user_input, session))
+        if REFLECTION_TIMING == "before":
+            await asyncio.wait({task})
+        return task
+
+    async def _reflect_and_reason(self, user_input: str, session: Session) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        反射+推論を実行
+        """
+        # 反射モデルが落ちている・遅い間は反射を飛ばして応答を優先
+        if not self.reflection_breaker.available():
+            return {"skipped": True, "reason": "reflection_unavailable"}, None
+
+        # 会話コンテキスト作成
+        context = self._get_conversation_context(session)
+
+        with REFLECTION_LATENCY.time(mode=REFLECTION_MODE):
+            if REFLECTION_MODE == "single_pass":
+                # 反射と推論を1回の構造化出力で
+                return await self.reflection_system.reflect_and_reason_async(
+                    user_input, context, self.character_profile
+                )
+
+            # 反射: ユーザー入力を分析
+            reflection_result = await self.reflection_system.reflect_async(
+                user_input, context
+            )
+
+            # 推論: 応答戦略を考える
+            reasoning_result = await self.reflection_system.reason_async(
+                user_input,
+                reflection_result,
+                self.character_profile
+            )
+
+        return reflection_result, reasoning_result
 
     def evaluate_response(
         self,
@@ -169,43 +671,78 @@ class BotanCoreService:
 
         # ユーザーリアクション分析
         if user_reaction:
-            reaction_result = analyze_user_reaction(user_reaction)
-            evaluation["reaction_score"] = reaction_result["score"]
+            reaction_score, _, _ = analyze_user_reaction(botan_response, user_reaction)
+            evaluation["reaction_score"] = reaction_score
 
             # 総合評価
             if evaluation["self_score"] > 0:
-                evaluation["combined_score"] = calculate_combined_score(
+                evaluation["combined_score"], _ = calculate_combined_score(
                     evaluation["self_score"],
-                    reaction_result["score"]
+                    reaction_score
                 )
 
+        if evaluation["combined_score"] > 0:
+            EVALUATION_SCORE.observe(evaluation["combined_score"])
+
         return evaluation
 
-    def _get_conversation_context(self, max_turns: int = 3) -> str:
+    def _get_conversation_context(self, session: Session, max_turns: int = 3) -> str:
         """
         最近の会話コンテキストを取得
         """
-        if not self.chat_messages:
-            return ""
-
-        recent_messages = self.chat_messages[-max_turns*2:]
         context_parts = []
 
-        for msg in recent_messages:
-            role = "ユーザー" if msg["role"] == "user" else "牡丹"
-            context_parts.append(f"{role}: {msg['content']}")
+        for user_text, assistant_text, _ in session.recent_turns(max_turns):
+            context_parts.append(f"ユーザー: {user_text}")
+            context_parts.append(f"牡丹: {assistant_text}")
 
         return "\n".join(context_parts)
 
-    def reset_conversation(self):
+    async def _summarize(self, previous: str, turns: List[Turn]) -> str:
+        """
+        古いターンをこれまでの要約に畳み込む（ContextWindow からバックグラウンドで呼ばれる）
+        """
+        exchanges = "\n".join(f"ユーザー: {user_text}\n牡丹: {assistant_text}" for user_text, assistant_text, _ in turns)
+        prompt = f"""以下は女子高生ギャル「牡丹」とユーザーの会話です。
+これまでの要約と新しいやり取りを、1つの要約にまとめてください。
+ユーザーの名前・好み・話題・約束など、この先の会話に必要な事実だけを簡潔に箇条書きで書いてください。
+
+【これまでの要約】
+{previous if previous else "なし"}
+
+【新しいやり取り】
+{exchanges}
+
+【要約】
+"""
+        with self.summary_breaker.guard(), OLLAMA_LATENCY.time(endpoint="/api/generate", model=SUMMARY_MODEL):
+            data = await self.ollama.generate(
+                SUMMARY_MODEL,
+                prompt,
+                options={"num_predict": SUMMARY_MAX_TOKENS, "temperature": 0.2},
+                timeout=self.summary_breaker.timeout()
+            )
+        return data.get("response", "")
+
+    def reset_conversation(self, user_id: Optional[str] = None) -> int:
         """
-        会話履歴をリセット
+        会話履歴をリセット（user_id 省略時は全セッション）
+
+        Returns:
+            リセットしたセッション数
         """
-        self.chat_messages = []
-        print("[CORE] Conversation reset")
+        if user_id is None:
+            count = self.sessions.clear()
+        else:
+            count = int(self.sessions.reset(user_id))
+        if self.conversation_log:
+            self.conversation_log.append("reset", user_id=user_id)
+        print(f"[CORE] Conversation reset: {user_id or 'all'}")
+        return count
 
 # FastAPI integration
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 app = FastAPI(title="Botan Core Service")
@@ -218,31 +755,250 @@ class ChatRequest(BaseModel):
     user_id: str = "default"
     enable_reflection: bool = False
 
+class BatchRequest(BaseModel):
+    prompts: List[str]
+    model: Optional[str] = None
+    concurrency: Optional[int] = None
+    options: Optional[Dict] = None
+
+class ResetRequest(BaseModel):
+    user_id: Optional[str] = None
+
 class EvaluationRequest(BaseModel):
     user_input: str
     botan_response: str
     user_reaction: Optional[str] = None
 
+# ヘルスチェック設定
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "2"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", "300"))
+
+def _model_in(model: str, names) -> bool:
+    return model in names or f"{model}:latest" in names
+
+class OllamaHealth:
+    """
+    Ollamaの状態を確認（TTLキャッシュ付き）とモデルのウォームアップ
+
+    応答・反射・要約に使う全モデルを起動時にロードし、readiness は
+    全モデルがメモリに載っている間だけ true になる。keep_alive の期限切れなどで
+    アンロードされたことを /api/ps で検知したら、バックグラウンドで再ロードする。
+    """
+
+    def __init__(self, client: OllamaClient, models: List[str]):
+        self.client = client
+        self.models = models
+        # model → {"warm", "load_seconds", "error"}
+        self.status: Dict[str, Dict] = {
+            model: {"warm": False, "load_seconds": None, "error": None} for model in models
+        }
+        self._warming: Dict[str, asyncio.Task] = {}
+        self._cached: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def warm_up(self):
+        """全モデルを並行してロード"""
+        await asyncio.gather(*(self._warm(model) for model in self.models))
+
+    def _schedule_warm(self, model: str):
+        if model not in self._warming:
+            task = asyncio.create_task(self._warm(model))
+            self._warming[model] = task
+            task.add_done_callback(lambda _: self._warming.pop(model, None))
+
+    async def _warm(self, model: str):
+        """
+        モデルをメモリにロード（プロンプトなしの generate はロードのみ行う）
+        """
+        status = self.status[model]
+        started = time.perf_counter()
+        try:
+            with OLLAMA_LATENCY.time(endpoint="/api/generate", model=model):
+                await self.client.generate(model, timeout=MODEL_LOAD_TIMEOUT)
+            status.update(warm=True, load_seconds=round(time.perf_counter() - started, 2), error=None)
+            print(f"[CORE] Model warmed up: {model} ({status['load_seconds']}s)")
+        except Exception as e:
+            status.update(warm=False, error=str(e))
+            print(f"[CORE ERROR] Model warm-up failed: {model}: {e}")
+
+    async def check(self) -> Dict:
+        now = time.monotonic()
+        if self._cached and now - self._checked_at < HEALTH_CACHE_TTL:
+            return self._cached
+
+        async with self._lock:
+            if self._cached and time.monotonic() - self._checked_at < HEALTH_CACHE_TTL:
+                return self._cached
+
+            started = time.perf_counter()
+            result = {"reachable": False, "models_available": False}
+            try:
+                names = set(await self.client.tags(timeout=HEALTH_PROBE_TIMEOUT))
+                result["reachable"] = True
+                result["models_available"] = all(_model_in(model, names) for model in self.models)
+                await self._refresh_loaded()
+            except Exception as e:
+                result["error"] = str(e)
+
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            result["models"] = {model: dict(status) for model, status in self.status.items()}
+            result["warm"] = all(status["warm"] for status in self.status.values())
+            result["ready"] = result["reachable"] and result["models_available"] and result["warm"]
+
+            self._cached = result
+            self._checked_at = time.monotonic()
+            return result
+
+    async def _refresh_loaded(self):
+        try:
+            loaded = set(await self.client.loaded(timeout=HEALTH_PROBE_TIMEOUT))
+        except Exception:
+            # /api/ps のない古い Ollama ではウォームアップ結果のみで判断
+            return
+        for model, status in self.status.items():
+            if status["warm"] and not _model_in(model, loaded):
+                print(f"[CORE] Model unloaded by Ollama, warming up again: {model}")
+                status["warm"] = False
+                self._schedule_warm(model)
+
+ollama_health: Optional[OllamaHealth] = None
+
 @app.on_event("startup")
 async def startup():
-    global core_service
+    global core_service, ollama_health
     model_name = os.getenv("MODEL_NAME", "elyza:botan_custom")
     core_service = BotanCoreService(
         model_name=model_name,
         enable_reflection=True
     )
 
+    # モデルのロードはバックグラウンドで行い、完了までは readiness を false にする
+    ollama_health = OllamaHealth(core_service.ollama, core_service.warm_models)
+    asyncio.create_task(ollama_health.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown():
+    if core_service:
+        await core_service.context.aclose()
+        await core_service.ollama.aclose()
+        if core_service.reflection_cache is not None:
+            core_service.reflection_cache.save()
+        if core_service.conversation_log:
+            core_service.conversation_log.close()
+
 @app.post("/chat")
 async def chat(request: ChatRequest):
     if not core_service:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
-    result = core_service.chat(
-        user_input=request.message,
-        user_id=request.user_id
-    )
+    # 生成の失敗はフォールバックの応答になるため、outcome は result["ok"] で決める
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await core_service.chat(
+            user_input=request.message,
+            user_id=request.user_id,
+            enable_reflection=request.enable_reflection
+        )
+        if result["ok"]:
+            outcome = "ok"
+    finally:
+        CHAT_LATENCY.observe(time.perf_counter() - started, mode="blocking", outcome=outcome)
+        CHAT_REQUESTS.inc(mode="blocking", outcome=outcome)
     return result
 
+def _sse_event(event: Dict) -> str:
+    # ping はコメント行にする（EventSource はイベントとして扱わない）
+    if event.get("type") == "ping":
+        return ": ping\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    ストリーミングチャット
+
+    既定は NDJSON（1行1イベント）。Accept: text/event-stream なら
+    Server-Sent Events（event: イベント種別 / data: JSON）で返す。
+    イベントの順序は delta… → done → (ping…) → reflection → summary。
+    """
+    if not core_service:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def event_lines():
+        started = time.perf_counter()
+        outcome = "error"
+        async for event in core_service.chat_stream(
+            user_input=request.message,
+            user_id=request.user_id,
+            enable_reflection=request.enable_reflection
+        ):
+            if event["type"] == "summary" and event["ok"]:
+                outcome = "ok"
+            if sse:
+                yield _sse_event(event)
+            else:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        CHAT_LATENCY.observe(time.perf_counter() - started, mode="stream", outcome=outcome)
+        CHAT_REQUESTS.inc(mode="stream", outcome=outcome)
+
+    if sse:
+        return StreamingResponse(
+            event_lines(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchRequest, http_request: Request):
+    """
+    バッチ処理（評価などのオフライン用、会話履歴・反射なし）
+
+    prompts を最大 concurrency 件ずつ並列で Ollama に投げ、終わった順に
+    result イベントを返す。最後の summary に全体のスループットが入る。
+    出力形式は /chat/stream と同じ（NDJSON、Accept: text/event-stream なら SSE）。
+    """
+    if not core_service:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="prompts is empty")
+    if len(request.prompts) > BATCH_MAX_PROMPTS:
+        raise HTTPException(status_code=413, detail=f"Too many prompts (max {BATCH_MAX_PROMPTS})")
+
+    if request.model:
+        try:
+            names = await core_service.ollama.tags(timeout=HEALTH_PROBE_TIMEOUT)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Ollama unavailable: {e}")
+        if not _model_in(request.model, names):
+            raise HTTPException(status_code=400, detail=f"Unknown model: {request.model}")
+
+    concurrency = max(1, min(request.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def event_lines():
+        async for event in core_service.chat_batch(
+            request.prompts,
+            model=request.model,
+            concurrency=concurrency,
+            options=request.options
+        ):
+            if sse:
+                yield _sse_event(event)
+            else:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        event_lines(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} if sse else None
+    )
+
 @app.post("/evaluate")
 async def evaluate(request: EvaluationRequest):
     if not core_service:
@@ -256,17 +1012,83 @@ async def evaluate(request: EvaluationRequest):
     return result
 
 @app.post("/reset")
-async def reset():
+async def reset(request: Optional[ResetRequest] = None):
+    """
+    会話履歴をリセット（user_id 指定でそのセッションのみ）
+    """
     if not core_service:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
-    core_service.reset_conversation()
-    return {"status": "reset"}
+    user_id = request.user_id if request else None
+    count = core_service.reset_conversation(user_id)
+    return {"status": "reset", "user_id": user_id, "sessions": count}
+
+@app.get("/sessions")
+async def sessions(limit: int = 100):
+    """
+    セッション一覧（最近使われた順）
+    """
+    if not core_service:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    return {
+        **core_service.sessions.stats(),
+        "sessions": core_service.sessions.list_sessions(limit)
+    }
+
+@app.get("/stats")
+async def stats():
+    """
+    統計情報取得
+    """
+    scores = EVALUATION_SCORE.snapshot()
+    return {
+        "total_turns": int(CHAT_REQUESTS.value(outcome="ok")),
+        "average_score": scores[0]["avg"] if scores else 0.0,
+        "sessions": core_service.sessions.stats() if core_service else None,
+        "first_token": OLLAMA_FIRST_TOKEN.snapshot(),
+        "conversation_log": core_service.conversation_log.stats()
+        if core_service and core_service.conversation_log else None,
+        "reflection_cache": core_service.reflection_cache.stats()
+        if core_service and core_service.reflection_cache is not None else None,
+        "models": ollama_health.status if ollama_health else None,
+        "breakers": breaker_snapshots(),
+        "metrics": REGISTRY.snapshot()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus メトリクス
+    """
+    return Response(content=REGISTRY.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "core"}
 
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive", "service": "core"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Ollamaに到達でき、モデルがロード済みの場合のみ 200
+    """
+    if not core_service or not ollama_health:
+        return JSONResponse(status_code=503, content={"status": "starting", "service": "core"})
+
+    ollama = await ollama_health.check()
+    return JSONResponse(
+        status_code=200 if ollama["ready"] else 503,
+        content={
+            "status": "ready" if ollama["ready"] else "not_ready",
+            "service": "core",
+            "ollama": ollama
+        }
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
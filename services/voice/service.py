@@ -6,16 +6,41 @@ Voice Service - ElevenLabs Integration
 
 import os
 import sys
+import hashlib
+import time
 from pathlib import Path
 from typing import Optional
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
 # scripts/から既存モジュールをインポート
 sys.path.append(str(Path(__file__).parent.parent.parent / "scripts"))
 
 from elevenlabs_client import BotanVoiceClient
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+
+# メトリクス
+ELEVENLABS_LATENCY = REGISTRY.histogram(
+    "botan_voice_elevenlabs_request_seconds",
+    "Latency of ElevenLabs text-to-speech calls",
+    ["endpoint", "outcome"]
+)
+ELEVENLABS_FIRST_CHUNK = REGISTRY.histogram(
+    "botan_voice_elevenlabs_first_chunk_seconds",
+    "Time until ElevenLabs returns the first audio chunk"
+)
+SYNTHESIZE_REQUESTS = REGISTRY.counter(
+    "botan_voice_synthesize_requests_total",
+    "Synthesize requests by cache result and outcome",
+    ["cache", "outcome"]
+)
+
+AUDIO_CACHE_CONTROL = os.getenv("AUDIO_CACHE_CONTROL", "public, max-age=31536000, immutable")
+
+# キャッシュ済み音声をストリーム返却するときのチャンクサイズ
+AUDIO_STREAM_CHUNK_SIZE = int(os.getenv("AUDIO_STREAM_CHUNK_SIZE", "16384"))
 
 class VoiceService:
     def __init__(self):
@@ -42,26 +67,68 @@ class VoiceService:
             生成された音声ファイルのパス
         """
         try:
-            if output_filename:
-                output_path = self.cache_dir / output_filename
-            else:
-                # ハッシュベースのファイル名生成
-                import hashlib
-                text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
-                output_path = self.cache_dir / f"botan_{text_hash}.mp3"
+            output_path = self.output_path(text, output_filename)
+
+            if output_path.exists():
+                SYNTHESIZE_REQUESTS.inc(cache="hit", outcome="ok")
+                return str(output_path)
 
             # 音声生成
-            audio_path = self.voice_client.text_to_speech(
-                text,
-                str(output_path)
-            )
+            with ELEVENLABS_LATENCY.time(endpoint="text_to_speech"):
+                audio_path = self.voice_client.text_to_speech(
+                    text,
+                    str(output_path)
+                )
 
+            SYNTHESIZE_REQUESTS.inc(cache="miss", outcome="ok")
             return audio_path
 
         except Exception as e:
             print(f"[VOICE ERROR] {e}")
+            SYNTHESIZE_REQUESTS.inc(cache="miss", outcome="error")
             raise
 
+    def output_path(self, text: str, output_filename: Optional[str] = None) -> Path:
+        if output_filename:
+            return self.cache_dir / output_filename
+        # ハッシュベースのファイル名生成
+        text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
+        return self.cache_dir / f"botan_{text_hash}.mp3"
+
+    def synthesize_stream(self, text: str, output_path: Path):
+        """
+        音声を生成しながらチャンク単位で返す（キャッシュ済みならファイルから）
+
+        Args:
+            text: 変換するテキスト
+            output_path: output_path() で決めた保存先
+
+        Yields:
+            MP3 音声チャンク
+        """
+        if output_path.exists():
+            SYNTHESIZE_REQUESTS.inc(cache="hit", outcome="ok")
+            with open(output_path, "rb") as f:
+                while True:
+                    chunk = f.read(AUDIO_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        outcome = "error"
+        started = time.perf_counter()
+        first_chunk = True
+        try:
+            with ELEVENLABS_LATENCY.time(endpoint="text_to_speech_stream"):
+                for chunk in self.voice_client.text_to_speech_stream(text, str(output_path)):
+                    if first_chunk:
+                        ELEVENLABS_FIRST_CHUNK.observe(time.perf_counter() - started)
+                        first_chunk = False
+                    yield chunk
+            outcome = "ok"
+        finally:
+            SYNTHESIZE_REQUESTS.inc(cache="miss", outcome=outcome)
+
     def get_cache_size(self) -> int:
         """
         キャッシュサイズ取得（バイト）
@@ -105,7 +172,10 @@ async def synthesize(request: SynthesizeRequest):
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     try:
-        audio_path = voice_service.synthesize(
+        # ElevenLabs SDK はブロッキングなのでスレッドプールで実行する
+        # （イベントループで呼ぶと文ごとの合成が1件ずつになり、/audio やヘルスチェックも止まる）
+        audio_path = await run_in_threadpool(
+            voice_service.synthesize,
             text=request.text,
             output_filename=request.filename
         )
@@ -122,8 +192,45 @@ async def synthesize(request: SynthesizeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/synthesize/stream")
+async def synthesize_stream(request: SynthesizeRequest):
+    """
+    テキストを音声に変換し、生成中の音声をそのままストリーム返却
+
+    ファイルの完成を待たずに最初のチャンクから返す。
+    完成した音声は /synthesize と同じくキャッシュに保存される。
+    """
+    if not voice_service:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    output_path = voice_service.output_path(request.text, request.filename)
+    headers = {
+        "X-Audio-Filename": output_path.name,
+        "X-Cache": "hit" if output_path.exists() else "miss"
+    }
+
+    return StreamingResponse(
+        voice_service.synthesize_stream(request.text, output_path),
+        media_type="audio/mpeg",
+        headers=headers
+    )
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match（カンマ区切り、* や W/ の弱い比較を含む）に etag が含まれるか"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
 @app.get("/audio/{filename}")
-async def get_audio(filename: str):
+async def get_audio(filename: str, request: Request):
     """
     音声ファイル取得
     """
@@ -132,13 +239,26 @@ async def get_audio(filename: str):
 
     file_path = voice_service.cache_dir / filename
 
-    if not file_path.exists():
+    if not file_path.is_file():
         raise HTTPException(status_code=404, detail="Audio file not found")
 
+    # ファイル名はテキストのハッシュなので、同じ名前の内容は変わらない
+    stat = file_path.stat()
+    etag = f'"{hashlib.md5(f"{filename}-{stat.st_size}".encode()).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": AUDIO_CACHE_CONTROL
+    }
+
+    if _etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
+    # Range リクエストは FileResponse が 206 で応答する
     return FileResponse(
         path=file_path,
         media_type="audio/mpeg",
-        filename=filename
+        filename=filename,
+        headers=headers
     )
 
 @app.get("/stats")
@@ -155,9 +275,17 @@ async def get_stats():
     return {
         "cache_size_bytes": cache_size,
         "cache_size_mb": round(cache_size / 1024 / 1024, 2),
-        "num_cached_files": num_files
+        "num_cached_files": num_files,
+        "metrics": REGISTRY.snapshot()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus メトリクス
+    """
+    return Response(content=REGISTRY.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.delete("/cache")
 async def clear_cache():
     """
@@ -173,6 +301,16 @@ async def clear_cache():
 async def health():
     return {"status": "healthy", "service": "voice"}
 
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive", "service": "voice"}
+
+@app.get("/health/ready")
+async def health_ready():
+    if not voice_service:
+        return JSONResponse(status_code=503, content={"status": "starting", "service": "voice"})
+    return {"status": "ready", "service": "voice"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
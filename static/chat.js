@@ -10,14 +10,17 @@ const statusDot = document.getElementById('statusDot');
 const statusText = document.getElementById('statusText');
 const voiceToggle = document.getElementById('voiceToggle');
 const reflectionToggle = document.getElementById('reflectionToggle');
+const streamToggle = document.getElementById('streamToggle');
 const typingIndicator = document.getElementById('typingIndicator');
 
 // WebSocket接続
 function connect() {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws/chat`;
+    // 音声はURLではなくバイナリフレームで直接受け取る
+    const wsUrl = `${protocol}//${window.location.host}/ws/chat?audio=inline`;
 
     ws = new WebSocket(wsUrl);
+    ws.binaryType = 'arraybuffer';
 
     ws.onopen = () => {
         console.log('WebSocket connected');
@@ -39,6 +42,10 @@ function connect() {
     };
 
     ws.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+            handleAudioFrame(event.data);
+            return;
+        }
         const data = JSON.parse(event.data);
         handleResponse(data);
     };
@@ -75,6 +82,7 @@ function sendMessage() {
         user_id: 'web_user',
         enable_voice: voiceToggle.checked,
         enable_reflection: reflectionToggle.checked,
+        stream: streamToggle.checked,
         timestamp: Date.now() / 1000
     };
 
@@ -84,18 +92,124 @@ function sendMessage() {
     messageInput.value = '';
 }
 
+// バイナリ音声フレーム: "BA\x01" | ヘッダ長 (uint16 BE) | ヘッダJSON | 音声
+const AUDIO_FRAME_MAGIC = [0x42, 0x41, 0x01];
+const textDecoder = new TextDecoder();
+
+// request_id → { chunks: 文ごとの受信中チャンク, blobs: 完成した音声 }
+// object URL は再生するときに作り、終わったら解放する
+const inlineAudio = new Map();
+
+function handleAudioFrame(buffer) {
+    const bytes = new Uint8Array(buffer);
+    if (bytes.length < 5 || AUDIO_FRAME_MAGIC.some((b, i) => bytes[i] !== b)) {
+        return;
+    }
+    const headerLength = new DataView(buffer).getUint16(3);
+    const header = JSON.parse(textDecoder.decode(bytes.subarray(5, 5 + headerLength)));
+    const audio = bytes.subarray(5 + headerLength);
+
+    let entry = inlineAudio.get(header.request_id);
+    if (!entry) {
+        entry = { chunks: new Map(), blobs: [] };
+        inlineAudio.set(header.request_id, entry);
+    }
+    if (!entry.chunks.has(header.segment)) {
+        entry.chunks.set(header.segment, []);
+    }
+    if (audio.length > 0) {
+        entry.chunks.get(header.segment).push(audio);
+    }
+
+    if (!header.last) return;
+
+    // 1文ぶん揃ったら再生キューへ
+    const chunks = entry.chunks.get(header.segment);
+    entry.chunks.delete(header.segment);
+    if (!header.ok || chunks.length === 0) return;
+
+    const blob = new Blob(chunks, { type: 'audio/mpeg' });
+    entry.blobs.push(blob);
+    if (voiceToggle.checked) {
+        enqueueAudio(URL.createObjectURL(blob));
+    }
+}
+
+// 吹き出しの音声プレーヤー用（音声のURL、インライン音声なら Blob）
+function takeAudioSources(data) {
+    if (data.audio_inline) {
+        const entry = inlineAudio.get(data.request_id);
+        inlineAudio.delete(data.request_id);
+        return entry ? entry.blobs : [];
+    }
+    return data.audio_urls || (data.audio_url ? [data.audio_url] : []);
+}
+
+// ストリーミング中のメッセージ（request_id → 吹き出し）
+const streamingMessages = new Map();
+
 // レスポンス処理
 function handleResponse(data) {
+    // 応答の後に届く反射・推論の結果（画面には出さない）
+    if (data.type === 'reflection') {
+        console.debug('reflection', data.request_id, data.reflection, data.reasoning);
+        return;
+    }
+
     // タイピングインジケータ非表示
     showTyping(false);
 
     if (data.type === 'error') {
+        streamingMessages.delete(data.request_id);
+        inlineAudio.delete(data.request_id);
         addMessage('botan', `エラー: ${data.error}`, null, true);
         return;
     }
 
+    // 混雑中で受け付けられなかった
+    if (data.type === 'busy') {
+        streamingMessages.delete(data.request_id);
+        const wait = Math.max(1, Math.ceil(data.retry_after || 1));
+        addMessage('botan', `今ちょっと混んでる〜！${wait}秒くらい待ってからもう一回送って！`, null, true);
+        return;
+    }
+
+    // 文単位の音声チャンク: 届いた順に連続再生
+    if (data.type === 'audio_chunk') {
+        if (voiceToggle.checked) {
+            enqueueAudio(data.audio_url);
+        }
+        return;
+    }
+
+    // ストリーミング: トークンを吹き出しに追記
+    if (data.type === 'chat_delta') {
+        let message = streamingMessages.get(data.request_id);
+        if (!message) {
+            message = addMessage('botan', '');
+            streamingMessages.set(data.request_id, message);
+        }
+        message.bubble.textContent += data.delta;
+        scrollToBottom();
+        return;
+    }
+
+    // ストリーミング完了: 全文と音声で確定
+    const streamingMessage = streamingMessages.get(data.request_id);
+    if (data.type === 'chat_done' && streamingMessage) {
+        streamingMessage.bubble.textContent = data.response;
+        const urls = takeAudioSources(data);
+        if (urls.length > 0) {
+            streamingMessage.content.appendChild(createAudioPlayer(urls));
+        }
+        streamingMessages.delete(data.request_id);
+        scrollToBottom();
+        return;
+    }
+
     // 牡丹のメッセージを表示
-    const audioUrl = data.audio_url;
+    const urls = takeAudioSources(data);
+    const audioUrl = urls.length > 0 ? urls : null;
     addMessage('botan', data.response, audioUrl);
 
     // 音声自動再生（オプション）
@@ -149,32 +263,97 @@ function addMessage(sender, text, audioUrl = null, isError = false) {
 
     // スクロール
     scrollToBottom();
+
+    return { bubble: bubble, content: content };
 }
 
-// 音声プレーヤー作成
-function createAudioPlayer(audioUrl) {
+// 音声チャンクの連続再生キュー
+const audioQueue = [];
+let audioPlaying = false;
+
+function enqueueAudio(audioUrl) {
+    audioQueue.push(audioUrl);
+    if (!audioPlaying) {
+        playNextAudio();
+    }
+}
+
+function playNextAudio() {
+    const nextUrl = audioQueue.shift();
+    if (!nextUrl) {
+        audioPlaying = false;
+        return;
+    }
+
+    audioPlaying = true;
+    const audio = new Audio(nextUrl);
+    const next = () => {
+        if (nextUrl.startsWith('blob:')) {
+            URL.revokeObjectURL(nextUrl);
+        }
+        playNextAudio();
+    };
+    audio.onended = next;
+    audio.onerror = next;
+    audio.play().catch(next);
+}
+
+// 音声プレーヤー作成（配列は順に再生。Blob は再生中だけ object URL にする）
+function createAudioPlayer(audioSources) {
+    const sources = Array.isArray(audioSources) ? audioSources : [audioSources];
+
     const playerDiv = document.createElement('div');
     playerDiv.className = 'audio-player';
 
     const playButton = document.createElement('button');
     playButton.innerHTML = '▶️ 音声再生';
 
-    const audio = new Audio(audioUrl);
+    const audio = new Audio();
+    let index = 0;
+    let objectUrl = null;
+
+    const releaseObjectUrl = () => {
+        if (objectUrl) {
+            URL.revokeObjectURL(objectUrl);
+            objectUrl = null;
+        }
+    };
+
+    const playFrom = (i) => {
+        releaseObjectUrl();
+        index = i;
+        const source = sources[i];
+        if (source instanceof Blob) {
+            objectUrl = URL.createObjectURL(source);
+        }
+        audio.src = objectUrl || source;
+        audio.play().catch(stop);
+    };
+
+    const stop = () => {
+        audio.pause();
+        releaseObjectUrl();
+        index = 0;
+        playButton.innerHTML = '▶️ 音声再生';
+    };
 
     playButton.onclick = () => {
         if (audio.paused) {
-            audio.play();
+            playFrom(0);
             playButton.innerHTML = '⏸️ 停止';
         } else {
-            audio.pause();
-            audio.currentTime = 0;
-            playButton.innerHTML = '▶️ 音声再生';
+            stop();
         }
     };
 
     audio.onended = () => {
-        playButton.innerHTML = '▶️ 音声再生';
+        if (index + 1 < sources.length) {
+            playFrom(index + 1);
+            return;
+        }
+        stop();
     };
+    audio.onerror = stop;
 
     playerDiv.appendChild(playButton);
 
@@ -7,6 +7,7 @@ let ws = null;
 let reconnectInterval = null;
 const MAX_SUBTITLES = 3; // Maximum number of subtitles displayed simultaneously
 const SUBTITLE_DURATION = 5000; // 5 seconds
+const INLINE_AUDIO = new URLSearchParams(window.location.search).get('audio') === 'inline';
 
 // DOM Elements
 const subtitleContainer = document.getElementById('subtitle-container');
@@ -16,12 +17,20 @@ const statusText = document.getElementById('status-text');
 // WebSocket Connection
 function connect() {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws/obs`;
+    // 字幕表示に使うフィールドだけ受け取る（type / request_id は常に含まれる）
+    const fields = 'text,delta,response,message,speaker,duration';
+    let wsUrl = `${protocol}//${window.location.host}/ws/obs?fields=${fields}`;
+
+    // subtitle.html?audio=inline で音声もこのソースから再生する
+    if (INLINE_AUDIO) {
+        wsUrl += '&audio=inline';
+    }
 
     console.log('[OBS Subtitle] Connecting to:', wsUrl);
     updateStatus('Connecting...', 'disconnected');
 
     ws = new WebSocket(wsUrl);
+    ws.binaryType = 'arraybuffer';
 
     ws.onopen = () => {
         console.log('[OBS Subtitle] Connected');
@@ -36,12 +45,20 @@ function connect() {
     };
 
     ws.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+            handleAudioFrame(event.data);
+            return;
+        }
         try {
             const data = JSON.parse(event.data);
             console.log('[OBS Subtitle] Received:', data);
 
             if (data.type === 'subtitle' || data.type === 'chat_response') {
                 handleSubtitle(data);
+            } else if (data.type === 'subtitle_delta') {
+                handleSubtitleDelta(data);
+            } else if (data.type === 'subtitle_done') {
+                handleSubtitleDone(data);
             } else if (data.type === 'typing') {
                 showTypingIndicator();
             }
@@ -67,6 +84,58 @@ function connect() {
     };
 }
 
+// Inline audio: "BA\x01" | header length (uint16 BE) | header JSON | MP3 bytes
+const AUDIO_FRAME_MAGIC = [0x42, 0x41, 0x01];
+const textDecoder = new TextDecoder();
+const audioSegments = new Map(); // `${request_id}:${segment}` → chunks
+const audioQueue = [];
+let audioPlaying = false;
+
+function handleAudioFrame(buffer) {
+    const bytes = new Uint8Array(buffer);
+    if (bytes.length < 5 || AUDIO_FRAME_MAGIC.some((b, i) => bytes[i] !== b)) {
+        return;
+    }
+    const headerLength = new DataView(buffer).getUint16(3);
+    const header = JSON.parse(textDecoder.decode(bytes.subarray(5, 5 + headerLength)));
+    const audio = bytes.subarray(5 + headerLength);
+
+    const key = `${header.request_id}:${header.segment}`;
+    if (!audioSegments.has(key)) {
+        audioSegments.set(key, []);
+    }
+    if (audio.length > 0) {
+        audioSegments.get(key).push(audio);
+    }
+    if (!header.last) return;
+
+    const chunks = audioSegments.get(key);
+    audioSegments.delete(key);
+    if (header.ok && chunks.length > 0) {
+        audioQueue.push(URL.createObjectURL(new Blob(chunks, { type: 'audio/mpeg' })));
+        if (!audioPlaying) {
+            playNextAudio();
+        }
+    }
+}
+
+function playNextAudio() {
+    const url = audioQueue.shift();
+    if (!url) {
+        audioPlaying = false;
+        return;
+    }
+    audioPlaying = true;
+    const audio = new Audio(url);
+    const next = () => {
+        URL.revokeObjectURL(url);
+        playNextAudio();
+    };
+    audio.onended = next;
+    audio.onerror = next;
+    audio.play().catch(next);
+}
+
 // Handle Subtitle Display
 function handleSubtitle(data) {
     const text = data.response || data.text || data.message;
@@ -82,9 +151,43 @@ function handleSubtitle(data) {
     showSubtitle(text, speaker, duration);
 }
 
-// Show Subtitle with Animation
-function showSubtitle(text, speaker, duration) {
-    // Create subtitle element
+// Streaming subtitles keyed by request_id (grow as tokens arrive)
+const streamingSubtitles = new Map();
+
+function handleSubtitleDelta(data) {
+    if (!data.delta) {
+        return;
+    }
+
+    removeTypingIndicator();
+
+    let subtitle = streamingSubtitles.get(data.request_id);
+    if (!subtitle) {
+        subtitle = createSubtitleElement('', data.speaker || 'botan');
+        streamingSubtitles.set(data.request_id, subtitle);
+    }
+    subtitle.textNode.appendData(data.delta);
+}
+
+function handleSubtitleDone(data) {
+    const duration = data.duration || SUBTITLE_DURATION;
+    const subtitle = streamingSubtitles.get(data.request_id);
+
+    if (!subtitle) {
+        // Deltas were missed (e.g. connected mid-stream): show the full text
+        handleSubtitle(data);
+        return;
+    }
+
+    if (data.text) {
+        subtitle.textNode.data = data.text;
+    }
+    scheduleSubtitleRemoval(subtitle.element, duration);
+    streamingSubtitles.delete(data.request_id);
+}
+
+// Create subtitle element and add it to the container
+function createSubtitleElement(text, speaker) {
     const subtitleDiv = document.createElement('div');
     subtitleDiv.className = `subtitle-text ${speaker}-style`;
 
@@ -106,7 +209,17 @@ function showSubtitle(text, speaker, duration) {
     // Limit number of subtitles
     limitSubtitles();
 
-    // Auto-remove after duration
+    return { element: subtitleDiv, textNode: textNode };
+}
+
+// Show Subtitle with Animation
+function showSubtitle(text, speaker, duration) {
+    const subtitle = createSubtitleElement(text, speaker);
+    scheduleSubtitleRemoval(subtitle.element, duration);
+}
+
+// Auto-remove after duration
+function scheduleSubtitleRemoval(subtitleDiv, duration) {
     setTimeout(() => {
         subtitleDiv.style.animation = 'fadeOut 0.5s ease-out';
         setTimeout(() => {
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+ContextWindow のテスト（トークン予算・要約への畳み込み）
+
+    python -m pytest -q test_context_window.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from context_window import (
+    MESSAGE_OVERHEAD_TOKENS,
+    SUMMARY_ACK,
+    SUMMARY_OVERHEAD_TOKENS,
+    SUMMARY_PREFIX,
+    ContextWindow,
+    estimate_tokens,
+    turn_tokens
+)
+from session_store import SessionStore
+
+def make_window(summarize=None, **options):
+    async def no_summary(previous, turns):
+        return ""
+
+    store = SessionStore(max_turns=0, idle_ttl=0)
+    return store, ContextWindow(store, summarize or no_summary, **options)
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("おはよう") == 4
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("おはよabcd") == 4
+
+def test_build_sends_all_turns_within_budget():
+    store, window = make_window(budget_tokens=1000)
+    session = store.get("u1")
+    store.record_turn(session, "いち", "に", turn_tokens("いち", "に"))
+
+    messages, info = window.build(session, "さん")
+
+    assert messages == [
+        {"role": "user", "content": "いち"},
+        {"role": "assistant", "content": "に"},
+        {"role": "user", "content": "さん"}
+    ]
+    assert info["turns_sent"] == 1
+    assert info["turns_omitted"] == 0
+    assert info["prompt_tokens"] == turn_tokens("いち", "に") + estimate_tokens("さん") + MESSAGE_OVERHEAD_TOKENS
+
+def test_build_drops_oldest_turns_over_budget():
+    store, window = make_window(budget_tokens=30)
+    session = store.get("u1")
+    for i in range(3):
+        store.record_turn(session, f"in{i}", f"out{i}", 10)
+
+    messages, info = window.build(session, "x")
+
+    # 入力 5 トークン + 10 × 2 ターン = 25（3ターン目は入らない）
+    assert info["turns_sent"] == 2
+    assert info["turns_omitted"] == 1
+    assert [m["content"] for m in messages if m["role"] == "user"] == ["in1", "in2", "x"]
+
+def test_build_puts_summary_first_as_user_assistant_pair():
+    store, window = make_window(budget_tokens=1000)
+    session = store.get("u1")
+    store.fold(session, [], "前回は天気の話", 7)
+
+    messages, info = window.build(session, "やっほー")
+
+    assert messages[0] == {"role": "user", "content": SUMMARY_PREFIX + "前回は天気の話"}
+    assert messages[1] == {"role": "assistant", "content": SUMMARY_ACK}
+    assert all(message["role"] != "system" for message in messages)
+    assert info["summarized"]
+    assert info["prompt_tokens"] == 7 + SUMMARY_OVERHEAD_TOKENS + estimate_tokens("やっほー") + MESSAGE_OVERHEAD_TOKENS
+
+def test_record_turn_folds_old_turns_in_background():
+    calls = []
+
+    async def summarize(previous, turns):
+        calls.append((previous, [turn[0] for turn in turns]))
+        return "要約"
+
+    async def scenario():
+        folded = []
+        store, window = make_window(
+            summarize,
+            budget_tokens=100,
+            fold_ratio=0.5,
+            keep_ratio=0.3,
+            on_fold=lambda session, turns, summary, tokens: folded.append(len(turns))
+        )
+        session = store.get("u1")
+        for i in range(6):
+            store.record_turn(session, f"in{i}", f"out{i}", 10)
+        window._maybe_fold(session)
+        assert session.summarizing
+        await asyncio.gather(*window._tasks)
+        return session, folded
+
+    session, folded = asyncio.run(scenario())
+    summary, summary_tokens, turns = session.snapshot()
+
+    # 60 トークン > 50 で畳み、最近の 30 トークンぶん（3ターン）を残す
+    assert calls == [("", ["in0", "in1", "in2"])]
+    assert folded == [3]
+    assert [turn[0] for turn in turns] == ["in3", "in4", "in5"]
+    assert (summary, summary_tokens) == ("要約", estimate_tokens("要約"))
+    assert session.folded_tokens == 30
+    assert not session.summarizing
+
+def test_no_fold_below_fold_ratio():
+    async def summarize(previous, turns):
+        raise AssertionError("should not summarize")
+
+    async def scenario():
+        store, window = make_window(summarize, budget_tokens=100, fold_ratio=0.75)
+        session = store.get("u1")
+        window.record_turn(session, "おはよ", "おはよ〜！")
+        return window, session
+
+    window, session = asyncio.run(scenario())
+    assert not window._tasks
+    assert not session.summarizing
+
+def test_failed_summary_keeps_turns_and_allows_retry():
+    async def summarize(previous, turns):
+        raise RuntimeError("ollama down")
+
+    async def scenario():
+        store, window = make_window(summarize, budget_tokens=100, fold_ratio=0.5, keep_ratio=0.3)
+        session = store.get("u1")
+        for i in range(6):
+            store.record_turn(session, f"in{i}", f"out{i}", 10)
+        window._maybe_fold(session)
+        await asyncio.gather(*window._tasks)
+        return session
+
+    session = asyncio.run(scenario())
+    summary, _, turns = session.snapshot()
+    assert summary == ""
+    assert len(turns) == 6
+    assert not session.summarizing
+
+def test_fold_waits_for_turn_in_progress():
+    async def summarize(previous, turns):
+        return "要約"
+
+    async def scenario():
+        store, window = make_window(summarize, budget_tokens=100, fold_ratio=0.5, keep_ratio=0.3)
+        session = store.get("u1")
+        for i in range(6):
+            store.record_turn(session, f"in{i}", f"out{i}", 10)
+
+        async with session.turn_lock:
+            window._maybe_fold(session)
+            await asyncio.sleep(0.01)
+            # ターンの途中（build → 記録の間）では履歴は変わらない
+            during = len(session.snapshot()[2])
+        await asyncio.gather(*window._tasks)
+        return during, len(session.snapshot()[2])
+
+    assert asyncio.run(scenario()) == (6, 3)
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+ConversationLog のテスト（group commit・ローテート・復元・書き込みエラー）
+
+    python -m pytest -q test_conversation_log.py
+"""
+
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+import conversation_log
+from conversation_log import ACTIVE_FILE, ConversationLog, export_dataset, iter_records, log_files
+from session_store import SessionStore
+
+def write_records(directory: Path, records, name=ACTIVE_FILE):
+    with open(directory / name, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def turn(user_id, user, assistant, ts, tokens=1):
+    return {"ts": ts, "event": "turn", "user_id": user_id, "user": user, "assistant": assistant, "tokens": tokens}
+
+def test_append_commits_in_batches(tmp_path):
+    log = ConversationLog(str(tmp_path), fsync=False)
+    for i in range(100):
+        log.append("turn", user_id="u1", user=f"in{i}", assistant=f"out{i}")
+    log.close()
+
+    records = list(iter_records(str(tmp_path)))
+    stats = log.stats()
+    assert [record["user"] for record in records] == [f"in{i}" for i in range(100)]
+    assert stats["written"] == 100
+    assert stats["dropped"] == 0
+    assert 1 <= stats["commits"] <= 100
+
+def test_append_after_close_is_ignored(tmp_path):
+    log = ConversationLog(str(tmp_path), fsync=False)
+    log.close()
+    log.append("turn", user_id="u1", user="a", assistant="b")
+
+    assert list(iter_records(str(tmp_path))) == []
+
+def test_rotation_compresses_and_keeps_order(tmp_path):
+    log = ConversationLog(str(tmp_path), max_bytes=200, max_batch=1, fsync=False)
+    for i in range(10):
+        log.append("turn", user_id="u1", user=f"in{i}", assistant="x" * 50)
+    log.close()
+
+    files = log_files(str(tmp_path))
+    assert log.stats()["rotations"] >= 2
+    assert all(path.endswith(".jsonl.gz") for path in files[:-1])
+    assert files[-1].endswith(ACTIVE_FILE)
+    assert [record["user"] for record in iter_records(str(tmp_path))] == [f"in{i}" for i in range(10)]
+
+def test_rotation_failure_keeps_writing(tmp_path, monkeypatch):
+    def broken_rotate(self):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ConversationLog, "_rotate", broken_rotate)
+    log = ConversationLog(str(tmp_path), max_bytes=10, max_batch=1, fsync=False)
+    for i in range(3):
+        log.append("turn", user_id="u1", user=f"in{i}", assistant="x")
+    log.close()
+
+    assert log.stats()["written"] == 3
+    assert [record["user"] for record in iter_records(str(tmp_path))] == ["in0", "in1", "in2"]
+
+def test_open_failure_drops_batch_and_recovers(tmp_path, monkeypatch):
+    log = ConversationLog(str(tmp_path), fsync=False)
+    log.append("turn", user_id="u1", user="before", assistant="x")
+    deadline = time.monotonic() + 2
+    while log.stats()["written"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # 書き込み中のファイルが使えなくなり、開き直しも1回失敗する
+    log._file.close()
+    log._file = None
+    real_open = open
+    failures = []
+
+    def flaky_open(path, *args, **kwargs):
+        if path == log.path and not failures:
+            failures.append(path)
+            raise PermissionError("read-only volume")
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(conversation_log, "open", flaky_open, raising=False)
+    log.append("turn", user_id="u1", user="lost", assistant="x")
+    deadline = time.monotonic() + 2
+    while log.stats()["dropped"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    log.append("turn", user_id="u1", user="after", assistant="x")
+    log.close()
+
+    assert log._thread.is_alive() is False
+    assert log.stats()["dropped"] == 1
+    assert [record["user"] for record in iter_records(str(tmp_path))] == ["before", "after"]
+
+def test_iter_records_skips_corrupt_lines(tmp_path):
+    write_records(tmp_path, [turn("u1", "a", "b", 1)])
+    with open(tmp_path / ACTIVE_FILE, "a", encoding="utf-8") as f:
+        f.write('{"ts": 2, "event": "tu')  # クラッシュ時の書きかけ
+
+    assert [record["user"] for record in iter_records(str(tmp_path))] == ["a"]
+
+def test_restore_replays_turns_resets_and_summaries(tmp_path):
+    now = time.time()
+    write_records(tmp_path, [
+        turn("u1", "in0", "out0", now - 50),
+        turn("u1", "in1", "out1", now - 40),
+        turn("u1", "in2", "out2", now - 30),
+        {"ts": now - 29, "event": "summary", "user_id": "u1", "summary": "要約", "tokens": 2, "folded": 2},
+        turn("u2", "gone", "gone", now - 20),
+        {"ts": now - 19, "event": "reset", "user_id": "u2"},
+        turn("u2", "hello", "world", now - 10)
+    ])
+    store = SessionStore(idle_ttl=0)
+
+    restored = ConversationLog(str(tmp_path), fsync=False).restore(store)
+
+    assert restored == 2
+    summary, summary_tokens, turns = store.peek("u1").snapshot()
+    assert (summary, summary_tokens) == ("要約", 2)
+    assert [t[0] for t in turns] == ["in2"]
+    assert [t[0] for t in store.peek("u2").snapshot()[2]] == ["hello"]
+    # 最後に使われた順（u1 → u2）で LRU に並ぶ
+    assert [s["user_id"] for s in store.list_sessions()] == ["u2", "u1"]
+    assert 29 <= store.peek("u1").summary()["idle_seconds"] <= 31
+
+def test_restore_global_reset_and_max_age(tmp_path):
+    now = time.time()
+    write_records(tmp_path, [
+        turn("u1", "old", "x", now - 100),
+        {"ts": now - 90, "event": "reset"},
+        turn("u2", "stale", "x", now - 80),
+        turn("u3", "fresh", "x", now - 5)
+    ])
+    store = SessionStore(idle_ttl=0)
+
+    restored = ConversationLog(str(tmp_path), fsync=False).restore(store, max_age=60)
+
+    assert restored == 1
+    assert store.peek("u1") is None
+    assert store.peek("u2") is None
+    assert store.peek("u3") is not None
+
+def test_restore_limits_turns_per_session(tmp_path):
+    now = time.time()
+    write_records(tmp_path, [turn("u1", f"in{i}", "x", now - 10 + i) for i in range(5)])
+    store = SessionStore(idle_ttl=0)
+
+    ConversationLog(str(tmp_path), fsync=False).restore(store, max_turns=2)
+
+    assert [t[0] for t in store.peek("u1").snapshot()[2]] == ["in3", "in4"]
+
+def test_restore_reads_rotated_files_first(tmp_path):
+    now = time.time()
+    with gzip.open(tmp_path / "conversations-20260101-000000.jsonl.gz", "wt", encoding="utf-8") as f:
+        f.write(json.dumps(turn("u1", "first", "x", now - 20)) + "\n")
+    write_records(tmp_path, [turn("u1", "second", "x", now - 10)])
+    store = SessionStore(idle_ttl=0)
+
+    ConversationLog(str(tmp_path), fsync=False).restore(store)
+
+    assert [t[0] for t in store.peek("u1").snapshot()[2]] == ["first", "second"]
+
+def test_export_dataset_merges_annotations(tmp_path):
+    write_records(tmp_path, [
+        {**turn("u1", "おはよ", "おはよ〜！", 1), "turn_id": "t1"},
+        {"ts": 2, "event": "annotation", "turn_id": "t1", "fields": {"rating": 5}}
+    ])
+    output = tmp_path / "dataset.jsonl"
+
+    assert export_dataset(str(tmp_path), str(output)) == 1
+    sample = json.loads(output.read_text(encoding="utf-8"))
+    assert sample["turn_id"] == "t1"
+    assert sample["rating"] == 5
+    assert sample["messages"][1] == {"role": "assistant", "content": "おはよ〜！"}
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
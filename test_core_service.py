@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Core Service のテスト（Ollama の代わりに scripts/fake_ollama.py を使う）
+
+    python -m pytest -q test_core_service.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from fake_ollama import FakeModel, create_app
+from ollama_client import OllamaClient
+from services.core.service import BotanCoreService
+
+def make_service(**fake_options) -> BotanCoreService:
+    """fake_ollama に ASGI で直接つないだ Core（ネットワーク不要）"""
+    service = BotanCoreService(model_name="elyza:botan_custom", enable_reflection=False)
+    fake = FakeModel(ttft=fake_options.pop("ttft", 0.05), tokens_per_second=1000, **fake_options)
+    service.ollama = OllamaClient(
+        "http://fake-ollama",
+        transport=httpx.ASGITransport(app=create_app(fake))
+    )
+    return service
+
+def test_concurrent_turns_for_one_user_are_serialized():
+    """同じユーザーの同時リクエストは到着順に記録され、後のターンは前のターンを見ている"""
+    async def scenario():
+        service = make_service()
+        try:
+            first = asyncio.create_task(service.chat("ひとつめ", user_id="u1", enable_reflection=False))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(service.chat("ふたつめ", user_id="u1", enable_reflection=False))
+            return await first, await second, service.sessions.peek("u1").snapshot()[2]
+        finally:
+            await service.ollama.aclose()
+
+    first, second, turns = asyncio.run(scenario())
+    assert first["ok"] and second["ok"]
+    assert first["context"]["turns_sent"] == 0
+    assert second["context"]["turns_sent"] == 1
+    assert [turn[0] for turn in turns] == ["ひとつめ", "ふたつめ"]
+    assert [turn[1] for turn in turns] == ["ひとつめ", "ふたつめ"]  # echo モード
+
+def test_concurrent_stream_and_blocking_turns_are_serialized():
+    async def scenario():
+        service = make_service()
+        try:
+            async def stream():
+                return [event async for event in service.chat_stream("すとりーむ", user_id="u1", enable_reflection=False)]
+
+            streamed = asyncio.create_task(stream())
+            await asyncio.sleep(0)
+            blocking = asyncio.create_task(service.chat("ぶろっく", user_id="u1", enable_reflection=False))
+            return await streamed, await blocking, service.sessions.peek("u1").snapshot()[2]
+        finally:
+            await service.ollama.aclose()
+
+    events, blocking, turns = asyncio.run(scenario())
+    done = next(event for event in events if event["type"] == "done")
+    assert done["context"]["turns_sent"] == 0
+    assert blocking["context"]["turns_sent"] == 1
+    assert [turn[0] for turn in turns] == ["すとりーむ", "ぶろっく"]
+
+def test_different_users_do_not_wait_for_each_other():
+    async def scenario():
+        service = make_service(ttft=0.3)
+        try:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await asyncio.gather(*(
+                service.chat("やっほー", user_id=f"user{i}", enable_reflection=False) for i in range(4)
+            ))
+            return loop.time() - started
+        finally:
+            await service.ollama.aclose()
+
+    assert asyncio.run(scenario()) < 0.3 * 3
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+API Gateway の部品のテスト（文の区切り・リクエストの相乗り・レート制限・同時実行制限）
+
+    python -m pytest -q test_gateway_components.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent / "api"))
+sys.path.insert(0, str(Path(__file__).parent / "scripts"))
+
+from main import AdmissionController, OverloadedError, RateLimiter, SentenceSegmenter, SingleFlight
+
+# --- SentenceSegmenter ---
+
+def feed_all(segmenter: SentenceSegmenter, deltas):
+    segments = []
+    for delta in deltas:
+        segments.extend(segmenter.feed(delta))
+    return segments
+
+def test_segmenter_splits_on_sentence_end():
+    segmenter = SentenceSegmenter()
+    segments = feed_all(segmenter, ["おはよう", "ございます。", "今日も", "いい天気だね！", "またね"])
+
+    assert segments == ["おはようございます。", "今日もいい天気だね！"]
+    assert segmenter.flush() == "またね"
+    assert segmenter.flush() is None
+
+def test_segmenter_keeps_runs_of_marks_and_closing_brackets():
+    segmenter = SentenceSegmenter()
+    segments = feed_all(segmenter, ["えー", "マジで", "！", "？", "」", "うそ"])
+
+    assert segments == ["えーマジで！？」"]
+    assert segmenter.flush() == "うそ"
+
+def test_segmenter_waits_for_next_token_at_buffer_end():
+    segmenter = SentenceSegmenter()
+
+    # 次のトークンで「！」が続くかもしれないので確定しない
+    assert segmenter.feed("すごいね〜") == []
+    assert segmenter.feed("！") == []
+    assert segmenter.feed("ほんと") == ["すごいね〜！"]
+
+def test_segmenter_merges_short_sentences():
+    segmenter = SentenceSegmenter(min_chars=4)
+    segments = feed_all(segmenter, ["え？", "ほんとに？", "うん"])
+
+    assert segments == ["え？ほんとに？"]
+    assert segmenter.flush() == "うん"
+
+def test_segmenter_handles_several_sentences_in_one_delta():
+    segmenter = SentenceSegmenter(min_chars=1)
+
+    assert segmenter.feed("はい。いいえ。どっち？ね") == ["はい。", "いいえ。", "どっち？"]
+
+# --- SingleFlight ---
+
+def test_single_flight_shares_one_call():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"response": "ok"}
+
+    async def scenario():
+        flight = SingleFlight(window=0)
+        return await asyncio.gather(*(flight.do(("u1", "hi"), call) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"response": "ok"}] * 3
+
+def test_single_flight_replays_within_window_only():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight(window=0.05)
+        first = await flight.do(("k",), call)
+        replayed = await flight.do(("k",), call)
+        await asyncio.sleep(0.06)
+        fresh = await flight.do(("k",), call)
+        return first, replayed, fresh
+
+    assert asyncio.run(scenario()) == (1, 1, 2)
+
+def test_single_flight_does_not_cache_errors():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("core down")
+        return "ok"
+
+    async def scenario():
+        flight = SingleFlight(window=10)
+        with pytest.raises(RuntimeError):
+            await flight.do(("k",), call)
+        return await flight.do(("k",), call)
+
+    assert asyncio.run(scenario()) == "ok"
+
+def test_single_flight_survives_leader_cancellation():
+    async def call():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        flight = SingleFlight(window=0)
+        leader = asyncio.create_task(flight.do(("k",), call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do(("k",), call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == "ok"
+
+def test_shared_stream_replays_from_start_for_late_subscribers():
+    opened = []
+
+    async def source():
+        opened.append(1)
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield {"type": "delta", "i": i}
+
+    async def collect(stream):
+        return [event["i"] async for event in stream]
+
+    async def scenario():
+        flight = SingleFlight(window=1)
+        first = asyncio.create_task(collect(flight.stream(("k",), source)))
+        await asyncio.sleep(0.015)
+        late = asyncio.create_task(collect(flight.stream(("k",), source)))
+        results = await asyncio.gather(first, late)
+        # 完了後も window 内なら同じ結果を再生する
+        replayed = await collect(flight.stream(("k",), source))
+        return results, replayed
+
+    (first, late), replayed = asyncio.run(scenario())
+    assert first == late == replayed == [0, 1, 2]
+    assert len(opened) == 1
+
+def test_shared_stream_error_reaches_subscribers_and_is_not_replayed():
+    opened = []
+
+    async def source():
+        opened.append(1)
+        yield {"i": 0}
+        if len(opened) == 1:
+            raise RuntimeError("stream broke")
+
+    async def scenario():
+        flight = SingleFlight(window=10)
+        received = []
+        with pytest.raises(RuntimeError):
+            async for event in flight.stream(("k",), source):
+                received.append(event["i"])
+        retried = [event["i"] async for event in flight.stream(("k",), source)]
+        return received, retried
+
+    assert asyncio.run(scenario()) == ([0], [0])
+    assert len(opened) == 2
+
+# --- RateLimiter / AdmissionController ---
+
+def test_rate_limiter_allows_burst_then_rejects():
+    limiter = RateLimiter(rate=1, burst=2, max_users=10)
+    limiter.check("u1")
+    limiter.check("u1")
+    with pytest.raises(OverloadedError) as info:
+        limiter.check("u1")
+
+    assert info.value.reason == "rate_limited"
+    assert 0 < info.value.retry_after <= 1
+    # 他のユーザーのバケットは別
+    limiter.check("u2")
+
+def test_rate_limiter_refills_over_time():
+    limiter = RateLimiter(rate=100, burst=1, max_users=10)
+    limiter.check("u1")
+    with pytest.raises(OverloadedError):
+        limiter.check("u1")
+    asyncio.run(asyncio.sleep(0.02))
+    limiter.check("u1")
+
+def test_rate_limiter_disabled_and_bounded():
+    RateLimiter(rate=0, burst=0, max_users=1).check("u1")
+
+    limiter = RateLimiter(rate=1, burst=1, max_users=2)
+    for user_id in ("a", "b", "c"):
+        limiter.check(user_id)
+    assert list(limiter._buckets) == ["b", "c"]
+
+def test_admission_limits_inflight_and_queue():
+    async def scenario():
+        admission = AdmissionController(max_inflight=1, max_queue=1, queue_timeout=1)
+        release = asyncio.Event()
+
+        async def turn():
+            async with admission.admit():
+                await release.wait()
+
+        running = asyncio.create_task(turn())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(turn())
+        await asyncio.sleep(0)
+        assert (admission.inflight, admission.waiting) == (1, 1)
+
+        with pytest.raises(OverloadedError) as info:
+            async with admission.admit():
+                pass
+        assert info.value.reason == "queue_full"
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return admission.inflight, admission.waiting
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+def test_admission_queue_timeout():
+    async def scenario():
+        admission = AdmissionController(max_inflight=1, max_queue=5, queue_timeout=0.01)
+        async with admission.admit():
+            with pytest.raises(OverloadedError) as info:
+                async with admission.admit():
+                    pass
+        return info.value.reason, admission.waiting, admission.inflight
+
+    assert asyncio.run(scenario()) == ("queue_timeout", 0, 0)
+
+def test_admission_disabled():
+    async def scenario():
+        admission = AdmissionController(max_inflight=0, max_queue=0, queue_timeout=0)
+        async with admission.admit():
+            async with admission.admit():
+                return True
+
+    assert asyncio.run(scenario())
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+ReflectionCache のテスト（LRU・TTL・永続化）
+
+    python -m pytest -q test_reflection_cache.py
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+import reflection_cache
+from reflection_cache import CACHE_FILE_VERSION, ReflectionCache
+
+def test_get_returns_copy_of_stored_value():
+    cache = ReflectionCache()
+    cache.put("reflect", "おはよー", "", {"intent": "挨拶", "key_points": []})
+
+    value = cache.get("reflect", "おはよー")
+    value["key_points"].append("changed")
+
+    assert cache.get("reflect", "おはよー") == {"intent": "挨拶", "key_points": []}
+    assert cache.stats()["hits"] == 2
+
+def test_key_normalizes_input_but_not_context_or_kind():
+    cache = ReflectionCache()
+    cache.put("reflect", "ＯＨＡＹＯ  ", "ctx", "hit")
+
+    assert cache.get("reflect", "ohayo", "ctx") == "hit"
+    assert cache.get("reflect", "ohayo", "other") is None
+    assert cache.get("reason", "ohayo", "ctx") is None
+
+def test_capacity_evicts_least_recently_used():
+    cache = ReflectionCache(max_entries=2)
+    cache.put("k", "a", "", 1)
+    cache.put("k", "b", "", 2)
+    cache.get("k", "a")
+    cache.put("k", "c", "", 3)
+
+    assert cache.get("k", "a") == 1
+    assert cache.get("k", "b") is None
+    assert len(cache) == 2
+
+def test_expired_entries_miss(monkeypatch):
+    cache = ReflectionCache(ttl=60)
+    cache.put("k", "a", "", 1)
+
+    now = time.time()
+    monkeypatch.setattr(reflection_cache.time, "time", lambda: now + 61)
+    assert cache.get("k", "a") is None
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 1
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "cache" / "reflection_cache.json"
+    cache = ReflectionCache(path=str(path), save_every=0)
+    cache.put("k", "a", "", {"intent": "挨拶"})
+    cache.put("k", "b", "", [1, 2])
+    cache.save()
+
+    assert not Path(f"{path}.tmp").exists()
+    restored = ReflectionCache(path=str(path))
+    assert restored.get("k", "a") == {"intent": "挨拶"}
+    assert restored.get("k", "b") == [1, 2]
+    assert restored.stats()["persistent"]
+
+def test_load_skips_expired_and_trims_to_capacity(tmp_path):
+    path = tmp_path / "reflection_cache.json"
+    now = time.time()
+    path.write_text(json.dumps({
+        "version": CACHE_FILE_VERSION,
+        "entries": [
+            [ReflectionCache.key("k", "old"), now - 120, "1"],
+            [ReflectionCache.key("k", "a"), now, "2"],
+            [ReflectionCache.key("k", "b"), now, "3"],
+            [ReflectionCache.key("k", "c"), now, "4"]
+        ]
+    }))
+
+    cache = ReflectionCache(max_entries=2, ttl=60, path=str(path))
+
+    assert len(cache) == 2
+    assert cache.get("k", "old") is None
+    assert cache.get("k", "a") is None
+    assert (cache.get("k", "b"), cache.get("k", "c")) == (3, 4)
+
+def test_load_ignores_unknown_version_and_corrupt_file(tmp_path):
+    path = tmp_path / "reflection_cache.json"
+    path.write_text(json.dumps({"version": CACHE_FILE_VERSION + 1, "entries": [["x", time.time(), "1"]]}))
+    assert len(ReflectionCache(path=str(path))) == 0
+
+    path.write_text("{broken")
+    assert len(ReflectionCache(path=str(path))) == 0
+
+def test_put_saves_every_n_entries(tmp_path):
+    path = tmp_path / "reflection_cache.json"
+    cache = ReflectionCache(path=str(path), save_every=3)
+    cache.put("k", "a", "", 1)
+    cache.put("k", "b", "", 2)
+    assert not path.exists()
+
+    cache.put("k", "c", "", 3)
+    deadline = time.monotonic() + 2
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(json.loads(path.read_text())["entries"]) == 3
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+反射＋推論（1回の構造化出力）のテスト
+
+結果の検証は応答テキストを直接渡し、Ollama 呼び出しを含む経路は
+scripts/fake_ollama.py に ASGI で直接つないで確かめる。
+
+    python -m pytest -q test_reflection_reasoning.py
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from fake_ollama import FakeModel, create_app
+from ollama_client import OllamaClient
+from reflection_cache import ReflectionCache
+from reflection_reasoning import (
+    COMBINED_SCHEMA,
+    REASONING_DEFAULTS,
+    REFLECTION_DEFAULTS,
+    ReflectionReasoningSystem
+)
+
+VALID = {
+    "intent": "挨拶",
+    "emotion": "喜び",
+    "key_points": ["朝"],
+    "tone": "カジュアル",
+    "approach": "共感する",
+    "botan_elements": ["明るさ"],
+    "avoid": ["説教"],
+    "direction": "元気に返す"
+}
+
+def parse(response: str):
+    return ReflectionReasoningSystem()._parse_combined(response)
+
+def test_schema_requires_every_field():
+    assert set(COMBINED_SCHEMA["required"]) == set(VALID)
+    assert COMBINED_SCHEMA["properties"]["key_points"]["type"] == "array"
+    assert COMBINED_SCHEMA["properties"]["intent"]["type"] == "string"
+
+def test_valid_output_is_split_into_reflection_and_reasoning():
+    reflection, reasoning = parse("結果:\n" + json.dumps(VALID, ensure_ascii=False))
+
+    assert reflection == {key: VALID[key] for key in REFLECTION_DEFAULTS}
+    assert reasoning == {key: VALID[key] for key in REASONING_DEFAULTS}
+
+def test_invalid_fields_fall_back_to_defaults():
+    data = {**VALID, "emotion": "  ", "key_points": "朝", "avoid": ["説教", 1]}
+    del data["direction"]
+    reflection, reasoning = parse(json.dumps(data, ensure_ascii=False))
+
+    assert reflection["emotion"] == REFLECTION_DEFAULTS["emotion"]
+    assert reflection["key_points"] == REFLECTION_DEFAULTS["key_points"]
+    assert reflection["intent"] == "挨拶"
+    assert reasoning["avoid"] == REASONING_DEFAULTS["avoid"]
+    assert reasoning["direction"] == REASONING_DEFAULTS["direction"]
+    assert reflection["invalid_fields"] == ["emotion", "key_points", "avoid", "direction"]
+
+def test_unparseable_output_falls_back_entirely():
+    for response in ("", "JSONじゃないよ", "{broken", "[1, 2]"):
+        reflection, reasoning = parse(response)
+        assert reflection == {**REFLECTION_DEFAULTS, "raw_analysis": response}
+        assert reasoning == REASONING_DEFAULTS
+
+def make_system(cache=None):
+    client = OllamaClient(
+        "http://fake-ollama",
+        transport=httpx.ASGITransport(app=create_app(FakeModel(ttft=0, tokens_per_second=1000)))
+    )
+    return ReflectionReasoningSystem(model_name="qwen2.5:3b", client=client, cache=cache)
+
+def test_reflect_and_reason_async_uses_structured_output_and_cache():
+    async def scenario():
+        cache = ReflectionCache()
+        system = make_system(cache)
+        try:
+            first = await system.reflect_and_reason_async("おはよー", "", "牡丹")
+            second = await system.reflect_and_reason_async("おはよー", "", "牡丹")
+        finally:
+            await system.client.aclose()
+        return first, second, cache.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    reflection, reasoning = first
+    # fake_ollama はスキーマを満たす固定値を返す
+    assert reflection["intent"] == "fake"
+    assert reflection["key_points"] == ["fake"]
+    assert "invalid_fields" not in reflection
+    assert set(reasoning) == set(REASONING_DEFAULTS)
+    assert tuple(second) == (reflection, reasoning)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_failed_call_falls_back_and_is_not_cached():
+    async def scenario():
+        cache = ReflectionCache()
+        system = make_system(cache)
+        system.model_name = "missing:model"  # fake_ollama は 404 を返す
+        try:
+            result = await system.reflect_and_reason_async("おはよー", "", "牡丹")
+        finally:
+            await system.client.aclose()
+        return result, len(cache)
+
+    (reflection, reasoning), cached = asyncio.run(scenario())
+    assert reflection == {**REFLECTION_DEFAULTS, "raw_analysis": ""}
+    assert reasoning == REASONING_DEFAULTS
+    assert cached == 0
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
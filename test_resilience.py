@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+CircuitBreaker / AdaptiveTimeout のテスト
+
+    python -m pytest -q test_resilience.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from resilience import CLOSED, HALF_OPEN, OPEN, AdaptiveTimeout, CircuitBreaker, CircuitOpenError
+
+class UpstreamError(Exception):
+    pass
+
+class ClientError(Exception):
+    """4xx 相当（アップストリームの故障ではない）"""
+
+def fail(breaker: CircuitBreaker, exc: Exception = None):
+    with pytest.raises(type(exc or UpstreamError())):
+        with breaker.guard():
+            raise exc or UpstreamError()
+
+def succeed(breaker: CircuitBreaker):
+    with breaker.guard():
+        pass
+
+def make_breaker(name, **options):
+    options.setdefault("failure_threshold", 3)
+    options.setdefault("reset_timeout", 0.05)
+    return CircuitBreaker(name, default_timeout=10, **options)
+
+def test_opens_after_consecutive_failures():
+    breaker = make_breaker("test_opens")
+    for _ in range(2):
+        fail(breaker)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert not breaker.available()
+    with pytest.raises(CircuitOpenError) as info:
+        succeed(breaker)
+    assert 0 < info.value.retry_after <= 0.05
+
+def test_success_resets_failure_count():
+    breaker = make_breaker("test_reset_count")
+    fail(breaker)
+    fail(breaker)
+    succeed(breaker)
+    fail(breaker)
+    fail(breaker)
+
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["consecutive_failures"] == 2
+
+def test_half_open_allows_one_probe_and_closes_on_success():
+    breaker = make_breaker("test_half_open_close")
+    for _ in range(3):
+        fail(breaker)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.available()
+
+    with breaker.guard():
+        # 試行中は他の呼び出しを通さない
+        assert not breaker.available()
+        with pytest.raises(CircuitOpenError):
+            succeed(breaker)
+
+    assert breaker.state == CLOSED
+
+def test_half_open_failure_reopens_immediately():
+    breaker = make_breaker("test_half_open_reopen")
+    for _ in range(3):
+        fail(breaker)
+    time.sleep(0.06)
+    fail(breaker)
+
+    assert breaker.state == OPEN
+
+def test_cancelled_probe_releases_half_open():
+    breaker = make_breaker("test_cancelled_probe")
+    for _ in range(3):
+        fail(breaker)
+    time.sleep(0.06)
+
+    with pytest.raises(KeyboardInterrupt):
+        with breaker.guard():
+            raise KeyboardInterrupt()
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.available()
+
+def test_non_failures_do_not_open():
+    breaker = make_breaker("test_is_failure", is_failure=lambda e: not isinstance(e, ClientError))
+    for _ in range(5):
+        fail(breaker, ClientError())
+
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["consecutive_failures"] == 0
+    # 4xx の所要時間はタイムアウトのサンプルにしない
+    assert breaker.timeouts.quantile(0.5) is None
+
+def test_slow_successes_count_as_failures():
+    breaker = make_breaker("test_slow_calls", slow_call_threshold=0.01)
+    for _ in range(3):
+        with breaker.guard():
+            time.sleep(0.02)
+
+    assert breaker.state == OPEN
+
+def test_unobserved_success_is_not_sampled():
+    breaker = make_breaker("test_unobserved", slow_call_threshold=0.01)
+    with breaker.guard(observe=False):
+        time.sleep(0.02)
+
+    assert breaker.state == CLOSED
+    assert breaker.timeouts.quantile(0.5) is None
+
+def test_adaptive_timeout_uses_default_until_min_samples():
+    timeout = AdaptiveTimeout(default=30, floor=1, min_samples=5)
+    for _ in range(4):
+        timeout.observe(0.5)
+    assert timeout.current() == 30
+
+    timeout.observe(0.5)
+    assert timeout.current() == 1  # 0.5 × 2 = 1.0（floor）
+
+def test_adaptive_timeout_percentile_and_clamping():
+    timeout = AdaptiveTimeout(default=30, floor=1, percentile=0.9, multiplier=2, min_samples=10)
+    for seconds in range(1, 11):
+        timeout.observe(seconds)
+    assert timeout.quantile(0.9) == 10
+    assert timeout.current() == 20
+
+    for _ in range(5):
+        timeout.observe(100)
+    assert timeout.current() == 30  # ceiling（既定は default）
+
+def test_adaptive_timeout_window_forgets_old_samples():
+    timeout = AdaptiveTimeout(default=30, floor=0.1, window=5, min_samples=5)
+    for _ in range(5):
+        timeout.observe(10)
+    for _ in range(5):
+        timeout.observe(1)
+
+    assert timeout.current() == 2
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+SessionStore のテスト（LRU・無操作TTL・メモリ上限・ターン数上限・復元）
+
+    python -m pytest -q test_session_store.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from session_store import SessionStore
+
+def test_capacity_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2, idle_ttl=0)
+    store.get("a")
+    store.get("b")
+    store.get("a")  # a を最近使ったことにする
+    store.get("c")
+
+    assert store.peek("a") is not None
+    assert store.peek("b") is None
+    assert store.peek("c") is not None
+    assert len(store) == 2
+
+def test_peek_does_not_change_lru_order():
+    store = SessionStore(max_sessions=2, idle_ttl=0)
+    store.get("a")
+    store.get("b")
+    store.peek("a")
+    store.get("c")
+
+    assert store.peek("a") is None
+    assert store.peek("b") is not None
+
+def test_idle_sessions_expire():
+    store = SessionStore(idle_ttl=60)
+    idle = store.get("idle")
+    idle.last_active -= 61
+    store.get("active")
+
+    assert store.peek("idle") is None
+    assert store.peek("active") is not None
+    assert store.stats()["count"] == 1
+
+def test_max_turns_keeps_latest_turns():
+    store = SessionStore(max_turns=2)
+    session = store.get("u1")
+    for i in range(3):
+        store.record_turn(session, f"in{i}", f"out{i}", tokens=10)
+
+    _, _, turns = session.snapshot()
+    assert [turn[0] for turn in turns] == ["in1", "in2"]
+    assert session.tokens == 20
+    assert store.stats()["bytes"] == session.size == len("in1out1in2out2")
+
+def test_memory_limit_evicts_other_sessions_first():
+    store = SessionStore(max_bytes=20, max_turns=0, idle_ttl=0)
+    old = store.get("old")
+    store.record_turn(old, "aaaa", "bbbb")
+    current = store.get("current")
+    store.record_turn(current, "cccccccc", "dddddddd")
+
+    assert store.peek("old") is None
+    assert len(current.turns) == 1
+    assert store.stats()["bytes"] == 16
+
+def test_memory_limit_drops_oldest_turns_of_current_session():
+    store = SessionStore(max_bytes=20, max_turns=0, idle_ttl=0)
+    session = store.get("u1")
+    store.record_turn(session, "aaaaa", "bbbbb")
+    store.record_turn(session, "ccccc", "ddddd")
+    store.record_turn(session, "eeeee", "fffff")
+
+    _, _, turns = session.snapshot()
+    assert [turn[0] for turn in turns] == ["ccccc", "eeeee"]
+    assert store.stats()["bytes"] == 20
+
+def test_turn_recorded_after_reset_is_not_counted():
+    store = SessionStore()
+    session = store.get("u1")
+    store.reset("u1")
+    store.record_turn(session, "hello", "world")
+
+    assert store.peek("u1") is None
+    assert store.stats()["bytes"] == 0
+
+def test_fold_replaces_folded_turns_with_summary():
+    store = SessionStore(max_turns=0)
+    session = store.get("u1")
+    for i in range(3):
+        store.record_turn(session, f"in{i}", f"out{i}", tokens=10)
+    _, _, turns = session.snapshot()
+    store.fold(session, turns[:2], "要約", 3)
+
+    summary, summary_tokens, remaining = session.snapshot()
+    assert summary == "要約"
+    assert summary_tokens == 3
+    assert [turn[0] for turn in remaining] == ["in2"]
+    assert session.folded_tokens == 20
+    assert store.stats()["bytes"] == session.size == len("in2out2") + len("要約".encode("utf-8"))
+
+def test_fold_skips_turns_already_dropped():
+    store = SessionStore(max_turns=2)
+    session = store.get("u1")
+    store.record_turn(session, "in0", "out0")
+    store.record_turn(session, "in1", "out1")
+    _, _, folded = session.snapshot()
+    # 要約中に in0 が max_turns で押し出された
+    store.record_turn(session, "in2", "out2")
+    store.fold(session, folded, "要約", 2)
+
+    _, _, turns = session.snapshot()
+    assert [turn[0] for turn in turns] == ["in2"]
+
+def test_restore_sets_turns_summary_and_idle_time():
+    store = SessionStore()
+    session = store.restore(
+        "u1",
+        [("おはよ", "おはよ〜！", 12)],
+        summary="前回は天気の話",
+        summary_tokens=7,
+        idle_seconds=120
+    )
+
+    summary, summary_tokens, turns = session.snapshot()
+    assert turns == [("おはよ", "おはよ〜！", 12)]
+    assert (summary, summary_tokens) == ("前回は天気の話", 7)
+    assert 119 <= time.monotonic() - session.last_active <= 121
+    assert store.stats()["bytes"] == session.size
+
+def test_restored_idle_session_expires():
+    store = SessionStore(idle_ttl=60)
+    store.restore("stale", [("a", "b", 1)], idle_seconds=61)
+    store.get("fresh")
+
+    assert store.peek("stale") is None
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+ws_codec のテスト（エンコードの選択・フィールド選択・音声フレーム）
+
+    python -m pytest -q test_ws_codec.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent / "scripts"))
+
+from ws_codec import (
+    AUDIO_FRAME_MAGIC,
+    CODECS,
+    DEFAULT_WIRE_FORMAT,
+    WireFormat,
+    decode_audio_frame,
+    encode_audio_frame,
+    is_audio_frame,
+    parse_fields
+)
+
+MESSAGE = {"type": "delta", "request_id": "r1", "delta": "やっほー", "text": "やっほー", "emotion": "happy"}
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("") is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("text, delta,") == frozenset({"text", "delta"})
+    assert parse_fields(["text", " delta "]) == frozenset({"text", "delta"})
+
+def test_negotiate_defaults_to_json():
+    wire = WireFormat.negotiate(None)
+
+    assert wire.describe() == {"encoding": "json", "fields": None}
+    assert wire.key == DEFAULT_WIRE_FORMAT.key
+    assert json.loads(wire.encode(MESSAGE)) == MESSAGE
+
+def test_negotiate_rejects_unknown_encoding():
+    with pytest.raises(ValueError, match="Unsupported encoding: cbor"):
+        WireFormat.negotiate("cbor")
+
+def test_select_keeps_requested_and_required_fields():
+    wire = WireFormat.negotiate("JSON", "delta")
+
+    assert wire.select(MESSAGE) == {"type": "delta", "request_id": "r1", "delta": "やっほー"}
+    assert wire.describe() == {"encoding": "json", "fields": ["delta"]}
+
+def test_control_frames_ignore_field_selection():
+    wire = WireFormat.negotiate("json", "delta")
+    busy = {"type": "busy", "request_id": "r1", "reason": "rate_limited", "retry_after": 1.5}
+
+    assert wire.select(busy) == busy
+
+def test_same_settings_share_key():
+    assert WireFormat.negotiate("json", "text,delta").key == WireFormat.negotiate(None, ["delta", "text"]).key
+    assert WireFormat.negotiate("json", "text").key != WireFormat.negotiate("json", None).key
+
+@pytest.mark.parametrize("encoding", sorted(CODECS))
+def test_codecs_round_trip(encoding):
+    wire = WireFormat.negotiate(encoding)
+    payload = wire.encode(MESSAGE)
+
+    assert isinstance(payload, bytes) == wire.codec.binary
+    assert wire.codec.loads(payload) == MESSAGE
+    assert not is_audio_frame(payload)
+
+def test_audio_frame_round_trip():
+    header = {"request_id": "r1", "segment": 2, "seq": 0, "last": False, "text": "おはよ"}
+    audio = b"\xff\xfb\x90\x00" * 100
+    frame = encode_audio_frame(header, audio)
+
+    assert frame.startswith(AUDIO_FRAME_MAGIC)
+    assert is_audio_frame(frame)
+    assert decode_audio_frame(frame) == (header, audio)
+
+def test_audio_frame_with_empty_audio():
+    frame = encode_audio_frame({"request_id": "r1", "last": True}, b"")
+
+    assert decode_audio_frame(frame) == ({"request_id": "r1", "last": True}, b"")
+
+def test_non_audio_payloads():
+    assert not is_audio_frame('{"type": "delta"}')
+    assert not is_audio_frame(b"\x82\xa4type")
+    assert decode_audio_frame(b"\x82\xa4type") is None
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))